@@ -0,0 +1,87 @@
+"""
+Build time and memory of the dict-backed Encoder against the CompactEncoder.
+
+For horizons of one week, three months and one year with --slots slots per day at
+every location, times building the encoder (mappings and forecast lookup), turning its
+output into Scheduler inputs as receive_schedule does, and decoding a schedule. Peak
+memory is measured with tracemalloc. Forecasts are synthetic.
+
+    python -m benchmarks.bench_encoder [--slots N]
+"""
+import argparse
+import datetime
+import gc
+import json
+import math
+import tempfile
+import time
+import tracemalloc
+from benchmarks.bench_forecasters import synthetic_history
+from src.models import encoder as encoder_module
+from src.models.encoder import CompactEncoder, Encoder
+from src.models.forecast_store import ForecastStore
+
+LOCATIONS = ['kluuvi', 'kumpula', 'otaniemi', 'toolo', 'meilahti', 'Pirkkola', 'Paloheinä']
+HORIZONS = [("1 week", 7), ("3 months", 91), ("1 year", 365)]
+
+def calendar(days, slots):
+    start = datetime.date(2024, 1, 1)
+    dates = [f"{start + datetime.timedelta(days=day)}T00:00:00.000Z" for day in range(days)]
+    times = [[f"{hour:02d}:00" for hour in range(8, 8 + slots)]] * days
+    return dates, times
+
+def write_forecasts(data_path):
+    for seed, location in enumerate(LOCATIONS):
+        history = synthetic_history(seed, weeks=1)
+        week_forecast = [
+            {"weekday": int(t.dayofweek), "hour": int(t.hour), "pred_checkins": float(value)}
+            for t, value in zip(history['time'], history['check-ins'])
+        ]
+        with open(f"{data_path}/{location}_forecast.json", 'w') as f:
+            json.dump({"location": location, "week_forecast": week_forecast}, f)
+
+def stages(encoder_class, dates, times):
+    """Returns (build seconds, prepare seconds, decode seconds)."""
+    start = time.perf_counter()
+    encoder = encoder_class(dates, times, LOCATIONS)
+    built = time.perf_counter()
+    lits, checkins, groups, days = encoder.get_encoded_values()
+    soft = [(int(math.ceil(weight)), lit) for weight, lit in checkins.values()]
+    hard, penalty = list(groups), list(days)
+    prepared = time.perf_counter()
+    encoder.decode_list(encoder.get_positive_intersection(lits, lits[::len(lits) // 20]))
+    decoded = time.perf_counter()
+    return built - start, prepared - built, decoded - prepared
+
+def run(encoder_class, dates, times, repeat=3):
+    """Best stage times of a few runs, then the peak memory of a traced run (tracing slows it down)."""
+    timings = min((stages(encoder_class, dates, times) for _ in range(repeat)), key=sum)
+    gc.collect()
+    tracemalloc.start()
+    stages(encoder_class, dates, times)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (*timings, peak)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, default=12, help="Slots per day")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        write_forecasts(data_path)
+        encoder_module.forecast_store = ForecastStore(data_path)
+        # Parse the forecasts once, so both encoders find them in memory
+        encoder_module.forecast_store.tables(LOCATIONS)
+
+        print(f"{'horizon':>9} {'lits':>7} {'encoder':>8} {'build':>9} {'prepare':>9} {'decode':>8} {'peak mem':>9}")
+        for name, days in HORIZONS:
+            dates, times = calendar(days, args.slots)
+            for encoder_class in (Encoder, CompactEncoder):
+                build, prepare, decode, peak = run(encoder_class, dates, times)
+                label = "dict" if encoder_class is Encoder else "compact"
+                print(f"{name:>9} {days * args.slots * len(LOCATIONS):>7} {label:>8} {build * 1000:>7.1f}ms "
+                      f"{prepare * 1000:>7.1f}ms {decode * 1000:>6.2f}ms {peak / 1e6:>7.2f}MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Size and latency of the cardinality encodings for the Exactly-K constraint.
+
+For every problem size and encoding, reports the clause and auxiliary variable count
+of the encoding, the time to encode it and the time RC2 takes to solve the full
+problem. Solves are interrupted after --limit seconds.
+
+    python -m benchmarks.bench_encodings [--limit SECONDS]
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+from threading import Timer
+from pysat.examples.rc2 import RC2
+from src.models.scheduler import ENCODINGS, Scheduler, choose_encoding, encode_exactly_k
+from benchmarks.bench_incremental import make_problem
+
+# (days, slots per day, locations)
+SHAPES = [(2, 3, 4), (3, 4, 4), (7, 6, 4), (14, 12, 4), (30, 12, 7)]
+KS = [1, 5, 20]
+# Above this many literals RC2 does not finish in reasonable time for any encoding
+MAX_SOLVE_LITS = 48
+
+def solve_time(scheduler, k, limit):
+    """Time an RC2 solve of the scheduler's problem, None if interrupted."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        wcnf = scheduler.build_wcnf(k)
+    start = time.perf_counter()
+    with RC2(wcnf) as rc2:
+        timer = Timer(limit, rc2.interrupt)
+        timer.start()
+        model = rc2.compute(expect_interrupt=True)
+        timer.cancel()
+        if model is None and rc2.interrupted:
+            return None
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=float, default=10.0, help="RC2 time limit per solve in seconds")
+    args = parser.parse_args()
+
+    encodings = [encoding for encoding in ENCODINGS if encoding != 'auto']
+    print(f"{'lits':>5} {'k':>3} {'encoding':>12} {'clauses':>9} {'vars':>8} {'encode':>9} {'solve':>9}")
+    for days, slots, locations in SHAPES:
+        rng = random.Random(days * 100 + slots * 10 + locations)
+        lits, soft, hard, penalty = make_problem(days, slots, locations, rng)
+        for k in KS:
+            for encoding in encodings:
+                start = time.perf_counter()
+                enc = encode_exactly_k(lits, k, encoding, top_id=len(lits))
+                encode = time.perf_counter() - start
+
+                solve = "-"
+                if len(lits) <= MAX_SOLVE_LITS:
+                    scheduler = Scheduler(fast_path=False, encoding=encoding)
+                    scheduler.set_lits(lits)
+                    scheduler.set_soft(soft)
+                    scheduler.set_hard(hard)
+                    scheduler.set_penalty(penalty)
+                    elapsed = solve_time(scheduler, k, args.limit)
+                    solve = "timeout" if elapsed is None else f"{elapsed * 1000:.1f}ms"
+
+                marker = "*" if encoding == choose_encoding(len(lits), k) else " "
+                print(f"{len(lits):>5} {k:>3} {encoding:>11}{marker} {len(enc.clauses):>9} "
+                      f"{enc.nv - len(lits):>8} {encode * 1000:>7.1f}ms {solve:>9}")
+    print("* = encoding picked by 'auto'")
+
+if __name__ == "__main__":
+    main()
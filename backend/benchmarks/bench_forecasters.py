@@ -0,0 +1,90 @@
+"""
+Speed and accuracy of the WeekPred forecasting backends on held-out weeks.
+
+Every history is split into training weeks and the last --holdout weeks. Each backend
+forecasts the weekday-hour profile from the training weeks, and the forecast is scored
+against the hourly check-ins of the held-out weeks (MAE and RMSE). Histories are the
+per-area CSV files in --data, or synthetic ones when no directory is given.
+
+    python -m benchmarks.bench_forecasters [--data DIR] [--holdout WEEKS]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from src.models.predictor import WeekPred
+
+# (name, backend options)
+BACKENDS = [
+    ("prophet", dict(backend='prophet')),
+    ("profile mean", dict(backend='profile')),
+    ("profile median", dict(backend='profile', aggregation='median')),
+    ("profile trimmed", dict(backend='profile', aggregation='trimmed')),
+    ("profile mean hl=28d", dict(backend='profile', half_life=28)),
+    ("profile trimmed hl=28d", dict(backend='profile', aggregation='trimmed', half_life=28)),
+]
+
+def synthetic_history(seed, weeks=52):
+    """Hourly check-ins with daily and weekly seasonality, a slow trend and occasional outliers."""
+    rng = np.random.default_rng(seed)
+    time_index = pd.date_range('2023-01-02', periods=weeks * 168, freq='h')
+    hour, weekday = time_index.hour.to_numpy(), time_index.dayofweek.to_numpy()
+    daily = np.exp(-((hour - 17) ** 2) / 18) + 0.6 * np.exp(-((hour - 8) ** 2) / 8)
+    weekly = np.where(weekday < 5, 1.0, 0.6)
+    trend = np.linspace(0.8, 1.2, len(time_index))
+    rate = 40 * daily * weekly * trend + 1
+    counts = rng.poisson(rate).astype(float)
+    outliers = rng.random(len(counts)) < 0.005
+    counts[outliers] *= 8
+    return pd.DataFrame({'time': time_index, 'check-ins': counts})
+
+def histories(data_dir):
+    if data_dir is None:
+        return {f"synthetic-{seed}": synthetic_history(seed) for seed in range(3)}
+    predictor = WeekPred(data_dir)
+    result = {}
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith('.csv'):
+            data = predictor.select_location(name)
+            result[name] = data[['time', 'check-ins']]
+    return result
+
+def score(predictions, actual):
+    """MAE and RMSE of a weekday-hour forecast on hourly observations."""
+    forecast = np.zeros(168)
+    slots = (predictions['time'].dt.dayofweek * 24 + predictions['time'].dt.hour).to_numpy()
+    forecast[slots] = predictions['check-ins'].to_numpy()
+    observed = actual['check-ins'].to_numpy()
+    errors = forecast[(actual['time'].dt.dayofweek * 24 + actual['time'].dt.hour).to_numpy()] - observed
+    return np.abs(errors).mean(), np.sqrt((errors ** 2).mean())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=None, help="Directory of per-area history CSV files")
+    parser.add_argument("--holdout", type=int, default=4, help="Held-out weeks at the end of each history")
+    args = parser.parse_args()
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    import prophet  # noqa: F401
+    print(f"Prophet import: {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'history':>16} {'backend':>24} {'time':>9} {'MAE':>7} {'RMSE':>7}")
+    for name, history in histories(args.data).items():
+        cutoff = history['time'].max() - pd.Timedelta(weeks=args.holdout)
+        train, test = history[history['time'] <= cutoff], history[history['time'] > cutoff]
+        for label, options in BACKENDS:
+            predictor = WeekPred(None, **options)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                predictions = predictor.predict_location(train.copy())
+            elapsed = time.perf_counter() - start
+            mae, rmse = score(predictions, test)
+            print(f"{name:>16} {label:>24} {elapsed * 1000:>7.1f}ms {mae:>7.2f} {rmse:>7.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Re-solve latency of the incremental Scheduler against the cold-start path.
+
+Each problem shape is solved for a sequence of requests that only differ in k and in
+slightly perturbed slot weights, as when a user tweaks n and resubmits. "fresh" runs
+the incremental solver on a new Scheduler for every request, which separates the gain
+from reusing the warm solver from the gain of the solving strategy itself.
+
+    python -m benchmarks.bench_incremental
+"""
+import contextlib
+import io
+import random
+import statistics
+import time
+from src.models.scheduler import Scheduler
+
+# (days, slots per day, locations)
+SHAPES = [(2, 3, 4), (3, 3, 4), (3, 4, 4)]
+RESOLVES = 10
+
+def make_problem(days, slots, locations, rng):
+    """Build literals, soft clauses and group/day clauses shaped like the ones Encoder produces."""
+    literal_groups, date_literals = [], []
+    index = 1
+    for _ in range(days):
+        day = []
+        for _ in range(slots):
+            group = list(range(index, index + locations))
+            index += locations
+            literal_groups.append(group)
+            day.extend(group)
+        date_literals.append(day)
+    lits = [lit for day in date_literals for lit in day]
+    soft = [(rng.randint(1, 60), lit) for lit in lits]
+    return lits, soft, literal_groups, date_literals
+
+def requests_for(soft, rng):
+    """A sequence of (k, soft) resubmissions of the same calendar."""
+    for _ in range(RESOLVES):
+        k = rng.randint(2, 5)
+        yield k, [(max(1, weight + rng.randint(-2, 2)), lit) for weight, lit in soft]
+
+def timed_solve(scheduler, lits, soft, hard, penalty, k):
+    scheduler.set_lits(lits)
+    scheduler.set_soft(soft)
+    scheduler.set_hard(hard)
+    scheduler.set_penalty(penalty)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = scheduler.solve_schedule(k)
+    return time.perf_counter() - start, result[0] if result else None
+
+def main():
+    print(f"{'lits':>5} {'cold mean':>10} {'fresh mean':>11} {'warm first':>11} {'warm mean':>10} {'speedup':>8}")
+    for days, slots, locations in SHAPES:
+        rng = random.Random(days * 100 + slots * 10 + locations)
+        lits, soft, hard, penalty = make_problem(days, slots, locations, rng)
+        sequence = list(requests_for(soft, rng))
+
+        cold = []
+        for k, weights in sequence:
+            elapsed, cost = timed_solve(Scheduler(fast_path=False), lits, weights, hard, penalty, k)
+            cold.append((elapsed, cost))
+
+        fresh = []
+        for k, weights in sequence:
+            fresh.append(timed_solve(Scheduler(incremental=True, fast_path=False), lits, weights, hard, penalty, k))
+
+        scheduler = Scheduler(incremental=True, fast_path=False)
+        warm = []
+        for k, weights in sequence:
+            warm.append(timed_solve(scheduler, lits, weights, hard, penalty, k))
+
+        assert [cost for _, cost in cold] == [cost for _, cost in fresh] == [cost for _, cost in warm], "costs differ"
+        cold_mean = statistics.mean(elapsed for elapsed, _ in cold)
+        fresh_mean = statistics.mean(elapsed for elapsed, _ in fresh)
+        warm_mean = statistics.mean(elapsed for elapsed, _ in warm[1:])
+        print(f"{len(lits):>5} {cold_mean * 1000:>8.1f}ms {fresh_mean * 1000:>9.1f}ms {warm[0][0] * 1000:>9.1f}ms "
+              f"{warm_mean * 1000:>8.1f}ms {cold_mean / warm_mean:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Throughput of the SolverPool with the number of worker processes.
+
+Submits --jobs schedule problems that need RC2 (the fast path is disabled) and waits
+for all of them, for 1, 2, 4, ... workers up to the core count. A second pass floods
+the pool with max_pending = 2 x workers to show how many submissions admission control
+turns away.
+
+    python -m benchmarks.bench_pool [--jobs N] [--max-workers W]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+from benchmarks.bench_incremental import make_problem
+from src.models.solver_pool import PoolFull, SolverPool
+
+def problems(count):
+    for seed in range(count):
+        rng = random.Random(seed)
+        lits, soft, hard, penalty = make_problem(3, 3, 4, rng)
+        yield {"lits": lits, "soft": soft, "hard": hard, "penalty": penalty}, rng.randint(2, 4)
+
+def run(pool, jobs, flood=False):
+    """Submit every job and wait for all admitted ones. Returns (seconds, completed, rejected)."""
+    start = time.perf_counter()
+    job_ids, rejected = [], 0
+    for problem, k in jobs:
+        try:
+            job_ids.append(pool.submit(problem, k))
+        except PoolFull:
+            if not flood:
+                raise
+            rejected += 1
+    for job_id in job_ids:
+        assert pool.poll(job_id, wait=600)["status"] == "done"
+    return time.perf_counter() - start, len(job_ids), rejected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=24, help="Problems per run")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count(), help="Largest pool size tried")
+    args = parser.parse_args()
+
+    jobs = list(problems(args.jobs))
+    sizes = [1]
+    while sizes[-1] * 2 <= args.max_workers:
+        sizes.append(sizes[-1] * 2)
+    if sizes[-1] != args.max_workers:
+        sizes.append(args.max_workers)
+
+    print(f"{os.cpu_count()} cores, {args.jobs} jobs of {len(jobs[0][0]['lits'])} literals")
+    print(f"{'workers':>7} {'seconds':>8} {'jobs/s':>7} {'speedup':>8} {'flooded: done':>14} {'rejected':>9}")
+    baseline = None
+    for workers in sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            pool = SolverPool(workers=workers, max_pending=args.jobs, options={"fast_path": False})
+            # Start the worker processes before timing
+            run(pool, jobs[:workers])
+            seconds, done, _ = run(pool, jobs)
+            pool.shutdown()
+
+            flood = SolverPool(workers=workers, max_pending=2 * workers, options={"fast_path": False})
+            _, flooded, rejected = run(flood, jobs, flood=True)
+            flood.shutdown()
+        baseline = baseline or seconds
+        print(f"{workers:>7} {seconds:>8.2f} {done / seconds:>7.2f} {baseline / seconds:>7.2f}x {flooded:>14} {rejected:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Size and RC2 solve time of schedule instances with and without dominated literals pruned.
+
+For calendars of one and two days with --slots slots per day at the seven
+locations of bench_encoder and --per-week workouts a week, the soft clauses combine the
+synthetic forecasts with the travel from an origin in central Helsinki, as a request with
+an 'origin' does. Every instance is solved on RC2, as the fast path needs no CNF, before
+and after prune_dominated; the costs must agree. Longer calendars do not finish on RC2
+within minutes, pruned or not, which is why those requests take the fast path.
+
+    python -m benchmarks.bench_pruning [--slots N] [--per-week N] [--repeat R]
+"""
+import argparse
+import math
+import tempfile
+import time
+from benchmarks.bench_encoder import LOCATIONS, calendar, write_forecasts
+from src.models import encoder as encoder_module
+from src.models.encoder import CompactEncoder
+from src.models.forecast_store import ForecastStore
+from src.models.registry import travel_km
+from src.models.scheduler import Scheduler, prune_dominated
+
+HORIZONS = [("1 day", 1), ("2 days", 2)]
+# Helsinki railway station
+ORIGIN = (60.1719, 24.9414)
+TRAVEL_WEIGHT = 5
+
+def problem_for(dates, times):
+    """The schedule problem of a calendar with crowd and travel costs, as encode_schedule builds it."""
+    encoder = CompactEncoder(dates, times, LOCATIONS)
+    lits, _, groups, days = encoder.get_encoded_values()
+    distances = travel_km(ORIGIN, LOCATIONS)
+    soft = [
+        (int(math.ceil(cost + TRAVEL_WEIGHT * distances[location])), lit)
+        for (cost, lit), location in zip(encoder.soft_clauses(), encoder.location_indices(encoder.date_time_loc_to_checkins.literals))
+    ]
+    return {"lits": lits, "soft": soft, "hard": list(groups), "penalty": list(days)}
+
+def solve(problem, k):
+    scheduler = Scheduler(fast_path=False)
+    scheduler.set_lits(problem["lits"])
+    scheduler.set_soft(problem["soft"])
+    scheduler.set_hard(problem["hard"])
+    scheduler.set_penalty(problem["penalty"])
+    return scheduler.solve_schedule(k)[0]
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, default=8, help="Slots per day")
+    parser.add_argument("--per-week", type=int, default=4, help="Workouts per week")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions, the best is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        write_forecasts(data_path)
+        encoder_module.forecast_store = ForecastStore(data_path)
+
+        print(f"{'horizon':>9} {'lits':>7} {'kept':>7} {'prune':>8} {'full solve':>11} {'pruned solve':>13} {'speedup':>8}")
+        for name, days in HORIZONS:
+            dates, times = calendar(days, args.slots)
+            n = max(1, round(args.per_week * days / 7))
+            problem = problem_for(dates, times)
+            pruned = prune_dominated(problem, n)
+            assert solve(problem, n) == solve(pruned, n)
+
+            prune_time = best_time(lambda: prune_dominated(problem, n), args.repeat)
+            full = best_time(lambda: solve(problem, n), args.repeat)
+            reduced = best_time(lambda: solve(prune_dominated(problem, n), n), args.repeat)
+            print(f"{name:>9} {len(problem['lits']):>7} {len(pruned['lits']):>7} {prune_time * 1000:>6.1f}ms "
+                  f"{full * 1000:>9.1f}ms {reduced * 1000:>11.1f}ms {full / reduced:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
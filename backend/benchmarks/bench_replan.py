@@ -0,0 +1,77 @@
+"""
+Latency of re-planning one changed slot against solving the whole horizon again.
+
+For plans of one, three and six months with --slots slots per day at every location
+and --per-week workouts a week, removes one booked slot in the last week and times
+encoding, solving and decoding the whole new calendar against plan_window re-solving
+only the changed week. Forecasts are synthetic.
+
+    python -m benchmarks.bench_replan [--slots N] [--per-week N] [--repeat R]
+"""
+import argparse
+import math
+import tempfile
+import time
+from benchmarks.bench_encoder import LOCATIONS, calendar, write_forecasts
+from src.models import encoder as encoder_module
+from src.models.encoder import CompactEncoder
+from src.models.forecast_store import ForecastStore
+from src.models.replan import apply_changes, plan_window
+from src.models.scheduler import Scheduler
+
+HORIZONS = [("1 month", 4), ("3 months", 13), ("6 months", 26)]
+
+def solve(dates, times, k):
+    """Encode, solve and decode a calendar as receive_schedule does."""
+    encoder = CompactEncoder(dates, times, LOCATIONS)
+    lits, checkins, groups, days = encoder.get_encoded_values()
+    scheduler = Scheduler()
+    scheduler.set_lits(lits)
+    scheduler.set_soft([(int(math.ceil(weight)), lit) for weight, lit in checkins.values()])
+    scheduler.set_hard(groups)
+    scheduler.set_penalty(days)
+    _, model = scheduler.solve_schedule(k)
+    return encoder.decode_list(encoder.get_positive_intersection(lits, model))
+
+def replan(dates, times, n, previous, changes, now):
+    plan = plan_window(dates, times, n, previous, changes, now, slot_capacity=len(LOCATIONS))
+    return plan["kept"] + (solve(plan["window_days"], plan["window_times"], plan["k"]) if plan["k"] else [])
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, default=12, help="Slots per day")
+    parser.add_argument("--per-week", type=int, default=4, help="Workouts per week")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, the best is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        write_forecasts(data_path)
+        encoder_module.forecast_store = ForecastStore(data_path)
+        encoder_module.forecast_store.tables(LOCATIONS)
+
+        print(f"{'horizon':>9} {'lits':>7} {'full solve':>11} {'replan':>9} {'speedup':>8}")
+        for name, weeks in HORIZONS:
+            dates, times = calendar(7 * weeks, args.slots)
+            n = args.per_week * weeks
+            previous = solve(dates, times, n)
+            # Drop a booked slot of the last week
+            removed = max(previous)
+            changes = {"removed": [list(removed[:2])]}
+            now = dates[0]
+
+            new_dates, new_times = apply_changes(dates, times, changes)
+            full = best_time(lambda: solve(new_dates, new_times, n), args.repeat)
+            partial = best_time(lambda: replan(dates, times, n, previous, changes, now), args.repeat)
+            print(f"{name:>9} {7 * weeks * args.slots * len(LOCATIONS):>7} {full * 1000:>9.1f}ms "
+                  f"{partial * 1000:>7.1f}ms {full / partial:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Cold start and first request latency of the app with and without the startup warm-up.
+
+Starts a fresh interpreter per run that imports the app from src/ (SCHEDULER_WARMUP=1
+or 0) and posts two four-week schedule requests through the Flask test client. Reports
+the median time from the interpreter start to the app being ready, and the latency of
+the first and second request. Forecasts are synthetic.
+
+    python -m benchmarks.bench_startup [--runs R]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from benchmarks.bench_encoder import write_forecasts
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Runs in the child interpreter, printing its timings as JSON
+CHILD = """
+import datetime, json, time
+start = time.perf_counter()
+import app
+ready = time.perf_counter()
+client = app.app.test_client()
+today = datetime.date.today()
+body = {
+    "days": [f"{today + datetime.timedelta(days=day)}T00:00:00.000Z" for day in range(28)],
+    "times": [["08:00", "12:00", "18:00"]] * 28,
+    "n": 8,
+}
+latencies = []
+for _ in range(2):
+    request_start = time.perf_counter()
+    assert client.post("/api/schedule", json=body).status_code == 200
+    latencies.append(time.perf_counter() - request_start)
+    body["n"] += 1  # A new request, not served from the cache
+print(json.dumps({"ready": ready - start, "first": latencies[0], "second": latencies[1]}))
+"""
+
+def run(data_path, warmup):
+    env = dict(os.environ, FORECAST_DATA_PATH=data_path, SCHEDULER_WARMUP="1" if warmup else "0")
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=SRC, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Interpreter starts per mode, the median is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        write_forecasts(data_path)
+        print(f"{'warm-up':>8} {'ready':>9} {'1st request':>12} {'2nd request':>12}")
+        for warmup in (False, True):
+            runs = [run(data_path, warmup) for _ in range(args.runs)]
+            ready, first, second = (statistics.median(r[key] for r in runs) for key in ("ready", "first", "second"))
+            print(f"{'on' if warmup else 'off':>8} {ready * 1000:>7.1f}ms {first * 1000:>10.1f}ms {second * 1000:>10.1f}ms")
+
+if __name__ == "__main__":
+    main()
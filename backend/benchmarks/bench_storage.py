@@ -0,0 +1,88 @@
+"""
+Load time and size of the CSV/JSON files against the parquet storage.
+
+Writes synthetic hourly histories for --locations areas over --years years in both
+formats, then times WeekPred.select_location reading a whole history and the last
+three months of it, and the ForecastStore reading every weekly forecast.
+
+    python -m benchmarks.bench_storage [--locations N] [--years Y] [--repeat R]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.bench_forecasters import synthetic_history
+from src.models.columnar import OUTDOOR, ColumnarStore
+from src.models.forecast_store import ForecastStore
+from src.models.OutClean import SaveArea
+from src.models.predictor import WeekPred
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, default=7, help="Number of synthetic areas")
+    parser.add_argument("--years", type=int, default=2, help="Years of hourly history per area")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, the best is reported")
+    args = parser.parse_args()
+
+    areas = [f"area{i}" for i in range(args.locations)]
+    with tempfile.TemporaryDirectory() as root:
+        for seed, area in enumerate(areas):
+            data = synthetic_history(seed, weeks=52 * args.years)
+            SaveArea(data, area, root, 'csv')
+            SaveArea(data, area, root, 'parquet')
+            forecast = pd.DataFrame({
+                'weekday': np.repeat(np.arange(7), 24), 'hour': np.tile(np.arange(24), 7),
+                'pred_checkins': data['check-ins'].to_numpy()[:168],
+            })
+            ColumnarStore(root).write_forecast(area, forecast)
+            with open(os.path.join(root, f"{area}_forecast.json"), 'w') as f:
+                f.write(forecast.to_json(orient='records').join(['{"location": "%s", "week_forecast": ' % area, '}']))
+
+        end = synthetic_history(0, weeks=52 * args.years)['time'].max()
+        recent = end - pd.DateOffset(months=3)
+        cases = [
+            ("history", {}),
+            ("last 3 months", dict(start=recent)),
+        ]
+
+        csv_size = sum(directory_size(os.path.join(root, f"{area}.csv")) for area in areas)
+        parquet_size = directory_size(os.path.join(root, OUTDOOR))
+        print(f"{'':>28} {'csv/json':>10} {'parquet':>10}")
+        print(f"{'history size':>28} {csv_size / 1e6:>8.2f}MB {parquet_size / 1e6:>8.2f}MB")
+
+        for name, window in cases:
+            times = []
+            for storage in ['csv', 'parquet']:
+                predictor = WeekPred(root, backend='profile', storage=storage, **window)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    times.append(best_time(lambda: [predictor.select_location(f"{area}.csv") for area in areas], args.repeat))
+            print(f"{'load ' + name:>28} {times[0] * 1000:>8.1f}ms {times[1] * 1000:>8.1f}ms")
+
+        json_size = sum(directory_size(os.path.join(root, f"{area}_forecast.json")) for area in areas)
+        forecast_size = directory_size(os.path.join(root, 'forecasts'))
+        print(f"{'forecast size':>28} {json_size / 1e3:>8.1f}kB {forecast_size / 1e3:>8.1f}kB")
+        times = []
+        for storage in ['json', 'parquet']:
+            # A fresh store per run, so every forecast is parsed again
+            times.append(best_time(lambda: ForecastStore(root, storage=storage).tables(areas), args.repeat))
+        print(f"{'load forecasts':>28} {times[0] * 1000:>8.1f}ms {times[1] * 1000:>8.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Row-wise and string-based time handling against the vectorized timefeatures pipeline.
+
+On --years years of hourly data for --locations locations, times:
+
+    outdoor timestamps  str.replace of 'T' and '.000Z' then parsing, against parse_utc
+    unisport days       parse, strftime and parse again plus the hour, against parse_days
+    weekday/hour        the .dt accessors, against integer arithmetic on epoch hours
+    forecast records    iterrows over the 168 predictions of every location, against zipped lists
+
+    python -m benchmarks.bench_timefeatures [--years Y] [--locations N] [--repeat R]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.models.timefeatures import parse_days, parse_utc, weekday_hour
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def legacy_records(predictions):
+    predictions['weekday'] = predictions['time'].dt.dayofweek
+    predictions['hour'] = predictions['time'].dt.hour
+    return [
+        {"weekday": int(row['weekday']), "hour": int(row['hour']), "pred_checkins": float(row['check-ins'])}
+        for _, row in predictions.iterrows()
+    ]
+
+def records(predictions):
+    weekdays, hours = weekday_hour(predictions['time'])
+    predictions['weekday'], predictions['hour'] = weekdays, hours
+    return [
+        {"weekday": weekday, "hour": hour, "pred_checkins": checkins}
+        for weekday, hour, checkins in zip(weekdays.tolist(), hours.tolist(), predictions['check-ins'].to_numpy(dtype=float).tolist())
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=3, help="Years of hourly data per location")
+    parser.add_argument("--locations", type=int, default=7, help="Number of locations")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions, the best is reported")
+    args = parser.parse_args()
+
+    hours = pd.date_range('2021-01-01', periods=365 * 24 * args.years, freq='h')
+    times = pd.Series(np.tile(hours, args.locations))
+    stamps = pd.Series(times.dt.strftime('%Y-%m-%dT%H:%M:%S.000Z'), dtype='string')
+    days = pd.Series(np.tile(hours[::24].strftime('%Y-%m-%d'), 24 * args.locations))
+    day_hours = pd.Series(np.repeat(np.arange(24), len(days) // 24))
+    predictions = pd.DataFrame({
+        'time': pd.Timestamp('1970-01-05') + pd.to_timedelta(np.arange(168), unit='h'),
+        'check-ins': np.random.default_rng(0).uniform(0, 40, 168),
+    })
+
+    cases = [
+        ("outdoor timestamps",
+         lambda: pd.to_datetime(stamps.str.replace('T', ' ').str.replace('.000Z', '')),
+         lambda: parse_utc(stamps)),
+        ("unisport days",
+         lambda: pd.to_datetime(pd.to_datetime(days).dt.strftime('%Y-%m-%d')) + pd.to_timedelta(day_hours, unit='h'),
+         lambda: (parse_days(days) + day_hours.to_numpy().astype('timedelta64[h]')).astype('datetime64[ns]')),
+        ("weekday/hour",
+         lambda: (times.dt.dayofweek.to_numpy(), times.dt.hour.to_numpy()),
+         lambda: weekday_hour(times)),
+        ("forecast records",
+         lambda: [legacy_records(predictions.copy()) for _ in range(args.locations)],
+         lambda: [records(predictions.copy()) for _ in range(args.locations)]),
+    ]
+    print(f"{len(times):,} hourly rows over {args.locations} locations")
+    print(f"{'stage':>20} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name, before, after in cases:
+        old, new = best_time(before, args.repeat), best_time(after, args.repeat)
+        print(f"{name:>20} {old * 1000:>8.1f}ms {new * 1000:>8.1f}ms {old / new:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Payload size and serialization time of the verbose JSON contract against the compact wire format.
+
+For horizons of one week, three months and one year with --slots slots per day and
+--per-week workouts a week, builds the request the frontend sends (ISO dates and the
+times of every day) and its compact form (start date, slot times and one bitmask per
+day), and the response to each: the verbose one echoes the calendar as schedule_response
+does, the compact one is compact_response of it. Reports the bytes of both, raw and
+gzipped as the app compresses them, and the server-side time of decoding the request and
+encoding the response, including expand_request and compact_response for the compact one,
+without and with gzipping the response for a client that accepts it.
+
+    python -m benchmarks.bench_wire [--slots N] [--per-week N] [--repeat R]
+"""
+import argparse
+import datetime
+import gzip
+import json
+import time
+from src.models.registry import active_locations, display_name
+from src.models.wire import compact_response, expand_request
+
+HORIZONS = [("1 week", 7), ("3 months", 91), ("1 year", 365)]
+# As the app compresses responses, see compress_response
+GZIP_LEVEL = 6
+
+def payloads(days, slots, per_week):
+    """The verbose and compact request bodies and the verbose response body of a calendar."""
+    start = datetime.date(2024, 1, 1)
+    slot_times = [f"{hour:02d}:00" for hour in range(8, 8 + slots)]
+    # Every other slot on weekends, all of them on weekdays
+    masks = [(1 << slots) - 1 if (start + datetime.timedelta(days=day)).weekday() < 5 else int("01" * slots, 2) & ((1 << slots) - 1)
+             for day in range(days)]
+    n = max(1, per_week * days // 7)
+    compact = {"start": str(start), "slots": slot_times, "mask": masks, "n": n}
+    verbose, _ = expand_request(compact)
+
+    locations = active_locations()
+    step = max(1, days // n)
+    solution = [
+        (str(start + datetime.timedelta(days=day)), slot_times[day % slots], display_name(locations[day % len(locations)]))
+        for day in range(0, days, step)
+    ][:n]
+    body = {
+        "message": "Schedule received successfully!",
+        "received_times": verbose["times"],
+        "received_days": verbose["days"],
+        "n": n,
+        "solution": solution,
+        "optimal": True,
+        "gap": 0.0,
+    }
+    return verbose, compact, body
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, default=8, help="Slots per day")
+    parser.add_argument("--per-week", type=int, default=4, help="Workouts per week")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions, the best is reported")
+    args = parser.parse_args()
+    locations = active_locations()
+
+    print(f"{'horizon':>9} {'format':>8} {'request':>9} {'gzipped':>8} {'response':>9} {'gzipped':>8} {'server':>9} {'+gzip':>9}")
+    for name, days in HORIZONS:
+        verbose, compact, body = payloads(days, args.slots, args.per_week)
+        verbose_request, compact_request = json.dumps(verbose).encode(), json.dumps(compact).encode()
+
+        def verbose_server():
+            json.loads(verbose_request)
+            return json.dumps(body).encode()
+
+        def compact_server():
+            schedule_data, _ = expand_request(json.loads(compact_request))
+            return json.dumps(compact_response(body, compact, locations)).encode()
+
+        rows = []
+        for label, request, server in (("verbose", verbose_request, verbose_server), ("compact", compact_request, compact_server)):
+            response = server()
+            seconds = best_time(server, args.repeat)
+            gzipped = best_time(lambda: gzip.compress(server(), GZIP_LEVEL), args.repeat)
+            rows.append((len(request) + len(response), seconds, gzipped))
+            print(f"{name:>9} {label:>8} {len(request):>8}B {len(gzip.compress(request, GZIP_LEVEL)):>7}B "
+                  f"{len(response):>8}B {len(gzip.compress(response, GZIP_LEVEL)):>7}B "
+                  f"{seconds * 1e6:>7.0f}us {gzipped * 1e6:>7.0f}us")
+        (verbose_bytes, verbose_seconds, verbose_gzipped), (compact_bytes, compact_seconds, compact_gzipped) = rows
+        print(f"{name:>9} {'ratio':>8} {verbose_bytes / compact_bytes:>8.1f}x fewer bytes, server time "
+              f"{verbose_seconds / compact_seconds:.1f}x, with gzip {verbose_gzipped / compact_gzipped:.1f}x")
+
+if __name__ == "__main__":
+    main()
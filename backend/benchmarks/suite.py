@@ -0,0 +1,213 @@
+"""
+Benchmark suite of the whole scheduling pipeline, with results compared to a stored baseline.
+
+Every case is a synthetic request (see benchmarks.workload) that varies one of days,
+slots per day, locations, n and the forecast distribution around a base case, which
+gives a scaling curve per dimension. For each case the best time of --repeat runs is
+taken for the stages
+
+    encode   CompactEncoder and the soft clauses, as encode_schedule builds them
+    solve    Scheduler.solve_schedule
+    decode   decoding the chosen literals
+    e2e      POST /api/schedule through the Flask test client, with an empty cache
+
+and the peak memory of encode, solve and decode is measured with tracemalloc in a
+separate run. Results are written as JSON. With --baseline, every stage and the peak
+memory are compared to the baseline after scaling its times by the machines'
+calibration loop, and the suite exits with status 1 if any of them regressed by more
+than --tolerance.
+
+    python -m benchmarks.suite [--quick] [--repeat R] [--output FILE]
+                               [--baseline FILE] [--save-baseline] [--tolerance T]
+"""
+import argparse
+import functools
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from benchmarks.workload import DISTRIBUTIONS, make_request, write_forecasts
+from src.models import encoder as encoder_module
+from src.models.encoder import CompactEncoder
+from src.models.forecast_store import ForecastStore
+from src.models.scheduler import Scheduler
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STAGES = ["encode", "solve", "decode", "e2e"]
+MAX_LOCATIONS = 8
+
+BASE_CASE = {"days": 28, "slots": 8, "locations": 4, "n": 8, "distribution": "testcounts"}
+CURVES = {
+    "days": [7, 28, 91, 182],
+    "slots": [4, 8, 16],
+    "locations": [2, 4, 8],
+    "n": [2, 8, 32],
+    "distribution": DISTRIBUTIONS,
+}
+QUICK_CURVES = {"days": [7, 28], "locations": [2, 4], "distribution": ["testcounts", "flat"]}
+# Stage times below this many seconds are too noisy to flag as regressions
+MIN_REGRESSION = 0.001
+
+def cases(curves):
+    """The base case varied along each curve, every case once."""
+    seen = {}
+    for dimension, values in curves.items():
+        for value in values:
+            params = {**BASE_CASE, dimension: value}
+            name = "-".join(f"{key}={params[key]}" for key in BASE_CASE)
+            seen.setdefault(name, params)
+    return seen
+
+def calibrate(repeat=5):
+    """Best time of a fixed workload, to compare times measured on different machines."""
+    values = np.arange(100_000)
+    def workload():
+        sum(i * i for i in range(200_000))
+        np.sort(values[::-1])
+    return best_time(workload, repeat)
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def encode(body, locations):
+    encoder = CompactEncoder(body["days"], body["times"], locations)
+    lits, _, groups, days = encoder.get_encoded_values()
+    return encoder, lits, encoder.soft_clauses(), groups, days
+
+def solve(lits, soft, groups, days, n):
+    scheduler = Scheduler()
+    scheduler.set_lits(lits)
+    scheduler.set_soft(soft)
+    scheduler.set_hard(groups)
+    scheduler.set_penalty(days)
+    return scheduler.solve_schedule(n)[1]
+
+def pipeline(body, locations):
+    encoder, lits, soft, groups, days = encode(body, locations)
+    model = solve(lits, soft, groups, days, body["n"])
+    return encoder.decode_list(encoder.get_positive_intersection(lits, model))
+
+def run_case(params, locations, app_module, repeat):
+    body = make_request(params["days"], params["slots"], params["n"], np.random.default_rng(0))
+    encoder, lits, soft, groups, days = encode(body, locations)
+    model = solve(lits, soft, groups, days, body["n"])
+
+    # The app encodes with its module-level ENCODER and locations
+    app_module.ENCODER = functools.partial(app_module.ENCODER, available_locations=locations)
+    app_module.locations = locations
+    client = app_module.app.test_client()
+    def end_to_end():
+        app_module.schedule_cache.clear()
+        response = client.post("/api/schedule", json=body)
+        assert response.status_code == 200, response.get_json()
+
+    stages = {
+        "encode": best_time(lambda: encode(body, locations), repeat),
+        "solve": best_time(lambda: solve(lits, soft, groups, days, body["n"]), repeat),
+        "decode": best_time(lambda: encoder.decode_list(encoder.get_positive_intersection(lits, model)), repeat),
+        "e2e": best_time(end_to_end, repeat),
+    }
+    app_module.ENCODER = app_module.ENCODER.func
+
+    gc.collect()
+    tracemalloc.start()
+    pipeline(body, locations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"params": params, "lits": len(lits), "stages": stages, "peak_bytes": peak}
+
+def import_app(data_path):
+    """Import the Flask app from src/ reading forecasts from data_path, without the startup warm-up."""
+    os.environ["FORECAST_DATA_PATH"] = data_path
+    os.environ["SCHEDULER_WARMUP"] = "0"
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+    # Only the suite's own table on stdout
+    logging.getLogger("app").setLevel(logging.WARNING)
+    import app
+    return app
+
+def run(curves, repeat):
+    results = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "calibration": calibrate()},
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory() as data_path:
+        locations = {
+            distribution: write_forecasts(data_path, distribution, MAX_LOCATIONS, seed)
+            for seed, distribution in enumerate(DISTRIBUTIONS)
+        }
+        encoder_module.forecast_store = ForecastStore(data_path)
+        app_module = import_app(data_path)
+
+        print(f"{'case':>60} {'lits':>7} " + " ".join(f"{stage:>9}" for stage in STAGES) + f" {'peak mem':>9}")
+        for name, params in cases(curves).items():
+            case_locations = locations[params["distribution"]][:params["locations"]]
+            result = results["cases"][name] = run_case(params, case_locations, app_module, repeat)
+            print(f"{name:>60} {result['lits']:>7} "
+                  + " ".join(f"{result['stages'][stage] * 1000:>7.2f}ms" for stage in STAGES)
+                  + f" {result['peak_bytes'] / 1e6:>7.2f}MB")
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results to a baseline.
+
+    Returns:
+        list: (case, metric, baseline value, current value) of every regression.
+    """
+    # Times of the baseline as they would be on this machine
+    scale = results["machine"]["calibration"] / baseline["machine"]["calibration"]
+    regressions = []
+    for name, result in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        for stage, seconds in result["stages"].items():
+            expected = base["stages"].get(stage, float('inf')) * scale
+            if seconds > expected * (1 + tolerance) and seconds - expected > MIN_REGRESSION:
+                regressions.append((name, stage, expected, seconds))
+        if result["peak_bytes"] > base["peak_bytes"] * (1 + tolerance):
+            regressions.append((name, "peak_bytes", base["peak_bytes"], result["peak_bytes"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Only a few short curves")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, the best is reported")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help=f"Compare to this results file, e.g. {os.path.relpath(BASELINE)}")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write the results to {os.path.relpath(BASELINE)}")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown or memory growth")
+    args = parser.parse_args()
+
+    results = run(QUICK_CURVES if args.quick else CURVES, args.repeat)
+    for path in [args.output, BASELINE if args.save_baseline else None]:
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, metric, expected, value in regressions:
+            print(f"REGRESSION {name} {metric}: {expected:.6g} -> {value:.6g}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+    main()
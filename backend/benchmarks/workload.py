@@ -0,0 +1,83 @@
+"""
+Synthetic schedule requests and forecast files for the benchmarks.
+
+Forecasts are written in the `<location>_forecast.json` format of WeekPred.preds_to_json.
+Their weekday-hour profile comes from one of DISTRIBUTIONS:
+
+    testcounts  the mean profile of src/models/testcounts.csv, scaled and jittered per location
+    uniform     independent uniform check-ins, so few slots tie
+    flat        the same check-ins everywhere, so every slot ties
+    heavy       lognormal check-ins with a long tail
+"""
+import datetime
+import json
+import os
+import numpy as np
+
+TESTCOUNTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "models", "testcounts.csv")
+DISTRIBUTIONS = ["testcounts", "uniform", "flat", "heavy"]
+# Hours a synthetic request may offer slots in
+OPENING_HOURS = range(6, 23)
+
+def testcounts_profile():
+    """Mean check-ins of testcounts.csv by (weekday, hour), as a 7x24 array."""
+    profile = np.zeros((7, 24))
+    counts = np.zeros((7, 24))
+    with open(TESTCOUNTS) as f:
+        next(f)  # header: ds,y
+        for line in f:
+            stamp, value = line.strip().split(',')
+            moment = datetime.datetime.fromisoformat(stamp)
+            profile[moment.weekday(), moment.hour] += float(value)
+            counts[moment.weekday(), moment.hour] += 1
+    return profile / np.maximum(counts, 1)
+
+def synthetic_forecast(distribution, rng):
+    """A 7x24 table of predicted check-ins drawn from one of DISTRIBUTIONS."""
+    if distribution == "testcounts":
+        scale = rng.uniform(0.5, 2.0)
+        return np.maximum(testcounts_profile() * scale + rng.normal(0, 1.5, (7, 24)), 0)
+    if distribution == "uniform":
+        return rng.uniform(0, 60, (7, 24))
+    if distribution == "flat":
+        return np.full((7, 24), 20.0)
+    if distribution == "heavy":
+        return rng.lognormal(2.0, 1.0, (7, 24))
+    raise ValueError(f"Unknown distribution '{distribution}', expected one of {DISTRIBUTIONS}.")
+
+def location_names(distribution, count):
+    """Location names of a distribution, distinct between distributions so they can share a data directory."""
+    return [f"{distribution}{idx}" for idx in range(count)]
+
+def write_forecasts(data_path, distribution, count, seed=0):
+    """
+    Write forecast files for count locations.
+
+    Returns:
+        list: The location names.
+    """
+    rng = np.random.default_rng(seed)
+    names = location_names(distribution, count)
+    for location in names:
+        table = synthetic_forecast(distribution, rng)
+        week_forecast = [
+            {"weekday": weekday, "hour": hour, "pred_checkins": float(table[weekday, hour])}
+            for weekday in range(7) for hour in range(24)
+        ]
+        with open(os.path.join(data_path, f"{location}_forecast.json"), 'w') as f:
+            json.dump({"location": location, "week_forecast": week_forecast}, f)
+    return names
+
+def make_request(days, slots, n, rng, start=datetime.date(2024, 1, 1)):
+    """
+    A request body for /api/schedule with `slots` random hours on each of `days` consecutive days.
+
+    Args:
+        rng (numpy.random.Generator): Source of the slot hours.
+    """
+    dates = [f"{start + datetime.timedelta(days=day)}T00:00:00.000Z" for day in range(days)]
+    times = [
+        [f"{hour:02d}:00" for hour in sorted(rng.choice(list(OPENING_HOURS), size=min(slots, len(OPENING_HOURS)), replace=False))]
+        for _ in range(days)
+    ]
+    return {"days": dates, "times": times, "n": n}
@@ -1,101 +1,683 @@
+import time
+# Start of the app import, for the cold start time reported after the warm-up
+IMPORT_START = time.perf_counter()
+import datetime
+import gzip
 import os
+import json
+import logging
 import random
-import math
-from flask import Flask, jsonify, request
+import threading
+from contextlib import contextmanager
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from models.scheduler import Scheduler
-from models.encoder import Encoder
+from models.scheduler import Scheduler, prune_dominated
+from models.encoder import CompactEncoder, Encoder, locations
+from models.forecast_store import RISKS, forecast_store
+from models.schedule_cache import ScheduleCache
+from models.solver_pool import PoolFull, SolverPool
+from models.metrics import metrics, profiled, span
+from models.occupancy import OccupancyLedger
+from models.registry import display_name, travel_km, weighted_costs
+from models.replan import plan_window
+from models.wire import compact_response, expand_request, is_compact
+
+# SCHEDULER_DEBUG=1 logs every literal, clause and model; by default only warnings and errors of the pipeline
+DEBUG = os.environ.get("SCHEDULER_DEBUG") == "1"
+# SCHEDULER_ENCODER=dict uses the dict-backed Encoder instead of the array-backed CompactEncoder
+ENCODER = Encoder if os.environ.get("SCHEDULER_ENCODER") == "dict" else CompactEncoder
+# SCHEDULER_WARMUP=0 skips loading the forecasts and running a warm-up solve at startup
+WARMUP = os.environ.get("SCHEDULER_WARMUP", "1") == "1"
+# SCHEDULER_PROFILE=1 lets a request ask for a cProfile report with ?profile=1
+PROFILING = os.environ.get("SCHEDULER_PROFILE") == "1"
+# SCHEDULER_OCCUPANCY_DB=<file> shares the booked slots between worker processes, by default each process has its own
+OCCUPANCY_DB = os.environ.get("SCHEDULER_OCCUPANCY_DB") or None
+# SCHEDULER_PRUNE=0 keeps the literals no optimal schedule needs, see prune_dominated
+PRUNE = os.environ.get("SCHEDULER_PRUNE", "1") == "1"
+# SCHEDULER_INCREMENTAL=0 solves every request on a new Scheduler instead of the warm solvers of warm_scheduler
+INCREMENTAL = os.environ.get("SCHEDULER_INCREMENTAL", "1") == "1"
+# SCHEDULER_TIMEOUT=<seconds> bounds every solve, a request may ask for less with 'timeout'
+SOLVE_TIMEOUT = float(os.environ.get("SCHEDULER_TIMEOUT", "10"))
+logging.basicConfig(level=logging.DEBUG if DEBUG else logging.WARNING,
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, resources={r"*": {"origins": "*"}})
 
-scheduler = Scheduler()
+# Solutions of recent requests, dropped whenever a forecast file is regenerated or a schedule booked
+schedule_cache = ScheduleCache()
+# Slots booked by our users, added to the forecast load of every request
+occupancy = OccupancyLedger(OCCUPANCY_DB)
+# Incremental scheduler of this process, so requests for the same calendar reuse its warm solvers, see scheduler_for
+warm_scheduler = Scheduler(incremental=True)
+warm_scheduler_lock = threading.Lock()
+# Worker processes for /api/schedule/jobs, see get_solver_pool
+solver_pool = None
+solver_pool_lock = threading.Lock()
+# Set once the first /api/schedule request has been answered, see receive_schedule
+first_request_served = threading.Event()
+# Longest a poll request may block waiting for its job
+MAX_POLL_WAIT = 30
+# Largest number of schedules in one /api/schedule/batch request
+MAX_BATCH = 500
+# Worker processes solving a batch, None for one per core
+BATCH_WORKERS = None
+# Load added to a slot for every booking in the occupancy ledger, and for every other user of a capacity-aware batch booked into it
+CAPACITY_WEIGHT = 1
+# Largest number of alternative schedules a request may ask for
+MAX_ALTERNATIVES = 10
+# Default weights of a slot's cost per check-in and per kilometre from the user's origin
+CROWD_WEIGHT = 1
+TRAVEL_WEIGHT = 5
+# Smallest JSON response body gzipped for clients that accept it, and the compression level
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+@app.after_request
+def compress_response(response):
+    """Gzip JSON responses of at least GZIP_MIN_BYTES when the client accepts gzip. Streamed responses are left as they are."""
+    if (response.mimetype != "application/json" or response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers or not request.accept_encodings["gzip"]):
+        return response
+    data = response.get_data()
+    if len(data) >= GZIP_MIN_BYTES:
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
 
 @app.route('/')
 def home():
     return jsonify({"message": "Welcome to the Flask API!"})
 
-# Endpoint to receive schedule
+def schedule_response(times, days, n, solution):
+    """Prepare the response including the decoded values."""
+    return {
+        "message": "Schedule received successfully!",
+        "received_times": times,
+        "received_days": days,
+        "n": n,
+        "solution": solution  # Include the decoded values in the response
+    }
+
+def parse_schedule_request(schedule_data):
+    """Read times, days and n from a request body, returning an error message if they are invalid."""
+    with span("parse"):
+        return validate_schedule_request(schedule_data)
+
+def validate_schedule_request(schedule_data):
+    times = schedule_data.get("times", [])
+    days = schedule_data.get("days", [])
+    n = schedule_data.get("n", 0)
+
+    # Validate input data
+    if not isinstance(days, list) or not isinstance(times, list):
+        return times, days, n, "Days and times must be lists."
+
+    if not isinstance(n, int) or n <= 0:
+        return times, days, n, "Invalid value for n. It must be a positive integer."
+    return times, days, n, None
+
+def parse_alternatives(schedule_data):
+    """Read the optional number of alternative schedules and their minimum distance from a request body."""
+    count = schedule_data.get("alternatives", 1)
+    min_distance = schedule_data.get("min_distance", 1)
+    if not isinstance(count, int) or not 1 <= count <= MAX_ALTERNATIVES:
+        return count, min_distance, f"Invalid value for alternatives. It must be an integer from 1 to {MAX_ALTERNATIVES}."
+    if not isinstance(min_distance, int) or min_distance <= 0:
+        return count, min_distance, "Invalid value for min_distance. It must be a positive integer."
+    return count, min_distance, None
+
+def parse_risk(schedule_data):
+    """Read the optional risk measure the check-ins are weighted by from a request body."""
+    risk = schedule_data.get("risk", "mean")
+    if risk not in RISKS:
+        return risk, f"Invalid value for risk. It must be one of {', '.join(RISKS)}."
+    return risk, None
+
+def parse_timeout(schedule_data):
+    """Read the optional solve time limit in seconds from a request body, at most SOLVE_TIMEOUT."""
+    timeout = schedule_data.get("timeout")
+    if timeout is None:
+        return SOLVE_TIMEOUT, None
+    if not isinstance(timeout, (int, float)) or isinstance(timeout, bool) or timeout <= 0:
+        return timeout, "Invalid value for timeout. It must be a positive number of seconds."
+    return min(timeout, SOLVE_TIMEOUT), None
+
+def solve_status(scheduler):
+    """Whether the last solve of a scheduler proved its schedule optimal, and its optimality gap."""
+    return {"optimal": scheduler.optimal, "gap": round(scheduler.gap, 4)}
+
+def parse_objective(schedule_data):
+    """
+    Read the optional user 'origin' {"lat", "lon"} and objective 'weights' {"crowd", "travel"} from a request body.
+
+    Returns:
+        tuple: (objective, error) with the objective a dict of 'origin' as (lat, lon) or None and
+        the 'crowd' and 'travel' weights, or None when the request keeps the default costs.
+    """
+    origin = schedule_data.get("origin")
+    weights = schedule_data.get("weights", {})
+    if origin is not None:
+        if not isinstance(origin, dict) or not all(
+            isinstance(origin.get(key), (int, float)) and not isinstance(origin.get(key), bool) for key in ("lat", "lon")
+        ):
+            return None, "Invalid value for origin. It must be an object with numeric lat and lon."
+        if not -90 <= origin["lat"] <= 90 or not -180 <= origin["lon"] <= 180:
+            return None, "Invalid value for origin. lat must be within [-90, 90] and lon within [-180, 180]."
+        origin = (float(origin["lat"]), float(origin["lon"]))
+    if not isinstance(weights, dict) or set(weights) - {"crowd", "travel"}:
+        return None, "Invalid value for weights. It must be an object with crowd and travel weights."
+    crowd, travel = weights.get("crowd", CROWD_WEIGHT), weights.get("travel", TRAVEL_WEIGHT)
+    for value in (crowd, travel):
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+            return None, "Invalid value for weights. They must be non-negative numbers."
+    if not crowd:
+        return None, "Invalid value for weights. The crowd weight must be positive."
+    if origin is None and crowd == CROWD_WEIGHT:
+        return None, None
+    return {"origin": origin, "crowd": crowd, "travel": travel}, None
+
+def cache_key_for(times, days, n, risk='mean', objective=None):
+    """Cache key of a request under the current forecasts and bookings."""
+    forecast_version = forecast_store.version(locations) + (occupancy.generation(),)
+    schedule_cache.sync_version(forecast_version)
+    return ScheduleCache.make_key(days, times, n, locations, forecast_version, risk, objective)
+
+def encode_schedule(times, days, risk='mean', objective=None):
+    """
+    Encode a request into a schedule problem, weighting the literals by a risk measure of their
+    check-ins and, with an objective from parse_objective, by the travel from the user's origin.
+
+    Returns:
+        tuple: (encoder, problem) with the problem as a dict of the Scheduler setter arguments,
+        or (None, error message) if nothing could be encoded.
+    """
+    encoder = ENCODER(days, times, risk=risk)
+
+    lits, lits_weighted, hard_clauses, dates = encoder.get_encoded_values()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Encoded Values: %s", lits)
+        logger.debug("Hard clauses: %s", hard_clauses)
+        logger.debug("Dates: %s", dates)
+
+    if not lits:
+        return None, "No valid literals generated."
+
+    if not lits_weighted:
+        return None, "lits_weighted not generated."
+
+    # Check-ins rounded up to integer weights, precomputed per forecast version and risk measure
+    lits_weighted = weigh_objective(encoder, add_bookings(encoder, encoder.soft_clauses()), objective)
+
+    # lits_weighted_mock = [(-q, random.randint(1, 100)) for q in lits] ## For testing
+    #print("Mock Weighted Values:", lits_weighted_mock)
+
+    logger.debug("Modified Weighted Values: %s", lits_weighted)
+    return encoder, {"lits": lits, "soft": lits_weighted, "hard": hard_clauses, "penalty": dates}
+
+def add_bookings(encoder, soft):
+    """
+    Add CAPACITY_WEIGHT to the cost of a slot for each of its bookings in the occupancy ledger.
+    Slots of cost 0 are forbidden (a soft clause of weight 0 is hard) and stay at 0.
+    """
+    with span("occupancy", lits=len(soft)) as record:
+        dates = {encoder.parse_iso_format(date_str)[0] for date_str in encoder.available_dates}
+        booked = {}
+        for slot, count in occupancy.bookings(dates).items():
+            literal = encoder.encode(slot)
+            if literal is not None:
+                booked[literal] = count
+        record["booked"] = len(booked)
+        if not booked:
+            return soft
+        return [(cost + CAPACITY_WEIGHT * booked[lit] if cost and lit in booked else cost, lit) for cost, lit in soft]
+
+def weigh_objective(encoder, soft, objective):
+    """Cost of each literal as crowd weight times its cost plus travel weight times the kilometres to its location, see weighted_costs."""
+    if objective is None:
+        return soft
+    literals = [lit for _, lit in soft]
+    km = None
+    if objective["origin"] is not None:
+        km = travel_km(objective["origin"], encoder.available_locations)[encoder.location_indices(literals)]
+    costs = weighted_costs([cost for cost, _ in soft], km, objective["crowd"], objective["travel"])
+    return list(zip(costs.tolist(), literals))
+
+def prune(problem, n):
+    """The problem without the literals no optimal schedule of n workouts needs, unless PRUNE is off."""
+    return prune_dominated(problem, n) if PRUNE else problem
+
+@contextmanager
+def scheduler_for(problem):
+    """
+    A scheduler set up with a problem from encode_schedule.
+
+    This is the process's incremental warm_scheduler whenever no other request is solving
+    on it, and a new Scheduler otherwise or with INCREMENTAL off, so concurrent requests
+    never share solver state and never wait for each other.
+    """
+    warm = INCREMENTAL and warm_scheduler_lock.acquire(blocking=False)
+    scheduler = warm_scheduler if warm else Scheduler()
+    try:
+        scheduler.set_lits(problem["lits"])
+        scheduler.set_penalty(problem["penalty"])
+        scheduler.set_soft(problem["soft"])
+        scheduler.set_hard(problem["hard"])
+        yield scheduler
+    finally:
+        if warm:
+            warm_scheduler_lock.release()
+
+def booked_slots(encoder, lits, model):
+    """The (date, time, location) slots a model schedules, as the occupancy ledger keys them."""
+    return [encoder.decode(lit) for lit in sorted(encoder.get_positive_intersection(lits, model))]
+
+def decode_schedule(encoder, lits, model):
+    """Decode a model into (date, time, location) entries with display names."""
+    return decode_schedules(encoder, lits, [model])[0]
+
+def decode_schedules(encoder, lits, models):
+    """Decode several models with a single decode_list call, see decode_schedule."""
+    with span("decode", lits=len(lits), models=len(models)):
+        intersections = [encoder.get_positive_intersection(lits, model) for model in models]
+        logger.debug("Positive Intersections: %s", intersections)
+
+        decoded_vals = encoder.decode_list([lit for intersection in intersections for lit in intersection])
+        modified_decoded_vals = [
+            (decoded_val[0], decoded_val[1], display_name(decoded_val[2])) for decoded_val in decoded_vals
+        ]
+
+        # Split the decoded entries back into one schedule per model
+        schedules, offset = [], 0
+        for intersection in intersections:
+            schedules.append(modified_decoded_vals[offset:offset + len(intersection)])
+            offset += len(intersection)
+
+    logger.debug("Decoded Values: %s", schedules)
+    return schedules
+
+# Endpoint to receive schedule, ?profile=1 adds a cProfile report when SCHEDULER_PROFILE=1
 @app.route('/api/schedule', methods=['POST'])
 def receive_schedule():
-    try:
+    metrics.start_trace()
+    start = time.perf_counter()
+    with profiled(PROFILING and request.args.get("profile") == "1") as capture:
         schedule_data = request.get_json()
+        if is_compact(schedule_data):
+            body, status = solve_compact_request(schedule_data)
+        else:
+            body, status = solve_schedule_request(schedule_data)
+    seconds = time.perf_counter() - start
+    metrics.observe("request", seconds)
+    if not first_request_served.is_set():
+        first_request_served.set()
+        metrics.observe("first_request", seconds)
+        logger.info("First schedule request served in %.1fms.", seconds * 1000)
+    trace = metrics.finish_trace()
+    logger.debug("Request spans: %s", trace)
+    if "stats" in capture:
+        body = {**body, "spans": trace, "profile": capture["stats"]}
+    return jsonify(body), status
 
-        times = schedule_data.get("times", [])
-        days = schedule_data.get("days", [])
-        n = schedule_data.get("n", 0)  
+def solve_schedule_request(schedule_data):
+    """Solve one schedule request, returning the response body and status code."""
+    try:
+        times, days, n, error = parse_schedule_request(schedule_data)
+        if not error:
+            count, min_distance, error = parse_alternatives(schedule_data)
+        if not error:
+            risk, error = parse_risk(schedule_data)
+        if not error:
+            objective, error = parse_objective(schedule_data)
+        if not error:
+            timeout, error = parse_timeout(schedule_data)
+        book = schedule_data.get("book", False)
+        if not error and not isinstance(book, bool):
+            error = "Invalid value for book. It must be a boolean."
+        if not error and book and count > 1:
+            error = "Only a single schedule can be booked, not alternatives."
+        if error:
+            return {"error": error}, 400
+        if count > 1:
+            return solve_alternatives_request(times, days, n, count, min_distance, risk, objective, timeout)
 
-        # Validate input data
-        if not isinstance(days, list) or not isinstance(times, list):
-            return jsonify({"error": "Days and times must be lists."}), 400
-        
-        if not isinstance(n, int) or n <= 0:
-            return jsonify({"error": "Invalid value for n. It must be a positive integer."}), 400
+        # Serve repeated requests from the cache while the forecasts and bookings are unchanged
+        cache_key = cache_key_for(times, days, n, risk, objective)
+        cached_solution = None if book else schedule_cache.get(cache_key)
+        if cached_solution is not None:
+            return {**schedule_response(times, days, n, cached_solution), "optimal": True, "gap": 0.0}, 200
 
-        encoder = Encoder(days, times)
+        encoder, problem = encode_schedule(times, days, risk, objective)
+        if encoder is None:
+            return {"error": problem}, 400
+        problem = prune(problem, n)
 
-        lits, lits_weighted, hard_clauses, dates = encoder.get_encoded_values()
-        print("Encoded Values:", lits)  # Print the encoded values
-        print("Hard clauses:", hard_clauses)
-        print("Dates", dates)
+        with scheduler_for(problem) as scheduler:
+            cost, model = scheduler.solve_schedule(n, timeout=timeout)
+            status = solve_status(scheduler)
         
-        if not lits:
-            return jsonify({"error": "No valid literals generated."}), 400
+        logger.debug("Cost: %s, model found: %s", cost, model)
 
-        if not lits_weighted:
-            return jsonify({"error": "lits_weighted not generated."}), 400
-        
-        lits_weighted = list(lits_weighted.values())
+        modified_decoded_vals = decode_schedule(encoder, problem["lits"], model)
+        body = {**schedule_response(times, days, n, modified_decoded_vals), **status}
+        if book:
+            # Booking changes the ledger generation, so the solution would never be served from the cache
+            slots = booked_slots(encoder, problem["lits"], model)
+            occupancy.book(slots)
+            return {**body, "booking": [list(slot) for slot in slots]}, 200
+        # Only proven optimal schedules are cached, one cut short by the timeout may be improved on retry
+        if status["optimal"]:
+            schedule_cache.put(cache_key, modified_decoded_vals)
 
-        # Map the first element of each tuple to the next nearest integer and convert it to float
-        lits_weighted = [(int(math.ceil(weight)), count) for weight, count in lits_weighted]
+        return body, 200
 
-        # lits_weighted_mock = [(-q, random.randint(1, 100)) for q in lits] ## For testing
-        #print("Mock Weighted Values:", lits_weighted_mock)
+    except Exception as e:
+        logger.exception('Error processing request: %s', e)
+        return {"error": "Invalid data", "details": str(e)}, 400
 
-        print("Modified Weighted Values:", lits_weighted)
+def solve_compact_request(compact_data):
+    """Solve one request in the compact wire format, see models.wire, returning the compact response body and status code."""
+    with span("parse_compact"):
+        schedule_data, error = expand_request(compact_data)
+    if error:
+        return {"error": error}, 400
+    body, status = solve_schedule_request(schedule_data)
+    if status != 200:
+        return body, status
+    return compact_response(body, compact_data, locations), 200
 
-        scheduler.set_lits(lits)
-        scheduler.set_penalty(dates)
-        scheduler.set_soft(lits_weighted)
-        scheduler.set_hard(hard_clauses)
+def solve_alternatives_request(times, days, n, count, min_distance, risk='mean', objective=None, timeout=None):
+    """
+    Solve a request for several alternative schedules, the cheapest one first. The literals are
+    not pruned, as the alternatives after the first may need them. When the timeout cuts the
+    enumeration short, the alternatives found so far are returned with optimal false.
+    """
+    encoder, problem = encode_schedule(times, days, risk, objective)
+    if encoder is None:
+        return {"error": problem}, 400
 
-        cost, model = scheduler.solve_schedule(n)
-        
-        # Print the cost and found model
-        print("Cost:", cost)
-        print("Model Found:", model)
+    scheduler = Scheduler()
+    scheduler.set_lits(problem["lits"])
+    scheduler.set_penalty(problem["penalty"])
+    scheduler.set_soft(problem["soft"])
+    scheduler.set_hard(problem["hard"])
 
-        positive_intersection = encoder.get_positive_intersection(lits, model)
-        print("Positive Intersection:", positive_intersection)  # Print the positive intersection
-        
-        decoded_vals = encoder.decode_list(positive_intersection)
-        modified_decoded_vals = [
-        (
-            decoded_val[0],
-            decoded_val[1],
-            f"{decoded_val[2].capitalize() if decoded_val[2].lower() != 'toolo' else 'Töölö'}"
-            f"{' (Outdoor gym)' if decoded_val[2] in ['Hietaniemi', 'Paloheinä', 'Pirkkola'] else ' (Unisport)'}"
-        )
-        for decoded_val in decoded_vals
-        ]   
-
-        print("Decoded Values:", modified_decoded_vals)  # Print the decoded values
-
-        # Prepare the response including the decoded values
-        response = {
-            "message": "Schedule received successfully!",
-            "received_times": times,
-            "received_days": days,
-            "n": n,
-            "solution": modified_decoded_vals  # Include the decoded values in the response
-        }
-        return jsonify(response), 200
+    found = scheduler.solve_alternatives(n, count, min_distance, timeout=timeout)
+    if not found:
+        return {"error": "No valid schedule found."}, 400
+    schedules = decode_schedules(encoder, problem["lits"], [model for _, model in found])
+
+    body = {**schedule_response(times, days, n, schedules[0]), **solve_status(scheduler)}
+    body["alternatives"] = [{"cost": cost, "solution": schedule} for (cost, _), schedule in zip(found, schedules)]
+    return body, 200
+
+def batch_lines(schedule_requests, capacity):
+    """
+    Solve a batch of schedule requests, yielding one JSON line per request as it finishes.
+
+    Requests with the same calendar share one Encoder, so its mappings and forecast lookups
+    are built once, and identical problems are solved once by Scheduler.solve_batch.
+    """
+    # Calendar key -> (encoder, problem or error), shared by requests with the same days and times
+    encoded = {}
+    pending = []  # (index, times, days, n, cache key, encoder, problem)
+    for index, schedule_data in enumerate(schedule_requests):
+        try:
+            times, days, n, error = parse_schedule_request(schedule_data)
+            if not error:
+                risk, error = parse_risk(schedule_data)
+            if not error:
+                objective, error = parse_objective(schedule_data)
+            if error:
+                yield json.dumps({"index": index, "error": error}) + "\n"
+                continue
+
+            cache_key = cache_key_for(times, days, n, risk, objective)
+            cached_solution = None if capacity else schedule_cache.get(cache_key)
+            if cached_solution is not None:
+                yield json.dumps({"index": index, **schedule_response(times, days, n, cached_solution),
+                                  "optimal": True, "gap": 0.0}) + "\n"
+                continue
+
+            calendar = cache_key_for(times, days, 0, risk, objective)
+            if calendar not in encoded:
+                encoded[calendar] = encode_schedule(times, days, risk, objective)
+            encoder, problem = encoded[calendar]
+            if encoder is None:
+                yield json.dumps({"index": index, "error": problem}) + "\n"
+                continue
+            if len(problem["lits"]) < n:
+                yield json.dumps({"index": index, "error": f"Cannot schedule {n} workouts in {len(problem['lits'])} slots."}) + "\n"
+                continue
+            # The bookings of a capacity-aware batch change the costs, so its literals are all kept
+            pending.append((index, times, days, n, cache_key, encoder, problem if capacity else prune(problem, n)))
+        except Exception as e:
+            logger.exception('Error processing request: %s', e)
+            yield json.dumps({"index": index, "error": "Invalid data", "details": str(e)}) + "\n"
+
+    if capacity:
+        # Slots are shared between calendars by their (date, time, location)
+        for _, _, _, _, _, encoder, problem in pending:
+            problem["slots"] = {lit: encoder.decode(lit) for lit in problem["lits"]}
+
+    results = Scheduler().solve_batch(
+        [(problem, n) for _, _, _, n, _, _, problem in pending],
+        workers=BATCH_WORKERS,
+        timeout=SOLVE_TIMEOUT,
+        capacity_weight=CAPACITY_WEIGHT if capacity else None,
+    )
+    for position, result in results:
+        index, times, days, n, cache_key, encoder, problem = pending[position]
+        if result["model"] is None:
+            yield json.dumps({"index": index, "error": "No valid schedule found."}) + "\n"
+            continue
+        modified_decoded_vals = decode_schedule(encoder, problem["lits"], result["model"])
+        if not capacity and result["optimal"]:
+            schedule_cache.put(cache_key, modified_decoded_vals)
+        yield json.dumps({"index": index, **schedule_response(times, days, n, modified_decoded_vals),
+                          "optimal": result["optimal"], "gap": round(result["gap"], 4)}) + "\n"
+
+# Endpoint to schedule many requests at once, streamed back as newline-delimited JSON
+@app.route('/api/schedule/batch', methods=['POST'])
+def receive_schedule_batch():
+    batch_data = request.get_json(silent=True) or {}
+    schedule_requests = batch_data.get("requests")
+    if not isinstance(schedule_requests, list) or not schedule_requests:
+        return jsonify({"error": "requests must be a non-empty list of schedules."}), 400
+    if len(schedule_requests) > MAX_BATCH:
+        return jsonify({"error": f"A batch may contain at most {MAX_BATCH} schedules."}), 400
+    capacity = batch_data.get("capacity", False)
+    if not isinstance(capacity, bool):
+        return jsonify({"error": "Invalid value for capacity. It must be a boolean."}), 400
+    return Response(stream_with_context(batch_lines(schedule_requests, capacity)), mimetype="application/x-ndjson")
+
+# Endpoint to re-plan part of a schedule after slots were added or removed or weights changed
+@app.route('/api/schedule/replan', methods=['POST'])
+def replan_schedule():
+    metrics.start_trace()
+    start = time.perf_counter()
+    body, status = replan_schedule_request(request.get_json(silent=True) or {})
+    metrics.observe("request", time.perf_counter() - start)
+    logger.debug("Request spans: %s", metrics.finish_trace())
+    return jsonify(body), status
+
+def replan_schedule_request(replan_data):
+    """
+    Re-solve only the weeks touched by 'changes' of a previous 'solution', see plan_window.
+    Returns the response body for the new calendar and its status code.
+    """
+    try:
+        times, days, n, error = parse_schedule_request(replan_data)
+        previous = replan_data.get("solution", [])
+        changes = replan_data.get("changes", {})
+        if not error and not isinstance(previous, list):
+            error = "solution must be a list of [date, time, location] entries."
+        if not error and not isinstance(changes, dict):
+            error = "changes must be an object."
+        if not error:
+            timeout, error = parse_timeout(replan_data)
+        if error:
+            return {"error": error}, 400
+
+        with span("replan_window", days=len(days)) as record:
+            plan = plan_window(days, times, n, previous, changes, replan_data.get("now"), slot_capacity=len(locations))
+            record["window_days"] = len(plan["dates"])
+            record["k"] = plan["k"]
+
+        solution = list(plan["kept"])
+        if plan["k"]:
+            encoder, problem = encode_schedule(plan["window_times"], plan["window_days"])
+            if encoder is None:
+                return {"error": problem}, 400
+            problem = prune(problem, plan["k"])
+            with scheduler_for(problem) as scheduler:
+                cost, model = scheduler.solve_schedule(plan["k"], timeout=timeout)
+                status = solve_status(scheduler)
+            solution += decode_schedule(encoder, problem["lits"], model)
+        else:
+            status = {"optimal": True, "gap": 0.0}
+
+        body = schedule_response(plan["times"], plan["days"], n, sorted(solution, key=lambda entry: entry[:2]))
+        body["replanned_dates"] = plan["dates"]
+        body.update(status)
+        return body, 200
 
     except Exception as e:
-        print('Error processing request:', e)
+        logger.exception('Error processing request: %s', e)
+        return {"error": "Invalid data", "details": str(e)}, 400
+
+# Endpoint to release the slots of a schedule booked with "book": true
+@app.route('/api/schedule/release', methods=['POST'])
+def release_schedule():
+    booking = (request.get_json(silent=True) or {}).get("booking")
+    if not isinstance(booking, list) or not all(
+        isinstance(slot, list) and len(slot) == 3 and all(isinstance(part, str) for part in slot) for slot in booking
+    ):
+        return jsonify({"error": "booking must be a list of [date, time, location] slots."}), 400
+    occupancy.release([tuple(slot) for slot in booking])
+    return jsonify({"message": "Booking released.", "released": len(booking)}), 200
+
+def get_solver_pool():
+    """The solver pool, started on first use so importing the app spawns no processes."""
+    global solver_pool
+    with solver_pool_lock:
+        if solver_pool is None:
+            solver_pool = SolverPool(timeout=SOLVE_TIMEOUT)
+    return solver_pool
+
+# Endpoint to submit a schedule to the solver pool
+@app.route('/api/schedule/jobs', methods=['POST'])
+def submit_schedule_job():
+    try:
+        schedule_data = request.get_json()
+        times, days, n, error = parse_schedule_request(schedule_data)
+        if not error:
+            risk, error = parse_risk(schedule_data)
+        if not error:
+            objective, error = parse_objective(schedule_data)
+        if not error:
+            timeout, error = parse_timeout(schedule_data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        cache_key = cache_key_for(times, days, n, risk, objective)
+        cached_solution = schedule_cache.get(cache_key)
+        if cached_solution is not None:
+            return jsonify({"status": "done", "optimal": True, "gap": 0.0, **schedule_response(times, days, n, cached_solution)}), 200
+
+        encoder, problem = encode_schedule(times, days, risk, objective)
+        if encoder is None:
+            return jsonify({"error": problem}), 400
+        if len(problem["lits"]) < n:
+            return jsonify({"error": f"Cannot schedule {n} workouts in {len(problem['lits'])} slots."}), 400
+        problem = prune(problem, n)
+
+        job_id = get_solver_pool().submit(problem, n, timeout=timeout,
+                                          context=(encoder, problem["lits"], times, days, n, cache_key))
+        return jsonify({"job_id": job_id, "status": "pending"}), 202
+
+    except PoolFull as e:
+        return jsonify({"error": "Too many schedules are being solved, try again shortly.", "details": str(e)}), 503
+    except Exception as e:
+        logger.exception('Error processing request: %s', e)
         return jsonify({"error": "Invalid data", "details": str(e)}), 400
 
+# Endpoint to poll a submitted schedule, ?wait=<seconds> waits for it to finish
+@app.route('/api/schedule/jobs/<job_id>', methods=['GET'])
+def poll_schedule_job(job_id):
+    wait = min(request.args.get("wait", 0, type=float), MAX_POLL_WAIT)
+    job = get_solver_pool().poll(job_id, wait=max(wait, 0))
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}."}), 404
+    if job["status"] == "pending":
+        return jsonify({"job_id": job_id, "status": "pending", "elapsed": job["elapsed"]}), 202
+    if job["status"] == "failed":
+        return jsonify({"job_id": job_id, "status": "failed", "error": job["error"]}), 500
+
+    encoder, lits, times, days, n, cache_key = job["context"]
+    result = job["result"]
+    if result["model"] is None:
+        return jsonify({"job_id": job_id, "status": "done", "error": "No valid schedule found."}), 422
+    modified_decoded_vals = decode_schedule(encoder, lits, result["model"])
+    # Only proven optimal schedules are cached, a timed out one may be improved on retry
+    if result["optimal"]:
+        schedule_cache.put(cache_key, modified_decoded_vals)
+    return jsonify({"job_id": job_id, "status": "done", "optimal": result["optimal"], "gap": round(result["gap"], 4),
+                    **schedule_response(times, days, n, modified_decoded_vals)}), 200
+
+# Endpoint to inspect the solver pool
+@app.route('/api/schedule/jobs', methods=['GET'])
+def solver_pool_stats():
+    return jsonify(get_solver_pool().stats()), 200
+
+# Endpoint with the stage latency histograms, in the Prometheus text format or ?format=json
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    if request.args.get("format") == "json":
+        return jsonify(metrics.snapshot()), 200
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# Endpoint to inspect the schedule cache
+@app.route('/api/schedule/cache', methods=['GET'])
+def schedule_cache_stats():
+    return jsonify(schedule_cache.stats()), 200
+
+def warm_up():
+    """
+    Load the forecast cost tables and run one small solve on the fast path and one on RC2,
+    so the first request finds the forecasts parsed and the solver code loaded.
+    """
+    with span("warmup"):
+        forecast_store.cost_tables(locations)
+        today = datetime.date.today()
+        days = [f"{today + datetime.timedelta(days=day)}T00:00:00.000Z" for day in range(7)]
+        encoder, problem = encode_schedule([["08:00", "12:00", "18:00"]] * len(days), days)
+        if encoder is None:
+            logger.warning("Warm-up solve skipped: %s", problem)
+        else:
+            scheduler = Scheduler()
+            scheduler.set_lits(problem["lits"])
+            scheduler.set_penalty(problem["penalty"])
+            scheduler.set_soft(problem["soft"])
+            scheduler.set_hard(problem["hard"])
+            _, model = scheduler.solve_schedule(2)
+            decode_schedule(encoder, problem["lits"], model)
+
+        scheduler = Scheduler(fast_path=False)
+        scheduler.set_lits([1, 2, 3])
+        scheduler.set_penalty([[1, 2, 3]])
+        scheduler.set_soft([(1, 1), (2, 2), (3, 3)])
+        scheduler.set_hard([[1, 2], [3]])
+        scheduler.solve_schedule(1)
+
+if WARMUP:
+    warm_up()
+cold_start = time.perf_counter() - IMPORT_START
+metrics.observe("cold_start", cold_start)
+logger.info("Backend ready in %.1fms%s.", cold_start * 1000, " including warm-up" if WARMUP else "")
+
 if __name__ == '__main__':
     port = 5000
     app.run(debug=True, port=port)
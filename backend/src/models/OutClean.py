@@ -1,28 +1,47 @@
 import requests
 from bs4 import BeautifulSoup
 import os
+import json
+import hashlib
+import time
+import argparse
+from urllib.parse import urljoin
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+try:
+    from .columnar import OUTDOOR, STORAGES, ColumnarStore
+    from .timefeatures import parse_utc
+except ImportError: # Run as a script from this directory
+    from columnar import OUTDOOR, STORAGES, ColumnarStore
+    from timefeatures import parse_utc
 
 # Code to load the compressed .csv files:
 
 url = 'https://hkikanslialiikuntapaikat.z6.web.core.windows.net/ulkokuntosali/index.html' # Source url for outdoor gym usage data
-os.makedirs("outraw", exist_ok=True) # Directory to store the outdoor gym files
 
-def loadcsv(): # Get the needed .csv files from the source (as we need .csv files and the source has both .csv and .json)
-    response = requests.get(url)
+def SourceFiles(index_url=url): # List the (file name, download url) pairs of the wanted files on the source page
+    response = requests.get(index_url)
+    response.raise_for_status()
     soup = BeautifulSoup(response.text, 'html.parser')
+    files = []
     for link in soup.find_all('a'): # Find all links in source page
         href = link.get('href')
         if href and href.endswith('.csv.gz') and 'hourly' in href: # Note: the files are all compressed, hence why the href needs to end in '.csv.gz'. Also 'hourly' must be in the href, as we want hourly data files
             if '2023' in href or '2024' in href: # We want data from 2023 and 2024, hence why the href must contain either one of those strings
-                loadurl = 'https://hkikanslialiikuntapaikat.z6.web.core.windows.net/ulkokuntosali/' + href  # Note: url to load files is different than source page url! 
-                print(f'Downloading {loadurl}...')
-                csvres = requests.get(loadurl)
-                csvres.raise_for_status()
-                csvfile = os.path.join('outraw', os.path.basename(href)) # .csv gets loaded in the outfiles directory
-                with open(csvfile, 'wb') as f:
-                    f.write(csvres.content)
-                print(f"Saved {csvfile}") # Prints if loading was successful
+                loadurl = urljoin(index_url, href) # Note: url to load files is different than source page url! (relative to its directory)
+                files.append((os.path.basename(href), loadurl))
+    return files
+
+def loadcsv(index_url=url): # Get the needed .csv files from the source (as we need .csv files and the source has both .csv and .json)
+    os.makedirs("outraw", exist_ok=True) # Directory to store the outdoor gym files
+    for name, loadurl in SourceFiles(index_url):
+        print(f'Downloading {loadurl}...')
+        csvres = requests.get(loadurl)
+        csvres.raise_for_status()
+        csvfile = os.path.join('outraw', name) # .csv gets loaded in the outfiles directory
+        with open(csvfile, 'wb') as f:
+            f.write(csvres.content)
+        print(f"Saved {csvfile}") # Prints if loading was successful
 
 # Code to clean the previously-loaded files:
 
@@ -33,7 +52,7 @@ def OutClean(file): # Remove needless columns and cleans up data for processing
     remove = ['groupId', 'trackableId', 'sets', 'repetitions'] # Needless columns
     file = pd.read_csv(file) # Unzip and read file with pandas                                                                                              
     file = file.drop(columns = remove, axis = 1) # Removes columns in remove list                                                                          
-    file['utctimestamp'] = (file['utctimestamp'].str.replace('T', ' ')).str.replace('.000Z', '') # Remove T within string, milliseconds and Z at end of string
+    file['utctimestamp'] = parse_utc(file['utctimestamp']) # Parse the timestamps once with their exact format
     os.makedirs("outclean", exist_ok=True) # Directory to store the clean outdoor gym files
     file = file.groupby(['utctimestamp', 'area'])['usageMinutes'].sum().reset_index() # Sum usageMinutes cells in rows with the same day, hour and area
     file = file.rename(columns = {'utctimestamp':'time', 'usageMinutes':'check-ins'}) 
@@ -71,8 +90,198 @@ def OutCleanAndSaveByArea():
         data.drop(columns='area', axis=1).to_csv(area_file, index=False)  # Save the CSV without the 'area' column
         print(f"Saved combined data for area '{area}' to {area_file}")
 
+# Streaming alternative to OutClean + OutCleanAndSaveByArea:
+
+USECOLS = ['utctimestamp', 'area', 'usageMinutes'] # The only columns the per-area series are built from
+DTYPES = {'utctimestamp': 'string', 'area': 'string', 'usageMinutes': 'float64'}
+
+def AggregateFile(path, chunksize=100_000): # Sum usageMinutes by (hour, area) in one raw file, reading it in chunks
+    total = None
+    for chunk in pd.read_csv(path, usecols=USECOLS, dtype=DTYPES, chunksize=chunksize):
+        part = chunk.groupby(['utctimestamp', 'area'])['usageMinutes'].sum()
+        total = part if total is None else total.add(part, fill_value=0) # Only one chunk and the running sums are held at a time
+    return total
+
+def SaveArea(data, area, outdir, storage='csv'): # Write an area's (time, check-ins) rows as data/<area>.csv or into the parquet dataset
+    data = data.sort_values(by='time')[['time', 'check-ins']] # Sort by time in ascending order
+    if storage == 'parquet':
+        ColumnarStore(outdir).write_series(OUTDOOR, area, data)
+        return os.path.join(outdir, OUTDOOR, f'location={area}')
+    data.insert(0, 'row_number', range(1, len(data) + 1))
+    area_file = os.path.join(outdir, f'{area}.csv')
+    data.to_csv(area_file, index=False)
+    return area_file
+
+def OutCleanStreaming(rawdir='./outraw/', outdir='./data/', workers=None, chunksize=100_000, storage='csv'):
+    # Aggregate every raw file in parallel with flat memory, then write each area's series once
+    files = sorted(os.path.join(rawdir, f) for f in os.listdir(rawdir) if f.endswith('.csv.gz'))
+    partials = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(AggregateFile, files, [chunksize] * len(files)):
+            if result is not None:
+                partials.append(result)
+    if not partials:
+        return {}
+
+    combined = pd.concat(partials).groupby(level=['utctimestamp', 'area']).sum().reset_index() # One concat for all files
+    combined['time'] = parse_utc(combined['utctimestamp'])
+    combined = combined.rename(columns = {'usageMinutes':'check-ins'})
+
+    os.makedirs(outdir, exist_ok=True)
+    saved = {}
+    for area, data in combined.groupby('area'):
+        area_file = SaveArea(data, area, outdir, storage)
+        saved[area] = area_file
+        print(f"Saved combined data for area '{area}' to {area_file}")
+    return saved
+
+# Incremental refresh: only files that are new or changed at the source are downloaded and merged
+
+MANIFEST = 'manifest.json' # Kept in the raw directory, one entry per processed source file
+PARTIALS = 'partials' # Per-file (hour, area) sums, so a changed file can be swapped out of the series
+
+def LoadManifest(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def SaveManifest(path, manifest): # Written through a temporary file, so an interrupted refresh keeps the old manifest
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(tmp_file, path)
+
+def RemoteStat(loadurl): # Size and Last-Modified of a source file without downloading it, None where the server does not say
+    try:
+        head = requests.head(loadurl, allow_redirects=True)
+        head.raise_for_status()
+    except requests.RequestException:
+        return None, None
+    size = head.headers.get('Content-Length')
+    return (int(size) if size is not None else None), head.headers.get('Last-Modified')
+
+def Unchanged(entry, size, last_modified): # Whether the manifest entry still describes the source file
+    return (entry is not None and size is not None and last_modified is not None
+            and entry.get('size') == size and entry.get('last_modified') == last_modified)
+
+def EmptyPartial():
+    return pd.Series(dtype='float64', index=pd.MultiIndex.from_tuples([], names=['utctimestamp', 'area']), name='usageMinutes')
+
+def ReadPartial(path): # The sums a file contributed when it was last processed, empty for a new file
+    try:
+        return pd.read_csv(path, dtype=DTYPES).set_index(['utctimestamp', 'area'])['usageMinutes']
+    except FileNotFoundError:
+        return EmptyPartial()
+
+def WritePartial(path, sums): # Written through a temporary file like the manifest
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    sums.rename('usageMinutes').reset_index().to_csv(tmp_file, index=False)
+    os.replace(tmp_file, path)
+
+def CombinedSums(partialdir, new, areas): # (hour, area) sums of the given areas over every processed file, with the new sums of the files in `new` in place of their saved ones
+    parts = list(new.values()) + [ReadPartial(os.path.join(partialdir, f)) for f in sorted(os.listdir(partialdir))
+                                  if f.endswith('.csv') and f[:-4] not in new]
+    sums = pd.concat(parts)
+    return sums[sums.index.get_level_values('area').isin(areas)].groupby(level=['utctimestamp', 'area']).sum()
+
+def RebuildArea(area, outdir, sums, months, storage='csv'): # Rewrite an area's series as the sum of the partials, with parquet only the given months
+    series = sums.xs(area, level='area')
+    series.index = parse_utc(series.index)
+    if storage == 'parquet':
+        # Only the months the change falls in are rewritten
+        series = series[series.index.to_period('M').isin(months)]
+    SaveArea(series.rename('check-ins').rename_axis('time').reset_index(), area, outdir, storage)
+
+def RefreshIncremental(index_url=url, rawdir='./outraw/', outdir='./data/', chunksize=100_000, storage='csv'):
+    """
+    Bring data/<area>.csv up to date with the source, touching only new or changed files.
+
+    A file is skipped without downloading when its size and Last-Modified match the manifest,
+    and without processing when its content hash matches. Every other file is aggregated and
+    diffed against its previous (hour, area) sums. Once all files are read, each area with
+    changed hours is rebuilt once as the sum of the partials of all processed files (with
+    parquet only its changed months). A series is never added to, so one written by a full
+    refresh is replaced rather than counted twice, and redoing a refresh after an
+    interruption gives the same result.
+
+    Returns:
+        list: The areas whose series changed, e.g. to re-run WeekPred for.
+    """
+    partialdir = os.path.join(rawdir, PARTIALS)
+    os.makedirs(partialdir, exist_ok=True)
+    os.makedirs(outdir, exist_ok=True)
+    manifest_path = os.path.join(rawdir, MANIFEST)
+    manifest = LoadManifest(manifest_path)
+    records = {} # File name -> new manifest entry
+    new = {} # Partial name -> new (hour, area) sums of the changed files
+    months = {} # Area -> months with changed hours
+
+    for name, loadurl in SourceFiles(index_url):
+        entry = manifest.get(name)
+        size, last_modified = RemoteStat(loadurl)
+        if Unchanged(entry, size, last_modified):
+            continue
+
+        print(f'Downloading {loadurl}...')
+        csvres = requests.get(loadurl)
+        csvres.raise_for_status()
+        digest = hashlib.sha256(csvres.content).hexdigest()
+        csvfile = os.path.join(rawdir, name)
+        with open(csvfile, 'wb') as f:
+            f.write(csvres.content)
+        records[name] = {'size': len(csvres.content), 'sha256': digest, 'last_modified': last_modified,
+                         'mtime': os.stat(csvfile).st_mtime, 'processed_at': time.time()}
+        if entry is not None and entry.get('sha256') == digest: # Republished with the same content
+            continue
+
+        partial_name = name[:-7]
+        sums = AggregateFile(csvfile, chunksize)
+        if sums is None: # A file with a header only
+            sums = EmptyPartial()
+        delta = sums.sub(ReadPartial(os.path.join(partialdir, f'{partial_name}.csv')), fill_value=0) # Only the hours this file adds or corrects
+        delta = delta[delta != 0]
+        new[partial_name] = sums
+        changed_months = pd.DataFrame({'area': delta.index.get_level_values('area'),
+                                       'month': parse_utc(delta.index.get_level_values('utctimestamp')).to_period('M')})
+        for area, area_months in changed_months.groupby('area')['month']:
+            months.setdefault(area, set()).update(area_months)
+        print(f"Processed {name}")
+
+    if months:
+        sums = CombinedSums(partialdir, new, list(months))
+        for area in sorted(months):
+            RebuildArea(area, outdir, sums, list(months[area]), storage)
+            print(f"Rebuilt the series of area '{area}'")
+
+    # The partials and the manifest are saved only after every series is rebuilt, so an
+    # interrupted refresh redoes the changed files and rebuilds the same series
+    for partial_name, sums in new.items():
+        WritePartial(os.path.join(partialdir, f'{partial_name}.csv'), sums)
+    if records:
+        manifest.update(records)
+        SaveManifest(manifest_path, manifest)
+    return sorted(months)
+
 if __name__ == '__main__':
-    loadcsv()
-    for i in os.listdir('./outraw/'):
-        OutClean(i)
-    OutCleanAndSaveByArea()
+    parser = argparse.ArgumentParser(description='Download and clean the outdoor gym usage data.')
+    parser.add_argument('--streaming', action='store_true', help='Aggregate the raw files in chunks and in parallel')
+    parser.add_argument('--workers', type=int, default=None, help='Files processed in parallel (streaming mode)')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='Rows read at a time (streaming and incremental mode)')
+    parser.add_argument('--incremental', action='store_true', help='Only fetch and merge new or changed files, then re-forecast the changed areas')
+    parser.add_argument('--storage', choices=STORAGES, default='csv', help='Write the area series as CSV or as a parquet dataset (streaming and incremental mode)')
+    args = parser.parse_args()
+
+    if args.incremental:
+        changed = RefreshIncremental(chunksize=args.chunksize, storage=args.storage)
+        print(f"Changed areas: {', '.join(changed) if changed else 'none'}")
+        if changed:
+            from predictor import WeekPred
+            WeekPred('data/', storage=args.storage).run_for_locations([f'{area}.csv' for area in changed], headless=True)
+    else:
+        loadcsv()
+        if args.streaming:
+            OutCleanStreaming(workers=args.workers, chunksize=args.chunksize, storage=args.storage)
+        else:
+            OutCleanAndSaveByArea() # Cleans every file itself, so they are not cleaned twice
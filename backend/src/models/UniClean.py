@@ -1,14 +1,23 @@
 import pandas as pd
+try:
+    from .columnar import UNISPORT, ColumnarStore
+    from .timefeatures import parse_days
+except ImportError: # Run as a script from this directory
+    from columnar import UNISPORT, ColumnarStore
+    from timefeatures import parse_days
 
-def UniClean(file): # # Removes column of non-unique check-ins ('quantity') from UniSport DataFrames and puts day and hour data in one single column                                                
+def UniClean(file, storage='csv'): # # Removes column of non-unique check-ins ('quantity') from UniSport DataFrames and puts day and hour data in one single column                                                
     filename = file
     filepath = "./unifiles/" # UniSport files are stored in a directory called 'unifiles' within the local directory the cleaner's in
     file = filepath + filename # Solves FileNotFoundError caused by the files being in a different directory than the program
     file = pd.read_csv(file).drop('quantity', axis = 1) # Remove quantity column
-    file['day'] = pd.to_datetime(pd.to_datetime(file['day']).dt.strftime('%Y-%m-%d')) # Format day column to y-m-d
-    file['day'] +=  pd.to_timedelta(file.hour, unit='h') # Turn hour column integers into datetime format and add it to the day column
+    days = parse_days(file['day']) # Parse the day column once and truncate it to y-m-d
+    file['day'] = (days + file['hour'].to_numpy().astype('timedelta64[h]')).astype('datetime64[ns]') # Add the hour column integers to the day
     file = file.drop('hour', axis = 1) # Remove hour column
     file = file.rename(columns = {'day':'time', 'unique_accounts_quantity':'check-ins'}) # Rename day column to DS column and second column to Y
-    newfile = filepath + filename[:-4] + '_clean.csv' # Generate new file name (including path)
-    file.to_csv(newfile) # Write into new file
+    if storage == 'parquet': # Typed columns, partitioned by file and month under unifiles/unisport/
+        ColumnarStore(filepath).write_series(UNISPORT, filename[:-4], file)
+    else:
+        newfile = filepath + filename[:-4] + '_clean.csv' # Generate new file name (including path)
+        file.to_csv(newfile) # Write into new file
     return file
@@ -0,0 +1,390 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from . import encoder as encoder_module
+from .columnar import STORAGES
+from .encoder import CompactEncoder
+from .forecast_store import DATA_PATH, QUANTILE_LEVELS, RISKS, ForecastStore, quantile_column
+from .predictor import AGGREGATIONS, BACKENDS, WeekPred
+from .scheduler import Scheduler
+from .timefeatures import weekday_hour
+
+# Hours a synthetic request may offer slots in
+OPENING_HOURS = range(6, 23)
+# Increase whenever the cached forecasts would change for the same configuration
+CACHE_VERSION = 1
+
+# Histories loaded by this process, keyed by (data directory, storage, locations)
+_histories = {}
+
+class CutoffForecasts(ForecastStore):
+    """
+    Forecast store serving the forecasts fitted for one cutoff from memory, in place of
+    the forecast files the app reads.
+    """
+    def __init__(self, forecasts):
+        """
+        Args:
+            forecasts (dict): location -> 168xQ+1 array of the point forecast followed by the quantiles.
+        """
+        super().__init__(data_path=None)
+        self._tables = {
+            location: (0, forecast[:, 0].reshape(7, 24), forecast[:, 1:].reshape(7, 24, -1))
+            for location, forecast in forecasts.items()
+        }
+
+    def version(self, locations):
+        return tuple(0 if location in self._tables else None for location in locations)
+
+    def _entry(self, location):
+        return self._tables.get(location)
+
+class Backtest:
+    """
+    Rolling-origin evaluation of the forecasts and the schedules chosen from them.
+
+    For every cutoff the forecaster is fitted on the history before the cutoff and
+    compared with the check-ins of the `horizon` days after it. Synthetic requests for
+    those days are then encoded with CompactEncoder from the fitted forecasts, solved
+    with Scheduler, and the realized check-ins of the chosen slots are compared with an
+    oracle that solves the same requests knowing the realized check-ins.
+
+    Fitted forecasts are cached as .npz files keyed by the location, cutoff, forecaster
+    settings and a checksum of the history they were fitted on, so repeated runs only fit
+    what changed.
+    """
+    def __init__(self, data_dir, locations, backend='profile', half_life=None, aggregation='mean', trim=0.1,
+                 storage='csv', risk='mean', horizon=7, step=7, min_history=28, requests=4, slots=6, n=3,
+                 cache_dir=None, seed=0):
+        """
+        Args:
+            data_dir (str): History directory, as for WeekPred.
+            locations (list): Location CSV file names, as for WeekPred.run_for_locations.
+            backend, half_life, aggregation, trim, storage: Forecaster settings, see WeekPred.
+            risk (str): Risk measure the schedules weight literals by, one of RISKS.
+            horizon (int): Days after each cutoff that are forecast and scheduled.
+            step (int): Days between consecutive cutoffs.
+            min_history (int): Days of history before the first cutoff.
+            requests (int): Synthetic schedule requests per cutoff.
+            slots (int): Slots offered per day of a request.
+            n (int): Workouts per request.
+            cache_dir (str): Directory of the cached forecasts, None to fit every time.
+            seed (int): Seed of the synthetic requests, combined with each cutoff.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}.")
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {AGGREGATIONS}.")
+        if storage not in STORAGES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {STORAGES}.")
+        if risk not in RISKS:
+            raise ValueError(f"Unknown risk measure '{risk}', expected one of {RISKS}.")
+        self.data_dir = data_dir
+        self.locations = list(locations)
+        self.backend = backend
+        self.half_life = half_life
+        self.aggregation = aggregation
+        self.trim = trim
+        self.storage = storage
+        self.risk = risk
+        self.horizon = horizon
+        self.step = step
+        self.min_history = min_history
+        self.requests = requests
+        self.slots = slots
+        self.n = n
+        self.cache_dir = cache_dir
+        self.seed = seed
+
+    def predictor(self):
+        return WeekPred(self.data_dir, backend=self.backend, half_life=self.half_life,
+                        aggregation=self.aggregation, trim=self.trim, storage=self.storage)
+
+    def names(self):
+        """Location names without the file extension, as the encoder and forecast files use them."""
+        return [os.path.splitext(location)[0] for location in self.locations]
+
+    def histories(self):
+        """The full history of every location, loaded once per process."""
+        key = (self.data_dir, self.storage, tuple(self.locations))
+        if key not in _histories:
+            predictor = self.predictor()
+            histories = {}
+            for location in self.locations:
+                data = predictor.select_location(location)
+                if data is not None:
+                    histories[location] = data[['time', 'check-ins']].sort_values('time', ignore_index=True)
+            _histories[key] = histories
+        return _histories[key]
+
+    def cutoffs(self, start=None, end=None):
+        """
+        Midnights from min_history days after the first observation on, every step days,
+        while a whole horizon of history follows. Optionally limited to [start, end).
+        """
+        histories = self.histories()
+        if not histories:
+            return []
+        first = min(data['time'].iloc[0] for data in histories.values()).normalize()
+        last = max(data['time'].iloc[-1] for data in histories.values())
+        cutoffs = pd.date_range(first + pd.Timedelta(days=self.min_history),
+                                last - pd.Timedelta(days=self.horizon) + pd.Timedelta(hours=1),
+                                freq=f'{self.step}D')
+        if start is not None:
+            cutoffs = cutoffs[cutoffs >= pd.Timestamp(start)]
+        if end is not None:
+            cutoffs = cutoffs[cutoffs < pd.Timestamp(end)]
+        return list(cutoffs)
+
+    def cache_file(self, location, cutoff, history):
+        """Cache file of a forecast, None without a cache directory."""
+        if self.cache_dir is None:
+            return None
+        settings = [CACHE_VERSION, location, str(cutoff), self.backend, self.half_life, self.aggregation, self.trim,
+                    len(history), float(history['check-ins'].sum())]
+        digest = hashlib.sha256(json.dumps(settings).encode()).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"{os.path.splitext(location)[0]}-{cutoff:%Y%m%d}-{digest}.npz")
+
+    def fit(self, location, cutoff):
+        """
+        Forecast the week of a location from its history before the cutoff, from the cache if possible.
+
+        Returns:
+            tuple: (168xQ+1 array of the point forecast followed by the quantiles, whether it was cached),
+            or (None, False) if there is no history before the cutoff.
+        """
+        data = self.histories().get(location)
+        if data is None:
+            return None, False
+        history = data[data['time'] < cutoff]
+        if history.empty:
+            return None, False
+        cache_file = self.cache_file(location, cutoff, history)
+        if cache_file is not None and os.path.exists(cache_file):
+            with np.load(cache_file) as cached:
+                return cached['forecast'], True
+
+        predictions = self.predictor().predict_location(history.copy())
+        columns = ['check-ins'] + [quantile_column(level) for level in QUANTILE_LEVELS]
+        forecast = predictions[columns].to_numpy(dtype=float)
+        if cache_file is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written under a temporary name so concurrent workers never read a partial file
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_file, forecast=forecast)
+            os.replace(tmp_file, cache_file)
+        return forecast, False
+
+    def actuals(self, cutoff):
+        """Realized check-ins as a (location, day, hour) array over the horizon, NaN where unobserved."""
+        actual = np.full((len(self.locations), self.horizon, 24), np.nan)
+        end = cutoff + pd.Timedelta(days=self.horizon)
+        for loc_idx, location in enumerate(self.locations):
+            data = self.histories().get(location)
+            if data is None:
+                continue
+            window = data[(data['time'] >= cutoff) & (data['time'] < end)]
+            hours = ((window['time'] - cutoff) // pd.Timedelta(hours=1)).to_numpy()
+            actual[loc_idx].reshape(-1)[hours] = window['check-ins'].to_numpy(dtype=float)
+        return actual
+
+    def make_requests(self, cutoff, actual):
+        """
+        Synthetic requests over the horizon, offering only hours observed at every location of actual.
+
+        Returns:
+            list: (days, times) of each request, days as ISO strings as the client sends them.
+        """
+        rng = np.random.default_rng([self.seed, int(cutoff.timestamp())])
+        observed = ~np.isnan(actual).any(axis=0)  # (day, hour)
+        requests = []
+        for _ in range(self.requests):
+            days, times = [], []
+            for day in range(self.horizon):
+                hours = [hour for hour in OPENING_HOURS if observed[day, hour]]
+                if not hours:
+                    continue
+                chosen = sorted(rng.choice(hours, size=min(self.slots, len(hours)), replace=False))
+                days.append(f"{(cutoff + pd.Timedelta(days=day)):%Y-%m-%d}T00:00:00.000Z")
+                times.append([f"{hour:02d}:00" for hour in chosen])
+            if sum(map(len, times)) * len(actual) >= self.n:
+                requests.append((days, times))
+        return requests
+
+    def run_cutoff(self, cutoff):
+        """Evaluate one cutoff, returning its forecast and schedule metrics."""
+        start = time.perf_counter()
+        names = self.names()
+        forecasts, cached = {}, 0
+        for location, name in zip(self.locations, names):
+            forecast, hit = self.fit(location, cutoff)
+            cached += hit
+            if forecast is not None:
+                forecasts[name] = forecast
+        actual = self.actuals(cutoff)
+        record = {"cutoff": f"{cutoff:%Y-%m-%d}", "cached": cached, "fitted": len(forecasts) - cached}
+        record.update(forecast_errors(forecasts, names, actual, cutoff))
+
+        # Only locations with a forecast are scheduled, as literals without one would cost nothing
+        located = [names.index(name) for name in forecasts]
+        day_offset = {f"{cutoff + pd.Timedelta(days=day):%Y-%m-%d}": day for day in range(self.horizon)}
+        realized, oracle = [], []
+        # The encoder reads the forecasts of this cutoff, as the app reads the current ones
+        shared_store = encoder_module.forecast_store
+        encoder_module.forecast_store = CutoffForecasts(forecasts)
+        try:
+            for days, times in self.make_requests(cutoff, actual[located]):
+                encoder = CompactEncoder(days, times, list(forecasts), risk=self.risk)
+                lits, _, groups, dates = encoder.get_encoded_values()
+                # Realized check-ins of every literal
+                realized_of = {}
+                for lit in lits:
+                    date, slot_time, name = encoder.decode(lit)
+                    realized_of[lit] = actual[names.index(name), day_offset[date], int(slot_time[:2])]
+
+                chosen = solve(lits, encoder.soft_clauses(), groups, dates, self.n)
+                best = solve(lits, [(math.ceil(value), lit) for lit, value in realized_of.items()], groups, dates, self.n)
+                if chosen is None or best is None:
+                    continue
+                realized.append(sum(realized_of[lit] for lit in chosen))
+                oracle.append(sum(realized_of[lit] for lit in best))
+        finally:
+            encoder_module.forecast_store = shared_store
+
+        record.update(schedule_scores(realized, oracle))
+        record["seconds"] = time.perf_counter() - start
+        return record
+
+    def run(self, workers=1, start=None, end=None):
+        """
+        Evaluate every cutoff, in parallel worker processes when workers > 1.
+
+        Returns:
+            dict: 'cutoffs' with the record of each cutoff in order and their 'summary'.
+        """
+        cutoffs = self.cutoffs(start, end)
+        if workers > 1 and len(cutoffs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                records = list(executor.map(self.run_cutoff, cutoffs))
+        else:
+            records = [self.run_cutoff(cutoff) for cutoff in cutoffs]
+        return {"cutoffs": records, "summary": summarize(records)}
+
+def solve(lits, soft, groups, dates, n):
+    """The positive literals of the cheapest schedule of n workouts, None if there is none."""
+    scheduler = Scheduler()
+    scheduler.set_lits(lits)
+    scheduler.set_soft(soft)
+    scheduler.set_hard(groups)
+    scheduler.set_penalty(dates)
+    _, model = scheduler.solve_schedule(n)
+    if model is None:
+        return None
+    return sorted(set(lits) & {lit for lit in model if lit > 0})
+
+def forecast_errors(forecasts, names, actual, cutoff):
+    """MAE and RMSE of the point forecasts, and pinball loss and 10-90% coverage of the quantiles."""
+    # Weekday and hour of each (day, hour) of the horizon
+    hours = pd.Timestamp(cutoff) + pd.to_timedelta(np.arange(actual.shape[1] * 24), unit='h')
+    weekdays, day_hours = weekday_hour(hours)
+    slots = weekdays * 24 + day_hours
+    errors, losses, covered = [], [], []
+    for loc_idx, name in enumerate(names):
+        if name not in forecasts:
+            continue
+        observed = actual[loc_idx].reshape(-1)
+        known = ~np.isnan(observed)
+        predicted = forecasts[name][slots[known]]
+        observed = observed[known]
+        errors.append(predicted[:, 0] - observed)
+        levels = np.asarray(QUANTILE_LEVELS)
+        residual = observed[:, None] - predicted[:, 1:]
+        losses.append(np.maximum(levels * residual, (levels - 1) * residual).mean(axis=1))
+        low, high = predicted[:, 1 + QUANTILE_LEVELS.index(0.1)], predicted[:, 1 + QUANTILE_LEVELS.index(0.9)]
+        covered.append((observed >= low) & (observed <= high))
+    if not errors or not len(np.concatenate(errors)):
+        return {"slots": 0, "mae": None, "rmse": None, "pinball": None, "coverage80": None}
+    errors, losses, covered = np.concatenate(errors), np.concatenate(losses), np.concatenate(covered)
+    return {
+        "slots": int(len(errors)),
+        "mae": float(np.abs(errors).mean()),
+        "rmse": float(np.sqrt((errors ** 2).mean())),
+        "pinball": float(losses.mean()),
+        "coverage80": float(covered.mean()),
+    }
+
+def schedule_scores(realized, oracle):
+    """Realized check-ins of the chosen schedules against the oracle's, summed over the requests."""
+    if not realized:
+        return {"requests": 0, "realized": None, "oracle": None, "regret": None}
+    return {
+        "requests": len(realized),
+        "realized": float(sum(realized)),
+        "oracle": float(sum(oracle)),
+        # Share of check-ins above the best possible schedules
+        "regret": float(sum(realized) / sum(oracle) - 1) if sum(oracle) > 0 else float(sum(realized) > 0),
+    }
+
+def summarize(records):
+    """Means of the forecast metrics weighted by slots, and the regret over all requests."""
+    summary = {"cutoffs": len(records), "cached": sum(r["cached"] for r in records), "fitted": sum(r["fitted"] for r in records)}
+    scored = [r for r in records if r["slots"]]
+    slots = sum(r["slots"] for r in scored)
+    summary["slots"] = slots
+    for metric in ["mae", "pinball", "coverage80"]:
+        summary[metric] = sum(r[metric] * r["slots"] for r in scored) / slots if slots else None
+    summary["rmse"] = math.sqrt(sum(r["rmse"] ** 2 * r["slots"] for r in scored) / slots) if slots else None
+    solved = [r for r in records if r["requests"]]
+    summary["requests"] = sum(r["requests"] for r in solved)
+    realized, oracle = sum(r["realized"] for r in solved), sum(r["oracle"] for r in solved)
+    summary["realized"], summary["oracle"] = realized, oracle
+    summary["regret"] = realized / oracle - 1 if oracle > 0 else None
+    return summary
+
+# Run from src/ as python -m models.backtest, as the encoder and scheduler are imported from the package
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the forecasts and schedules over the location histories.")
+    parser.add_argument("--data-dir", default=DATA_PATH, help="Directory of the location histories")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Cutoffs evaluated concurrently")
+    parser.add_argument("--backend", choices=BACKENDS, default='profile', help="Forecasting backend")
+    parser.add_argument("--half-life", type=float, default=None, help="Recency half-life in days (profile backend)")
+    parser.add_argument("--aggregation", choices=AGGREGATIONS, default='mean', help="Slot aggregation (profile backend)")
+    parser.add_argument("--storage", choices=STORAGES, default='csv', help="Read the history from CSV files or the parquet dataset")
+    parser.add_argument("--risk", choices=RISKS, default='mean', help="Risk measure the schedules are weighted by")
+    parser.add_argument("--horizon", type=int, default=7, help="Days forecast and scheduled after each cutoff")
+    parser.add_argument("--step", type=int, default=7, help="Days between cutoffs")
+    parser.add_argument("--min-history", type=int, default=28, help="Days of history before the first cutoff")
+    parser.add_argument("--requests", type=int, default=4, help="Synthetic schedule requests per cutoff")
+    parser.add_argument("--n", type=int, default=3, help="Workouts per request")
+    parser.add_argument("--start", default=None, help="First cutoff on or after this date")
+    parser.add_argument("--end", default=None, help="Last cutoff before this date")
+    parser.add_argument("--cache-dir", default=os.path.join(DATA_PATH, "backtest_cache"), help="Cache of the fitted forecasts, '' to disable")
+    parser.add_argument("--output", default=None, help="Write the per-cutoff records and summary to this JSON file")
+    args = parser.parse_args()
+
+    backtest = Backtest(args.data_dir, [
+                "toolo.csv", "kluuvi.csv",
+                "kumpula.csv", "meilahti.csv", "otaniemi.csv",
+                 "Paloheinä.csv", "Pirkkola.csv", #"Hietaniemi.csv",
+                ], backend=args.backend, half_life=args.half_life, aggregation=args.aggregation,
+                storage=args.storage, risk=args.risk, horizon=args.horizon, step=args.step,
+                min_history=args.min_history, requests=args.requests, n=args.n, cache_dir=args.cache_dir or None)
+
+    start = time.perf_counter()
+    results = backtest.run(workers=args.workers, start=args.start, end=args.end)
+    for record in results["cutoffs"]:
+        print(f"{record['cutoff']}: " + ", ".join(
+            f"{metric} {record[metric]:.3f}" for metric in ["mae", "rmse", "pinball", "coverage80", "regret"] if record[metric] is not None))
+    summary = results["summary"]
+    print(f"{summary['cutoffs']} cutoffs ({summary['fitted']} forecasts fitted, {summary['cached']} cached) "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(", ".join(f"{metric} {summary[metric]:.3f}" for metric in ["mae", "rmse", "pinball", "coverage80", "regret"] if summary[metric] is not None))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
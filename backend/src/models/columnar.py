@@ -0,0 +1,167 @@
+import functools
+import operator
+import os
+from urllib.parse import unquote
+import numpy as np
+
+SERIES_SCHEMA = {'time': 'datetime64[ns]', 'check-ins': 'float64'}
+STORAGES = ['csv', 'parquet']
+# Datasets under the data directory
+OUTDOOR = 'outdoor'  # Per-area series written by OutClean
+UNISPORT = 'unisport'  # Per-file series written by UniClean
+
+def require_pyarrow():
+    """Import pyarrow on first use, so the CSV/JSON path keeps working without it."""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError("The parquet storage needs pyarrow, install it with `poetry install -E parquet`.") from error
+    return pyarrow
+
+class ColumnarStore:
+    """
+    Parquet storage for the check-in series and the weekly forecasts.
+
+    Series are stored as `<root>/<dataset>/location=<location>/month=<YYYY-MM>/part-0.parquet`
+    with a typed timestamp column, so a reader only opens the partitions of the locations and
+    months it asks for and only decodes the columns it needs. Forecasts are small and read
+    whole, so they are a single file per location: `<root>/forecasts/location=<location>.parquet`.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def dataset_path(self, dataset):
+        return os.path.join(self.root, dataset)
+
+    def forecast_file(self, location):
+        return os.path.join(self.root, 'forecasts', f"location={location}.parquet")
+
+    def write_series(self, dataset, location, frame):
+        """
+        Write the series of a location. Every month present in the frame is replaced as a
+        whole, so to merge new hours pass the complete months they fall in; other months
+        are left untouched.
+
+        Args:
+            frame (DataFrame): Columns 'time' and 'check-ins'.
+        """
+        pa = require_pyarrow()
+        frame = frame[list(SERIES_SCHEMA)].astype(SERIES_SCHEMA).sort_values('time')
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.append_column('location', pa.array([location] * len(frame), pa.string()))
+        table = table.append_column('month', pa.array(frame['time'].dt.strftime('%Y-%m').to_numpy(), pa.string()))
+        pa.dataset.write_dataset(
+            table, self.dataset_path(dataset), format='parquet',
+            partitioning=pa.dataset.partitioning(pa.schema([('location', pa.string()), ('month', pa.string())]), flavor='hive'),
+            basename_template='part-{i}.parquet',
+            existing_data_behavior='delete_matching',
+        )
+
+    def read_series(self, dataset, location=None, columns=('time', 'check-ins'), start=None, end=None):
+        """
+        Read a series with the projection and the time range pushed down to the reader.
+
+        Args:
+            location (str): Location to read, None for all of them (adds a 'location' column).
+            columns (sequence): Columns to decode.
+            start, end: Optional inclusive start and exclusive end of the time range.
+
+        Returns:
+            DataFrame: The rows sorted by time, empty if nothing is stored.
+        """
+        # Imported here, as the app only reads forecasts and starts faster without pandas
+        import pandas as pd
+        pa = require_pyarrow()
+        path = self.dataset_path(dataset)
+        columns = list(columns) + (['location'] if location is None else [])
+        if not os.path.isdir(path):
+            return pd.DataFrame({column: pd.Series(dtype=SERIES_SCHEMA.get(column, 'object')) for column in columns})
+
+        dataset = pa.dataset.dataset(path, format='parquet', partitioning='hive')
+        field = pa.dataset.field
+        conditions = []
+        if location is not None:
+            conditions.append(field('location') == location)
+        # The month partitions prune whole files, the time bounds filter the row groups left
+        if start is not None:
+            start = pd.Timestamp(start)
+            conditions += [field('month') >= start.strftime('%Y-%m'), field('time') >= start]
+        if end is not None:
+            end = pd.Timestamp(end)
+            conditions += [field('month') <= end.strftime('%Y-%m'), field('time') < end]
+
+        condition = functools.reduce(operator.and_, conditions) if conditions else None
+        frame = dataset.to_table(columns=columns, filter=condition).to_pandas()
+        if 'time' in frame:
+            frame = frame.sort_values('time', kind='stable').reset_index(drop=True)
+        return frame
+
+    def locations(self, dataset):
+        """Names of the locations stored in a dataset."""
+        path = self.dataset_path(dataset)
+        if not os.path.isdir(path):
+            return []
+        # Partition values are url-encoded in the directory names, e.g. 'Palohein%C3%A4'
+        return sorted(unquote(name.split('=', 1)[1]) for name in os.listdir(path) if name.startswith('location='))
+
+    def write_forecast(self, location, predictions):
+        """
+        Write the weekly forecast of a location, replacing the previous one atomically.
+
+        Args:
+            predictions (DataFrame): Columns 'weekday', 'hour' and 'pred_checkins', and
+                optionally quantile columns named 'q<percent>' (see forecast_store.quantile_column).
+        """
+        pa = require_pyarrow()
+        columns = {
+            'weekday': pa.array(predictions['weekday'].to_numpy(), pa.int8()),
+            'hour': pa.array(predictions['hour'].to_numpy(), pa.int8()),
+            'pred_checkins': pa.array(predictions['pred_checkins'].to_numpy(), pa.float64()),
+        }
+        for column in predictions.columns:
+            if column[:1] == 'q' and column[1:].isdigit():
+                columns[column] = pa.array(predictions[column].to_numpy(), pa.float32())
+        table = pa.table(columns)
+        output_file = self.forecast_file(location)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        tmp_file = f"{output_file}.{os.getpid()}.tmp"
+        try:
+            pa.parquet.write_table(table, tmp_file)
+            os.replace(tmp_file, output_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    def read_forecast(self, location):
+        """Read the forecast of a location into a 7x24 array, NaN for missing slots (first entry wins)."""
+        pa = require_pyarrow()
+        table = pa.parquet.read_table(self.forecast_file(location), columns=['weekday', 'hour', 'pred_checkins'])
+        weekdays = table['weekday'].to_numpy().astype(np.intp)
+        hours = table['hour'].to_numpy().astype(np.intp)
+        values = table['pred_checkins'].to_numpy(zero_copy_only=False)
+
+        forecast = np.full((7, 24), np.nan)
+        # Reversed, so the first entry of a repeated slot is the one that stays
+        forecast[weekdays[::-1], hours[::-1]] = values[::-1]
+        return forecast
+
+    def read_forecast_quantiles(self, location, columns):
+        """
+        Read the quantile columns of a forecast into a 7x24xQ array, None if the file has
+        not got all of them.
+        """
+        pa = require_pyarrow()
+        path = self.forecast_file(location)
+        if not set(columns) <= set(pa.parquet.read_schema(path).names):
+            return None
+        table = pa.parquet.read_table(path, columns=['weekday', 'hour'] + list(columns))
+        weekdays = table['weekday'].to_numpy().astype(np.intp)
+        hours = table['hour'].to_numpy().astype(np.intp)
+        values = np.column_stack([table[column].to_numpy(zero_copy_only=False) for column in columns])
+
+        quantiles = np.full((7, 24, len(columns)), np.nan)
+        quantiles[weekdays[::-1], hours[::-1]] = values[::-1]
+        return quantiles
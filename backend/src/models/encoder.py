@@ -1,31 +1,44 @@
-import json
-import os
-from datetime import datetime
+import logging
+import math
+from collections.abc import Mapping, Sequence
+from datetime import date as date_cls, datetime
+import numpy as np
+from .forecast_store import forecast_store
+from .metrics import span
+from .registry import active_locations
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(BASE_DIR, "data")
-locations = [
-    'kluuvi', 'kumpula', #'otaniemi',
-    'toolo', 'meilahti', #'Pirkkola', #'Paloheinä', #, 'Hietaniemi'
-]
+logger = logging.getLogger(__name__)
+
+# Locations offered by default, see registry.LOCATIONS
+locations = active_locations()
 
 class Encoder:
     """
     Class responsible for encoding and decoding the chosen times, dates, and locations 
     between integer and (date, time, location) representations.
     """
-    def __init__(self, available_dates, available_times, available_locations=locations):
-        """Initialize the Encoder with available dates, times, and locations."""
+    def __init__(self, available_dates, available_times, available_locations=locations, risk='mean'):
+        """
+        Initialize the Encoder with available dates, times, and locations.
+
+        The soft clause costs are a risk measure (see forecast_store.RISKS) of the check-ins,
+        the check-ins themselves are always the point forecast.
+        """
         self.available_dates = self.flatten_list(available_dates)
         self.available_times = available_times  
         self.available_locations = available_locations  
+        self.risk = risk
+        self.risk_checkins = {}
         self.date_time_loc_to_literal = {}
         self.literal_to_date_time_loc = {}
         self.literal_groups = []  # Changed to a list to hold lists for each date
         self.date_literals = []  
         self.date_time_loc_to_checkins = {} 
-        self.generate_mappings()
-        self.associate_values_from_location_files()
+        with span("encode", days=len(self.available_dates), locations=len(self.available_locations)) as record:
+            self.generate_mappings()
+            record["lits"] = len(self.literal_to_date_time_loc)
+        with span("forecast_lookup", lits=len(self.literal_to_date_time_loc)):
+            self.associate_values_from_location_files()
 
     def flatten_list(self, nested_list):
         """Flatten a nested list into a single list."""
@@ -36,6 +49,8 @@ class Encoder:
     def generate_mappings(self):
         """Generate mappings between (date, time, location) and literals."""
         index = 1
+        # Checked once, as logging every literal is costly even when it is filtered out
+        debug = logger.isEnabledFor(logging.DEBUG)
         for day_idx, date_str in enumerate(self.available_dates):
             parsed_date, _ = self.parse_iso_format(date_str)
             day_times = self.available_times[day_idx]
@@ -51,7 +66,8 @@ class Encoder:
                 time_literal_group = []
                 
                 for loc_idx, location in enumerate(self.available_locations):
-                    print(f"Mapping {(parsed_date, time, location)} -> {index}")
+                    if debug:
+                        logger.debug("Mapping %s -> %d", (parsed_date, time, location), index)
                     self.date_time_loc_to_literal[(parsed_date, time, location)] = index
                     self.literal_to_date_time_loc[index] = (parsed_date, time, location)
                     
@@ -82,13 +98,13 @@ class Encoder:
     def decode(self, literal):
         """Decode an integer literal back into a (date, time, location) tuple."""
         if not isinstance(literal, int):
-            print(f"Error: Provided literal {literal} is not an integer.")
+            logger.error("Provided literal %r is not an integer.", literal)
             return None
         
         result = self.literal_to_date_time_loc.get(literal)
         
         if result is None:
-            print(f"Warning: Literal {literal} does not correspond to any date-time-location mapping.")
+            logger.warning("Literal %s does not correspond to any date-time-location mapping.", literal)
         
         return result
 
@@ -96,31 +112,32 @@ class Encoder:
         """
         Associate the predicted check-ins from location forecast files to each encoded (date, time, location).
         The value is stored in self.date_time_loc_to_checkins for each encoded (date, time, location) combination.
+        All literals are looked up in one go from the shared forecast store.
         """
+        if not self.date_time_loc_to_literal:
+            return
+
+        location_index = {location: idx for idx, location in enumerate(self.available_locations)}
+        weekday_of_date = {}
+        literals, loc_indices, weekdays, hours = [], [], [], []
         for (date, time, location), literal in self.date_time_loc_to_literal.items():
             # Extract weekday and hour from the date and time
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            weekday = date_obj.weekday()  # 0=Monday, 6=Sunday
-            hour = int(time.split(':')[0])  # Extract hour (e.g., '15:00' -> 15)
-
-            # Read the corresponding JSON forecast file for the location
-            location_file = os.path.join(DATA_PATH, f"{location}_forecast.json")
-            if not os.path.exists(location_file):
-                print(f"Error: Location forecast file {location_file} not found.")
+            if date not in weekday_of_date:
+                weekday_of_date[date] = datetime.strptime(date, '%Y-%m-%d').weekday()  # 0=Monday, 6=Sunday
+            literals.append(literal)
+            loc_indices.append(location_index[location])
+            weekdays.append(weekday_of_date[date])
+            hours.append(int(time.split(':')[0]))  # Extract hour (e.g., '15:00' -> 15)
+
+        predictions = forecast_store.lookup(self.available_locations, loc_indices, weekdays, hours)
+        for literal, checkins in zip(literals, predictions.tolist()):
+            if checkins != checkins:  # NaN: no forecast for this location or slot
                 continue
-            
-            with open(location_file, 'r') as file:
-                location_data = json.load(file)
-
-            # Find the predicted check-ins for the matching weekday and hour
-            forecast = location_data.get('week_forecast', [])
-            for entry in forecast:
-                if entry['weekday'] == weekday and entry['hour'] == hour:
-                    checkins = entry['pred_checkins']
-                    # Save check-ins as (checkins, encoded_value_of(date_time_location))
-                    self.date_time_loc_to_checkins[literal] = (checkins, literal)
-                    print(f"Associated {checkins} check-ins for encoded value {literal}.")
-                    break
+            # Save check-ins as (checkins, encoded_value_of(date_time_location))
+            self.date_time_loc_to_checkins[literal] = (checkins, literal)
+        if self.risk != 'mean':
+            measures = forecast_store.lookup(self.available_locations, loc_indices, weekdays, hours, risk=self.risk)
+            self.risk_checkins = dict(zip(literals, measures.tolist()))
 
     def get_encoded_values(self):
         """Get all encoded values from the available ISO strings, times, and locations as literals."""
@@ -129,6 +146,18 @@ class Encoder:
             encoded_values.extend(date_literal_group)  # Collect all literals for the final result
         return encoded_values, self.date_time_loc_to_checkins, self.literal_groups, self.date_literals
 
+    def soft_clauses(self):
+        """The (cost, literal) soft clauses of the literals with a forecast, the risk measure rounded up."""
+        return [
+            (int(math.ceil(self.risk_checkins.get(literal, checkins))), literal)
+            for checkins, literal in self.date_time_loc_to_checkins.values()
+        ]
+
+    def location_indices(self, literals):
+        """Index in available_locations of the location of each literal."""
+        location_index = {location: idx for idx, location in enumerate(self.available_locations)}
+        return np.array([location_index[self.literal_to_date_time_loc[literal][2]] for literal in literals], dtype=np.intp)
+
     def get_positive_intersection(self, list1, list2):
         """Get the intersection of elements in the first list with the positive elements in the second list."""
         positive_elements = [x for x in list2 if x > 0]
@@ -138,3 +167,142 @@ class Encoder:
         """Decode a list of integer literals back into a list of (date, time, location) tuples."""
         decoded_values = [self.decode(literal) for literal in literals]
         return decoded_values
+
+class LiteralRanges(Sequence):
+    """
+    Read-only sequence of clauses that are runs of consecutive literals, e.g. the literals
+    of one time slot or of one day. A clause is only materialized as a list when accessed.
+    """
+    def __init__(self, starts, stops):
+        # Clause i holds the literals starts[i] + 1 ... stops[i]
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return list(range(int(self.starts[index]) + 1, int(self.stops[index]) + 1))
+
+    def __iter__(self):
+        for start, stop in zip(self.starts.tolist(), self.stops.tolist()):
+            yield list(range(start + 1, stop + 1))
+
+class CompactCheckins(Mapping):
+    """Literal -> (predicted check-ins, literal) view over a weight array, skipping slots without a forecast."""
+    def __init__(self, weights):
+        self.weights = weights
+        self.literals = np.flatnonzero(~np.isnan(weights)) + 1
+
+    def __getitem__(self, literal):
+        if not isinstance(literal, (int, np.integer)) or not 1 <= literal <= len(self.weights):
+            raise KeyError(literal)
+        checkins = self.weights[literal - 1]
+        if checkins != checkins:
+            raise KeyError(literal)
+        return (float(checkins), int(literal))
+
+    def __iter__(self):
+        return iter(self.literals.tolist())
+
+    def __len__(self):
+        return len(self.literals)
+
+    def values(self):
+        return list(zip(self.weights[self.literals - 1].tolist(), self.literals.tolist()))
+
+class CompactEncoder(Encoder):
+    """
+    Encoder that computes literals arithmetically instead of storing them in dicts.
+
+    The slots of all days are numbered in order, so the literal of (day d, slot s, location l)
+    is `(slot_offsets[d] + s) * L + l + 1` for L locations, the same numbering Encoder uses.
+    Decoding indexes the per-slot day and time arrays, the time groups and day clauses are
+    runs of consecutive literals generated on access, and the check-ins of all literals are
+    looked up with one vectorized indexing of the forecast tables.
+    """
+    def __init__(self, available_dates, available_times, available_locations=locations, risk='mean'):
+        self.available_dates = self.flatten_list(available_dates)
+        self.available_times = available_times
+        self.available_locations = available_locations
+        self.risk = risk
+        self.location_index = {location: idx for idx, location in enumerate(available_locations)}
+        with span("encode", days=len(self.available_dates), locations=len(self.available_locations)) as record:
+            self.generate_mappings()
+            record["lits"] = self.num_literals
+        with span("forecast_lookup", lits=self.num_literals):
+            self.associate_values_from_location_files()
+
+    def generate_mappings(self):
+        """Compute the slot arrays the literals are derived from."""
+        days = len(self.available_dates)
+        num_locations = len(self.available_locations)
+        self.dates = [self.parse_iso_format(date_str)[0] for date_str in self.available_dates]
+        slots_per_day = np.array([len(self.available_times[day_idx]) for day_idx in range(days)], dtype=np.int64)
+        # First global slot index of each day, and one past the last slot
+        self.slot_offsets = np.concatenate(([0], np.cumsum(slots_per_day)))
+        num_slots = int(self.slot_offsets[-1])
+        self.num_literals = num_slots * num_locations
+
+        # Day index and time of each global slot
+        self.slot_day = np.repeat(np.arange(days, dtype=np.int32), slots_per_day)
+        self.slot_time = [time for day_idx in range(days) for time in self.available_times[day_idx]]
+        self.slot_hour = np.array([int(time.split(':')[0]) for time in self.slot_time], dtype=np.int64)
+        # First day index of each date, for encode
+        self.day_of_date = {}
+        for day_idx, date in enumerate(self.dates):
+            self.day_of_date.setdefault(date, day_idx)
+
+        slot_starts = np.arange(num_slots, dtype=np.int64) * num_locations
+        self.literal_groups = LiteralRanges(slot_starts, slot_starts + num_locations)
+        self.date_literals = LiteralRanges(self.slot_offsets[:-1] * num_locations, self.slot_offsets[1:] * num_locations)
+
+    def associate_values_from_location_files(self):
+        """Look up the predicted check-ins of every literal at once, NaN where there is no forecast."""
+        weekdays = np.array([date_cls.fromisoformat(date).weekday() for date in self.dates], dtype=np.int64)
+        tables = forecast_store.tables(self.available_locations)  # (location, weekday, hour)
+        # Rows are slots and columns locations, which flattens into literal order
+        weights = tables[:, weekdays[self.slot_day], self.slot_hour].T
+        self.weights = np.ascontiguousarray(weights).reshape(-1)
+        self.date_time_loc_to_checkins = CompactCheckins(self.weights)
+        costs, _ = forecast_store.cost_tables(self.available_locations, self.risk)
+        self.costs = np.ascontiguousarray(costs[:, weekdays[self.slot_day], self.slot_hour].T).reshape(-1)
+
+    def soft_clauses(self):
+        """The (cost, literal) soft clauses from the precomputed integer cost tables."""
+        literals = self.date_time_loc_to_checkins.literals
+        return list(zip(self.costs[literals - 1].tolist(), literals.tolist()))
+
+    def location_indices(self, literals):
+        """Index in available_locations of the location of each literal."""
+        return (np.asarray(literals, dtype=np.intp) - 1) % len(self.available_locations)
+
+    def encode(self, date_time_loc):
+        """Encode a (date, time, location) tuple into an integer literal."""
+        date, time, location = date_time_loc
+        day_idx = self.day_of_date.get(date)
+        loc_idx = self.location_index.get(location)
+        if day_idx is None or loc_idx is None:
+            return None
+        try:
+            slot_idx = self.available_times[day_idx].index(time)
+        except ValueError:
+            return None
+        return (int(self.slot_offsets[day_idx]) + slot_idx) * len(self.available_locations) + loc_idx + 1
+
+    def decode(self, literal):
+        """Decode an integer literal back into a (date, time, location) tuple."""
+        if not isinstance(literal, (int, np.integer)):
+            logger.error("Provided literal %r is not an integer.", literal)
+            return None
+        if not 1 <= literal <= self.num_literals:
+            logger.warning("Literal %s does not correspond to any date-time-location mapping.", literal)
+            return None
+        slot, loc_idx = divmod(int(literal) - 1, len(self.available_locations))
+        return (self.dates[self.slot_day[slot]], self.slot_time[slot], self.available_locations[loc_idx])
+
+    def get_encoded_values(self):
+        """Get all literals, their check-ins and the lazily generated group and day clauses."""
+        return list(range(1, self.num_literals + 1)), self.date_time_loc_to_checkins, self.literal_groups, self.date_literals
@@ -0,0 +1,218 @@
+import heapq
+import itertools
+from numbers import Integral
+
+# Exact solves an enumeration of alternative schedules may run
+MAX_ENUMERATION_SOLVES = 2000
+
+class FastPathSolver:
+    """
+    Exact solver for schedule problems with the structure built by receive_schedule.
+
+    The problem picks exactly k literals. Each soft unit clause charges its weight when
+    its literal is chosen, and each hard (same time) and penalty (same day) clause
+    charges a fixed weight when none of its literals is chosen. When the time groups
+    and the days are disjoint and every time group lies within a single day, the cost
+    of picking m literals from one day is a convex function of m:
+
+        - the cheapest literal of a day also saves one group and one day penalty,
+        - the cheapest literal of every other group saves one group penalty,
+        - any further literal only adds its own weight.
+
+    Picking the k smallest of these marginal costs over all days is therefore optimal,
+    which gives the same cost as RC2 without building a CNF.
+    """
+    def __init__(self, lits, weights, forbidden, groups, days, clause_weight):
+        self.lits = lits
+        # Cost of choosing each literal
+        self.weights = weights
+        # Literals that can never be chosen (soft clauses with weight 0 are hard in WCNF)
+        self.forbidden = forbidden
+        self.groups = groups
+        self.days = days
+        self.clause_weight = clause_weight
+
+    @classmethod
+    def from_problem(cls, lits, soft, hard, penalty, clause_weight):
+        """
+        Build a fast path solver if the problem has the supported structure.
+
+        Returns:
+            FastPathSolver: The solver, or None if the problem has to go to RC2.
+        """
+        lit_set = set(lits)
+        if len(lit_set) != len(lits) or not all(isinstance(lit, Integral) and lit > 0 for lit in lits):
+            return None
+
+        weights = dict.fromkeys(lits, 0)
+        forbidden = set()
+        for item in soft:
+            if not isinstance(item, (tuple, list)) or len(item) != 2:
+                return None
+            weight, lit = item
+            if not isinstance(weight, Integral) or weight < 0 or lit not in lit_set:
+                return None
+            if weight == 0:
+                forbidden.add(lit)
+            weights[lit] += weight
+
+        groups = cls.disjoint_sets(hard, lit_set)
+        days = cls.disjoint_sets(penalty, lit_set)
+        if groups is None or days is None:
+            return None
+
+        # Every time group has to lie within a single day, or outside all of them
+        day_of = {lit: day_idx for day_idx, day in enumerate(days) for lit in day}
+        for group in groups:
+            if len({day_of.get(lit) for lit in group}) != 1:
+                return None
+
+        return cls(lits, weights, forbidden, groups, days, clause_weight)
+
+    @staticmethod
+    def disjoint_sets(clauses, lit_set):
+        """Return the clauses as lists if they are non-empty, positive and pairwise disjoint, else None."""
+        seen = set()
+        sets = []
+        for clause in clauses:
+            if not isinstance(clause, (list, tuple)) or not clause:
+                return None
+            members = set(clause)
+            if not members <= lit_set or members & seen or len(members) != len(clause):
+                return None
+            seen |= members
+            sets.append(list(clause))
+        return sets
+
+    def unit_marginals(self, groups, loose, day_bonus):
+        """
+        Sorted marginal costs of picking literals from one unit (a day, or a group outside any day).
+
+        Returns:
+            list: (marginal cost, literal) pairs in the order they are worth picking.
+        """
+        items = []
+        for group in groups:
+            allowed = sorted((self.weights[lit], lit) for lit in group if lit not in self.forbidden)
+            if allowed:
+                # The first pick from a group saves the group's clause
+                items.append((allowed[0][0] - self.clause_weight, allowed[0][1]))
+                items.extend(allowed[1:])
+        items.extend((self.weights[lit], lit) for lit in loose if lit not in self.forbidden)
+        items.sort()
+        if items and day_bonus:
+            items[0] = (items[0][0] - self.clause_weight, items[0][1])
+        return items
+
+    def units(self):
+        """Split the problem into independent units, each with a convex cost in the number of picks."""
+        grouped = {lit for group in self.groups for lit in group}
+        in_day = {lit for day in self.days for lit in day}
+
+        for day in self.days:
+            day_set = set(day)
+            yield self.unit_marginals(
+                [group for group in self.groups if group[0] in day_set],
+                [lit for lit in day if lit not in grouped],
+                day_bonus=True,
+            )
+        for group in self.groups:
+            if group[0] not in in_day:
+                yield self.unit_marginals([group], [], day_bonus=False)
+        for lit in self.lits:
+            if lit not in grouped and lit not in in_day:
+                yield self.unit_marginals([], [lit], day_bonus=False)
+
+    def solve(self, k):
+        """
+        Find an optimal schedule with exactly k literals.
+
+        Returns:
+            tuple: (cost, model) as returned by RC2, or None if no schedule exists.
+        """
+        candidates = [
+            (value, unit_idx, position, lit)
+            for unit_idx, items in enumerate(self.units())
+            for position, (value, lit) in enumerate(items)
+        ]
+        if len(candidates) < k:
+            return None
+
+        chosen = heapq.nsmallest(k, candidates)
+        cost = self.clause_weight * (len(self.groups) + len(self.days)) + sum(value for value, _, _, _ in chosen)
+        chosen_lits = {lit for _, _, _, lit in chosen}
+        model = sorted((lit if lit in chosen_lits else -lit for lit in self.lits), key=abs)
+        return (cost, model)
+
+    def solve_restricted(self, k, include, exclude):
+        """
+        Find an optimal schedule with exactly k literals that picks every literal of
+        include and none of exclude.
+
+        Returns:
+            tuple: (cost, model), or None if no such schedule exists.
+        """
+        # A forced literal is cheaper than any marginal it competes with, so it is always
+        # picked first; its cost is added back afterwards
+        bonus = 2 * (max(self.weights.values(), default=0) + 2 * self.clause_weight + 1)
+        weights = dict(self.weights)
+        for lit in include:
+            weights[lit] -= bonus
+        solver = FastPathSolver(self.lits, weights, self.forbidden | exclude, self.groups, self.days, self.clause_weight)
+        result = solver.solve(k)
+        if result is None:
+            return None
+        cost, model = result
+        if not include <= {lit for lit in model if lit > 0}:
+            return None
+        return (cost + bonus * len(include), model)
+
+    def alternatives(self, k, count, min_distance=1, max_solves=MAX_ENUMERATION_SOLVES):
+        """
+        Find the count cheapest schedules with exactly k literals that differ pairwise in
+        at least min_distance literals.
+
+        The schedules are ranked by Lawler's partitioning: once a schedule is ranked, the
+        schedules of its subspace other than itself split into disjoint subspaces that keep
+        its first j - 1 free literals and exclude its j-th, each solved exactly. Ranked
+        schedules closer than min_distance to one already returned are skipped, as are
+        subspaces whose forced literals are already too close to one.
+
+        Args:
+            max_solves (int): Bound on the exact solves, the search stops early when reached.
+
+        Returns:
+            list: (cost, model) pairs in order of non-decreasing cost.
+        """
+        # Two schedules of k literals sharing s literals are 2 * (k - s) apart
+        max_shared = k - (min_distance + 1) // 2
+        first = self.solve(k)
+        if first is None:
+            return []
+
+        found, accepted = [], []
+        order = itertools.count()
+        heap = [(first[0], next(order), frozenset(), frozenset(), first[1])]
+        solves = 1
+        while heap and len(found) < count:
+            cost, _, include, exclude, model = heapq.heappop(heap)
+            if any(len(include & other) > max_shared for other in accepted):
+                continue
+            chosen = frozenset(lit for lit in model if lit > 0)
+            if all(len(chosen & other) <= max_shared for other in accepted):
+                found.append((cost, model))
+                accepted.append(chosen)
+
+            free = sorted(chosen - include)
+            for j, lit in enumerate(free):
+                if solves >= max_solves:
+                    break
+                child_include = include | frozenset(free[:j])
+                if any(len(child_include & other) > max_shared for other in accepted):
+                    continue
+                child_exclude = exclude | {lit}
+                result = self.solve_restricted(k, child_include, child_exclude)
+                solves += 1
+                if result is not None:
+                    heapq.heappush(heap, (result[0], next(order), child_include, child_exclude, result[1]))
+        return found
@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+import threading
+import numpy as np
+try:
+    from .columnar import ColumnarStore
+except ImportError: # Imported by predictor run as a script from this directory
+    from columnar import ColumnarStore
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "data")
+FORECAST_STORAGES = ['json', 'parquet']
+# Levels of the per-slot quantiles WeekPred stores with each forecast
+QUANTILE_LEVELS = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+# Measures of a slot's check-ins the scheduler can weight literals by: the point
+# forecast, the 90th percentile, or the mean of the worst 10% (CVaR at 90%)
+RISKS = ['mean', 'p90', 'cvar90']
+
+def quantile_column(level):
+    """Name of the column holding a quantile level, e.g. 'q90'."""
+    return f"q{round(level * 100)}"
+
+def risk_measure(point, quantiles, risk):
+    """
+    Derive a risk measure from the point forecasts and quantiles of some slots.
+
+    CVaR integrates the quantile function over the upper tail, linearly between the stored
+    levels and flat above the highest one. Slots without quantiles keep the point forecast.
+
+    Args:
+        point (numpy.ndarray): Point forecasts.
+        quantiles (numpy.ndarray): Quantiles at QUANTILE_LEVELS along the last axis, or None.
+        risk (str): One of RISKS.
+    """
+    if risk not in RISKS:
+        raise ValueError(f"Unknown risk measure '{risk}', expected one of {RISKS}.")
+    if risk == 'mean' or quantiles is None:
+        return point
+    levels = np.asarray(QUANTILE_LEVELS)
+    tail = levels >= 0.9
+    if risk == 'p90':
+        measure = quantiles[..., list(levels).index(0.9)]
+    else:
+        tail_levels, tail_values = levels[tail], quantiles[..., tail]
+        widths = np.diff(tail_levels)
+        area = ((tail_values[..., 1:] + tail_values[..., :-1]) / 2 * widths).sum(axis=-1)
+        area += tail_values[..., -1] * (1 - tail_levels[-1])
+        measure = area / (1 - tail_levels[0])
+    return np.where(np.isnan(measure), point, measure)
+
+class ForecastStore:
+    """
+    Process-wide in-memory store for the weekly location forecasts.
+
+    Each `<location>_forecast.json` is parsed once into a dense 7x24 array indexed by
+    (weekday, hour). A file is only parsed again when its modification time changes,
+    so regenerating the forecasts with WeekPred is picked up without a restart.
+
+    With storage='parquet' the forecasts are read from the `forecasts/location=<location>.parquet`
+    files WeekPred writes with parquet storage instead.
+    """
+    def __init__(self, data_path=DATA_PATH, storage='json'):
+        if storage not in FORECAST_STORAGES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {FORECAST_STORAGES}.")
+        self.data_path = data_path
+        self.storage = storage
+        self._columnar = ColumnarStore(data_path)
+        # location -> (mtime_ns, 7x24 array of predicted check-ins, 7x24xQ quantiles or None)
+        self._tables = {}
+        # (locations, risk) -> (version, integer costs, known slots), see cost_tables
+        self._costs = {}
+        self._lock = threading.Lock()
+
+    def forecast_file(self, location):
+        """Return the path of the forecast file for a location."""
+        if self.storage == 'parquet':
+            return self._columnar.forecast_file(location)
+        return os.path.join(self.data_path, f"{location}_forecast.json")
+
+    def version(self, locations):
+        """
+        Identify the current state of the forecast files of the given locations.
+        The version changes whenever any of the files is rewritten, e.g. by WeekPred.preds_to_json.
+        """
+        version = []
+        for location in locations:
+            try:
+                version.append(os.stat(self.forecast_file(location)).st_mtime_ns)
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def _read_table(self, location_file):
+        """
+        Parse a forecast file into a 7x24 array and, if the file has them, a 7x24xQ array
+        of quantiles. Missing (weekday, hour) slots are NaN.
+        """
+        with open(location_file, 'r') as file:
+            location_data = json.load(file)
+
+        table = np.full((7, 24), np.nan)
+        levels = location_data.get('quantile_levels')
+        quantiles = None
+        if levels is not None:
+            if tuple(levels) == QUANTILE_LEVELS:
+                quantiles = np.full((7, 24, len(levels)), np.nan)
+            else:
+                logger.warning("Ignoring quantiles of %s at levels %s, expected %s.", location_file, levels, QUANTILE_LEVELS)
+        for entry in location_data.get('week_forecast', []):
+            weekday, hour = entry['weekday'], entry['hour']
+            # Keep the first entry for a slot, as the linear scan used to do
+            if np.isnan(table[weekday, hour]):
+                table[weekday, hour] = entry['pred_checkins']
+                if quantiles is not None and 'quantiles' in entry:
+                    quantiles[weekday, hour] = entry['quantiles']
+        return table, quantiles
+
+    def _entry(self, location):
+        """The cached (mtime, table, quantiles) of a location, reloaded if the file has changed, else None."""
+        location_file = self.forecast_file(location)
+        try:
+            mtime = os.stat(location_file).st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._tables.pop(location, None)
+            return None
+
+        cached = self._tables.get(location)
+        if cached is not None and cached[0] == mtime:
+            return cached
+
+        with self._lock:
+            cached = self._tables.get(location)
+            if cached is None or cached[0] != mtime:
+                if self.storage == 'parquet':
+                    cached = (mtime, self._columnar.read_forecast(location),
+                              self._columnar.read_forecast_quantiles(location, [quantile_column(level) for level in QUANTILE_LEVELS]))
+                else:
+                    cached = (mtime, *self._read_table(location_file))
+                self._tables[location] = cached
+        return cached
+
+    def table(self, location):
+        """
+        Get the 7x24 forecast table of a location, reloading it if the file has changed.
+
+        Returns:
+            numpy.ndarray: The table, or None if the forecast file does not exist.
+        """
+        entry = self._entry(location)
+        return None if entry is None else entry[1]
+
+    def quantiles(self, location):
+        """The 7x24xQ quantiles at QUANTILE_LEVELS of a location, None if its forecast has none."""
+        entry = self._entry(location)
+        return None if entry is None else entry[2]
+
+    def tables(self, locations):
+        """
+        Stack the forecast tables of the given locations into a (location, weekday, hour) array.
+        Locations without a forecast file are filled with NaN.
+        """
+        stacked = np.full((len(locations), 7, 24), np.nan)
+        for loc_idx, location in enumerate(locations):
+            table = self.table(location)
+            if table is None:
+                logger.error("Location forecast file %s not found.", self.forecast_file(location))
+                continue
+            stacked[loc_idx] = table
+        return stacked
+
+    def risk_tables(self, locations, risk='mean'):
+        """
+        Stack a risk measure (see RISKS) of the given locations into a (location, weekday, hour)
+        array. Locations whose forecast has no quantiles fall back to the point forecast.
+        """
+        stacked = self.tables(locations)
+        if risk == 'mean':
+            return stacked
+        for loc_idx, location in enumerate(locations):
+            stacked[loc_idx] = risk_measure(stacked[loc_idx], self.quantiles(location), risk)
+        return stacked
+
+    def cost_tables(self, locations, risk='mean'):
+        """
+        Integer costs of the given locations as a (location, weekday, hour) array, a risk
+        measure of the check-ins rounded up as receive_schedule rounds the soft clause
+        weights. Computed once per forecast version and risk measure.
+
+        Returns:
+            tuple: (costs, known) arrays, costs are 0 where known is False (no forecast).
+        """
+        key = (tuple(locations), risk)
+        version = self.version(locations)
+        cached = self._costs.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        stacked = self.risk_tables(locations, risk)
+        known = ~np.isnan(stacked)
+        costs = np.zeros(stacked.shape, dtype=np.int64)
+        costs[known] = np.ceil(stacked[known])
+        with self._lock:
+            self._costs[key] = (version, costs, known)
+        return costs, known
+
+    def lookup(self, locations, loc_indices, weekdays, hours, risk='mean'):
+        """
+        Look up the predicted check-ins for many (location, weekday, hour) triples at once.
+
+        Args:
+            locations (list): Location names that loc_indices refer to.
+            loc_indices, weekdays, hours (array-like): Equally long index sequences.
+            risk (str): The measure of the check-ins to look up, one of RISKS.
+
+        Returns:
+            numpy.ndarray: Predicted check-ins per triple, NaN where no forecast exists.
+        """
+        stacked = self.risk_tables(locations, risk)
+        return stacked[
+            np.asarray(loc_indices, dtype=np.intp),
+            np.asarray(weekdays, dtype=np.intp),
+            np.asarray(hours, dtype=np.intp),
+        ]
+
+# Shared by every Encoder in the process, FORECAST_DATA_PATH overrides the data directory
+forecast_store = ForecastStore(
+    os.environ.get("FORECAST_DATA_PATH", DATA_PATH),
+    storage=os.environ.get("FORECAST_STORAGE", "json"),
+)
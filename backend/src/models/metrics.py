@@ -0,0 +1,125 @@
+import bisect
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus layout."""
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus the overflow (+Inf) bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def snapshot(self):
+        """Cumulative count per upper bound, with the sum and count of all observations."""
+        cumulative, running = {}, 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+class Metrics:
+    """
+    Stage latency histograms of the scheduling pipeline.
+
+    Code wraps each stage in `span(stage, **attributes)`. The duration is recorded in the
+    stage's histogram and, when a trace is active in the thread, the span and its
+    attributes (literal count, clause count, k, ...) are appended to the trace.
+    """
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        start = time.perf_counter()
+        record = {"stage": stage, **attributes}
+        try:
+            # Callers may add attributes known only once the stage has run
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            record["ms"] = round(seconds * 1000, 3)
+            self.observe(stage, seconds)
+            trace = getattr(self._local, "trace", None)
+            if trace is not None:
+                trace.append(record)
+            logger.debug("span %s", record)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def start_trace(self):
+        """Start collecting the spans of this thread, e.g. for one request."""
+        self._local.trace = []
+
+    def finish_trace(self):
+        """Stop collecting and return the spans recorded since start_trace."""
+        trace, self._local.trace = getattr(self._local, "trace", None) or [], None
+        return trace
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: histogram.snapshot() for stage, histogram in sorted(self._histograms.items())}
+
+    def render(self):
+        """The histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP schedule_stage_seconds Latency of the scheduling pipeline stages.",
+            "# TYPE schedule_stage_seconds histogram",
+        ]
+        for stage, histogram in self.snapshot().items():
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'schedule_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'schedule_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'schedule_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+@contextmanager
+def profiled(enabled, limit=30):
+    """
+    Profile the block with cProfile if enabled. The yielded dict gets a 'stats' entry with
+    the `limit` most expensive functions by cumulative time once the block has finished.
+    """
+    capture = {}
+    if not enabled:
+        yield capture
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield capture
+    finally:
+        profile.disable()
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(limit)
+        capture["stats"] = output.getvalue()
+
+# Shared by the app and the models in the process
+metrics = Metrics()
+span = metrics.span
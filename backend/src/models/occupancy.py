@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS occupancy ("
+    " date TEXT NOT NULL, time TEXT NOT NULL, location TEXT NOT NULL, bookings INTEGER NOT NULL,"
+    " PRIMARY KEY (date, time, location)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS generation (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO generation VALUES (0, 0)",
+]
+# Add a delta to a slot, never going below zero bookings
+UPSERT = (
+    "INSERT INTO occupancy VALUES (?, ?, ?, max(?, 0)) "
+    "ON CONFLICT (date, time, location) DO UPDATE SET bookings = max(bookings + ?, 0)"
+)
+
+class OccupancyLedger:
+    """
+    Bookings of our own users per (date, time, location) slot, the keys Encoder maps to literals.
+
+    Schedules that are booked add to the load of their slots, so later requests are steered
+    away from slots our users already crowd. Without a path the ledger lives in this
+    process: a dict of dates to slot counters, updated under a lock and read without one.
+    With a path it is a SQLite database in WAL mode shared by every worker process, where
+    an update is a single upsert per slot and reads never wait for writers.
+
+    Every update bumps the ledger's generation, so results derived from the bookings can
+    be cached until the next booking.
+    """
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): SQLite database file, None for a ledger in this process only.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._days = {}  # date -> Counter of (time, location), the in-process ledger
+        self._generation = 0
+        self._local = threading.local()  # SQLite connection of each thread
+        if path is not None:
+            connection = self._connection()
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+
+    def _connection(self):
+        """The SQLite connection of this thread, opened again in a forked process."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def update(self, slots, delta):
+        """
+        Add delta bookings to each (date, time, location) slot, at most down to zero.
+
+        Args:
+            slots (list): Slot keys, a slot listed twice is updated twice.
+            delta (int): Bookings to add per listed slot, negative to release them.
+        """
+        changes = Counter((date, time, location) for date, time, location in slots)
+        if not changes:
+            return
+        if self.path is None:
+            with self._lock:
+                for (date, time, location), count in changes.items():
+                    day = self._days.setdefault(date, Counter())
+                    day[time, location] = max(day[time, location] + delta * count, 0)
+                    if not day[time, location]:
+                        del day[time, location]
+                self._generation += 1
+            return
+
+        connection = self._connection()
+        # One write transaction, so other processes see all of a schedule's slots or none
+        with connection:
+            connection.executemany(UPSERT, [(*slot, delta * count, delta * count) for slot, count in changes.items()])
+            connection.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+
+    def book(self, slots):
+        """Record one booking of each slot of a schedule."""
+        self.update(slots, 1)
+
+    def release(self, slots):
+        """Remove one booking of each slot of a schedule."""
+        self.update(slots, -1)
+
+    def bookings(self, dates):
+        """
+        Booked slots on the given dates.
+
+        Args:
+            dates (iterable): Dates as 'YYYY-MM-DD' strings.
+
+        Returns:
+            dict: (date, time, location) -> bookings, only slots with bookings.
+        """
+        dates = set(dates)
+        if not dates:
+            return {}
+        if self.path is None:
+            # Copies of the counters, which writers may change meanwhile
+            return {
+                (date, time, location): count
+                for date in dates
+                for (time, location), count in dict(self._days.get(date, {})).items()
+            }
+
+        rows = self._connection().execute(
+            "SELECT date, time, location, bookings FROM occupancy WHERE date BETWEEN ? AND ? AND bookings > 0",
+            (min(dates), max(dates)),
+        )
+        return {(date, time, location): count for date, time, location, count in rows if date in dates}
+
+    def generation(self):
+        """Number of updates made to the ledger so far."""
+        if self.path is None:
+            return self._generation
+        return self._connection().execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+
+    def clear(self):
+        """Remove every booking."""
+        if self.path is None:
+            with self._lock:
+                self._days = {}
+                self._generation += 1
+            return
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM occupancy")
+            connection.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
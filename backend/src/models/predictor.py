@@ -1,39 +1,106 @@
-from prophet import Prophet
+import numpy as np
 import pandas as pd
 import os
 import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from statistics import NormalDist
+try:
+    from .columnar import OUTDOOR, STORAGES, ColumnarStore
+    from .forecast_store import DATA_PATH, QUANTILE_LEVELS, quantile_column
+    from .registry import is_outdoor
+    from .timefeatures import week_slots, weekday_hour
+except ImportError: # Run as a script from this directory
+    from columnar import OUTDOOR, STORAGES, ColumnarStore
+    from forecast_store import DATA_PATH, QUANTILE_LEVELS, quantile_column
+    from registry import is_outdoor
+    from timefeatures import week_slots, weekday_hour
+
+# Monday the predicted week is placed on, so that dt.dayofweek gives back the weekday
+WEEK_START = pd.Timestamp('1970-01-05')
+BACKENDS = ['prophet', 'profile']
+AGGREGATIONS = ['mean', 'median', 'trimmed']
+# Share of the predictive distribution inside Prophet's yhat_lower..yhat_upper (its interval_width)
+PROPHET_INTERVAL = 0.8
 
 class WeekPred:
-    def __init__(self, data_dir):  # initializing the class and setting the base for where the data is stored
-        self.data_dir = data_dir
+    def __init__(self, data_dir, backend='prophet', half_life=None, aggregation='mean', trim=0.1,
+                 storage='csv', start=None, end=None, output_dir=None):
+        """
+        Args:
+            data_dir (str): Directory of the per-location history CSV files.
+            backend (str): 'prophet' fits Prophet on the weekly mean table, 'profile' computes
+                the weekday-hour profile directly with NumPy.
+            half_life (float): For the profile backend, age in days at which an observation
+                counts half as much as the latest one. None weights all observations equally.
+            aggregation (str): For the profile backend, 'mean', 'median' or 'trimmed' (mean).
+            trim (float): Share of the weight cut from each end for the trimmed mean.
+            storage (str): 'csv' reads data_dir/<location>.csv and writes JSON forecasts, 'parquet'
+                reads the OutClean parquet dataset and also writes the forecast as parquet.
+            start, end: Optional time range of the history to fit on (end exclusive). With parquet
+                storage the range is pushed down to the reader.
+            output_dir (str): Directory the forecasts are written to, data_dir by default.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}.")
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {AGGREGATIONS}.")
+        if storage not in STORAGES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {STORAGES}.")
+        self.data_dir = data_dir  # the base for where the data is stored
+        self.output_dir = data_dir if output_dir is None else output_dir
+        self.backend = backend
+        self.half_life = half_life
+        self.aggregation = aggregation
+        self.trim = trim
+        self.storage = storage
+        self.start = start
+        self.end = end
 
     def select_location(self, location):
+        if self.storage == 'parquet':
+            # Only the time and check-ins columns of the months in range are decoded
+            name = os.path.splitext(location)[0]
+            data = ColumnarStore(self.data_dir).read_series(OUTDOOR, name, start=self.start, end=self.end)
+            if data.empty:
+                print(f"Data for location '{location}' not found in {os.path.join(self.data_dir, OUTDOOR)}.")
+                return None
+            return data
+
         fpath = os.path.join(self.data_dir, f"{location}")
         try:
             data = pd.read_csv(fpath)
-            data['time'] = pd.to_datetime(data['time'])  # Ensure 'time' is in datetime format
-            return data
+            data['time'] = pd.to_datetime(data['time'], format='ISO8601')  # Ensure 'time' is in datetime format
         except FileNotFoundError:
             print(f"Data for location '{location}' not found at {fpath}.")
             return None
+        if self.start is not None:
+            data = data[data['time'] >= pd.Timestamp(self.start)]
+        if self.end is not None:
+            data = data[data['time'] < pd.Timestamp(self.end)]
+        return data
 
     def aggregate_week(self, dataframe):
-        dataframe['weekday'] = dataframe['time'].dt.dayofweek  # mon-sun 0-6
-        dataframe['hour'] = dataframe['time'].dt.hour
+        dataframe['weekday'], dataframe['hour'] = weekday_hour(dataframe['time'])  # weekday mon-sun 0-6
         week_schedule = dataframe.groupby(['weekday', 'hour'])['check-ins'].mean().reset_index()
         return week_schedule
 
     def fit_prophet(self, data):
+        # Imported here, as loading Prophet takes seconds and the profile backend does not need it
+        from prophet import Prophet
+
         # Prepare the data for Prophet with required column names
-        data['time'] = pd.to_datetime(data['weekday'], unit='D') + pd.to_timedelta(data['hour'], unit='h')
+        data['time'] = WEEK_START + pd.to_timedelta(data['weekday'], unit='D') + pd.to_timedelta(data['hour'], unit='h')
         data = data[['time', 'check-ins']].rename(columns={'time': 'ds', 'check-ins': 'y'})  # Rename columns
-        
+
         model = Prophet(
             daily_seasonality=True,
             weekly_seasonality=True,
-            yearly_seasonality=False
+            yearly_seasonality=False,
+            interval_width=PROPHET_INTERVAL,
         )
         model.fit(data)
         return model
@@ -41,28 +108,142 @@ class WeekPred:
     def predict_week(self, model):
         # Extend prediction to 336 hours (2 weeks)
         week = model.make_future_dataframe(periods=168, freq='h')
-        forecast = model.predict(week)
-        return forecast[['ds', 'yhat']].head(168).rename(columns={'ds': 'time', 'yhat': 'check-ins'})
+        forecast = model.predict(week).head(168)
+        predictions = forecast[['ds', 'yhat']].rename(columns={'ds': 'time', 'yhat': 'check-ins'})
+
+        # Quantiles of a normal distribution matching the uncertainty interval
+        normal = NormalDist()
+        sigma = (forecast['yhat_upper'] - forecast['yhat_lower']).to_numpy() / (2 * normal.inv_cdf(0.5 + PROPHET_INTERVAL / 2))
+        for level in QUANTILE_LEVELS:
+            predictions[quantile_column(level)] = forecast['yhat'].to_numpy() + normal.inv_cdf(level) * sigma
+        return predictions
+
+    def profile_week(self, dataframe):
+        """
+        Forecast the week as the (weighted) weekday-hour profile of the history.
+
+        Returns:
+            DataFrame: 168 hourly predictions starting on a Monday, in the format of predict_week.
+        """
+        times = dataframe['time']
+        slots = week_slots(times)
+        values = dataframe['check-ins'].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        slots, values = slots[valid], values[valid]
+
+        if self.half_life:
+            # Exponential recency weighting relative to the latest observation
+            age_days = ((times.max() - times[valid]).dt.total_seconds() / 86400).to_numpy()
+            weights = 0.5 ** (age_days / self.half_life)
+        else:
+            weights = np.ones(len(values))
+
+        if self.aggregation == 'mean':
+            totals = np.bincount(slots, weights=weights, minlength=168)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                profile = np.bincount(slots, weights=weights * values, minlength=168) / totals
+        else:
+            profile = self.trimmed_profile(slots, values, weights)
+
+        predictions = pd.DataFrame({
+            'time': WEEK_START + pd.to_timedelta(np.arange(168), unit='h'),
+            'check-ins': self.fill_week(profile),
+        })
+        quantiles = self.slot_quantiles(slots, values, weights)
+        for idx, level in enumerate(QUANTILE_LEVELS):
+            predictions[quantile_column(level)] = self.fill_week(quantiles[:, idx])
+        return predictions
+
+    @staticmethod
+    def fill_week(profile):
+        """Fill slots without history from the same hour on other days, then with zero."""
+        table = pd.DataFrame(profile.reshape(7, 24))
+        return table.fillna(table.mean(axis=0)).fillna(0.0).to_numpy().ravel()
+
+    @staticmethod
+    def weight_intervals(slots, values, weights):
+        """
+        Sort the observations by slot and value and place each one's weight on [0, 1] within its slot.
+
+        Returns:
+            tuple: (slots, values, lower, upper, totals) with totals the weight of each slot.
+        """
+        order = np.lexsort((values, slots))
+        slots, values, weights = slots[order], values[order], weights[order]
+
+        totals = np.bincount(slots, weights=weights, minlength=168)
+        cumulative = np.cumsum(weights)
+        # Cumulative weight before each slot starts
+        offsets = np.concatenate(([0.0], np.cumsum(totals)[:-1]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            upper = (cumulative - offsets[slots]) / totals[slots]
+            lower = upper - weights / totals[slots]
+        return slots, values, lower, upper, totals
+
+    def slot_quantiles(self, slots, values, weights):
+        """Weighted quantiles at QUANTILE_LEVELS of the values in each slot, as a 168xQ array."""
+        slots, values, lower, upper, _ = self.weight_intervals(slots, values, weights)
+        quantiles = np.full((168, len(QUANTILE_LEVELS)), np.nan)
+        for idx, level in enumerate(QUANTILE_LEVELS):
+            # The observation whose weight interval covers the level
+            covering = (lower < level) & (upper >= level)
+            quantiles[slots[covering], idx] = values[covering]
+        return quantiles
+
+    def trimmed_profile(self, slots, values, weights):
+        """Weighted median or trimmed mean of the values in each of the 168 weekday-hour slots."""
+        if self.aggregation == 'median':
+            return self.slot_quantiles(slots, values, weights)[:, QUANTILE_LEVELS.index(0.5)]
+
+        slots, values, lower, upper, totals = self.weight_intervals(slots, values, weights)
+
+        # Share of each observation's weight inside [trim, 1 - trim]
+        kept = np.clip(np.minimum(upper, 1 - self.trim) - np.maximum(lower, self.trim), 0, None) * totals[slots]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.bincount(slots, weights=kept * values, minlength=168) / np.bincount(slots, weights=kept, minlength=168)
+
+    def predict_location(self, data):
+        """Forecast the week from a location's history with the configured backend."""
+        if self.backend == 'profile':
+            return self.profile_week(data)
+        week_data = self.aggregate_week(data)
+        model = self.fit_prophet(week_data)
+        return self.predict_week(model)
 
     def preds_to_json(self, predictions, location, output_file):
-        predictions['weekday'] = predictions['time'].dt.dayofweek
-        predictions['hour'] = predictions['time'].dt.hour
-
-        week_forecast = []
-        for _, row in predictions.iterrows():
-            week_forecast.append({
-                "weekday": int(row['weekday']),
-                "hour": int(row['hour']),
-                "pred_checkins": float(row['check-ins'])
-            })
-        
+        weekdays, hours = weekday_hour(predictions['time'])
+        predictions['weekday'], predictions['hour'] = weekdays, hours
+
+        # Built from plain lists of the columns rather than row by row
+        week_forecast = [
+            {"weekday": weekday, "hour": hour, "pred_checkins": checkins}
+            for weekday, hour, checkins in zip(
+                weekdays.tolist(), hours.tolist(), predictions['check-ins'].to_numpy(dtype=float).tolist()
+            )
+        ]
+
         result = {
             "location": location,
             "week_forecast": week_forecast
         }
+        columns = [quantile_column(level) for level in QUANTILE_LEVELS]
+        if all(column in predictions for column in columns):
+            # The per-slot quantiles, for scheduling by a risk measure
+            result["quantile_levels"] = list(QUANTILE_LEVELS)
+            quantiles = predictions[columns].to_numpy(dtype=float).round(3).tolist()
+            for entry, slot_quantiles in zip(week_forecast, quantiles):
+                entry["quantiles"] = slot_quantiles
 
-        with open(output_file, 'w') as f:
-            json.dump(result, f, indent=4)
+        # Write to a temporary file and rename it, so readers never see a partial forecast
+        tmp_file = f"{output_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(result, f, indent=4)
+            os.replace(tmp_file, output_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
 
     def plot_predictions(self, all_predictions):
         plt.figure(figsize=(12, 6))
@@ -84,36 +265,98 @@ class WeekPred:
         plt.tight_layout()
         plt.show()
 
-    def run_for_locations(self, locations):
-        all_predictions = {}
+    def forecast_location(self, location):
+        """
+        Fit, predict and save the forecast of one location.
 
-        for location in locations:
-            data = self.select_location(location)
-            
-            if data is not None:
-                week_data = self.aggregate_week(data)
+        Returns:
+            tuple: (predictions, timings) where timings maps each stage to seconds,
+            or (None, timings) if there is no data for the location.
+        """
+        timings = {}
+        start = time.perf_counter()
+        data = self.select_location(location)
+        timings['load'] = time.perf_counter() - start
 
-                model = self.fit_prophet(week_data)
+        if data is None:
+            return None, timings
 
-                predictions = self.predict_week(model)
+        stage = time.perf_counter()
+        predictions = self.predict_location(data)
+        timings['forecast'] = time.perf_counter() - stage
 
-                if location in ["Hietaniemi.csv", "Paloheinä.csv", "Pirkkola.csv"]:
-                    predictions['check-ins'] *= 0.3
-                
+        if is_outdoor(location.split('.')[0]):
+            scaled = ['check-ins'] + [column for column in map(quantile_column, QUANTILE_LEVELS) if column in predictions]
+            predictions[scaled] *= 0.3
+
+        stage = time.perf_counter()
+        output_file = os.path.join(self.output_dir, f"{location.split('.')[0]}_forecast.json")
+        self.preds_to_json(predictions, location, output_file)
+        if self.storage == 'parquet':
+            ColumnarStore(self.output_dir).write_forecast(location.split('.')[0], predictions.rename(columns={'check-ins': 'pred_checkins'}))
+        timings['write'] = time.perf_counter() - stage
+        timings['total'] = time.perf_counter() - start
+        print(f"Predictions for location {location} saved to {output_file}.")
+        return predictions, timings
+
+    def run_for_locations(self, locations, workers=1, headless=False):
+        """
+        Forecast every location and plot the predictions.
+
+        Args:
+            locations (list): Location CSV file names.
+            workers (int): Number of processes fitting locations concurrently, 1 runs in this process.
+            headless (bool): Skip plotting, e.g. for scheduled refreshes.
+
+        Returns:
+            dict: Per-location stage timings in seconds.
+        """
+        all_predictions = {}
+        timings = {}
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self.forecast_location, location): location for location in locations}
+                for future in as_completed(futures):
+                    predictions, timings[futures[future]] = future.result()
+                    if predictions is not None:
+                        all_predictions[futures[future]] = predictions
+            # Keep the order of the location list
+            timings = {location: timings[location] for location in locations}
+            all_predictions = {location: all_predictions[location] for location in locations if location in all_predictions}
+        else:
+            for location in locations:
+                predictions, timings[location] = self.forecast_location(location)
+                if predictions is not None:
+                    # Store predictions for plotting
+                    all_predictions[location] = predictions
+
+        for location, stages in timings.items():
+            print(f"{location}: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stages.items()))
 
-                output_file = f"data/{location.split('.')[0]}_forecast.json"
-                self.preds_to_json(predictions, location, output_file)
-                print(f"Predictions for location {location} saved to {output_file}.")
-                
-                # Store predictions for plotting
-                all_predictions[location] = predictions
-        
         # Plot all predictions after processing all locations
-        self.plot_predictions(all_predictions)
+        if not headless:
+            self.plot_predictions(all_predictions)
+        return timings
 
 # for actually running this
 if __name__ == "__main__":
-    predictor = WeekPred('data/')  # Adjusting the data directory
+    parser = argparse.ArgumentParser(description="Forecast weekly check-ins for every location.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Locations fitted concurrently")
+    parser.add_argument("--headless", action="store_true", help="Skip plotting the predictions")
+    parser.add_argument("--backend", choices=BACKENDS, default='prophet', help="Forecasting backend")
+    parser.add_argument("--half-life", type=float, default=None, help="Recency half-life in days (profile backend)")
+    parser.add_argument("--aggregation", choices=AGGREGATIONS, default='mean', help="Slot aggregation (profile backend)")
+    parser.add_argument("--storage", choices=STORAGES, default='csv', help="Read the history from CSV files or the parquet dataset")
+    parser.add_argument("--start", default=None, help="Fit on history from this time on")
+    parser.add_argument("--end", default=None, help="Fit on history before this time")
+    parser.add_argument("--data-dir", default=DATA_PATH, help="Directory of the location histories")
+    parser.add_argument("--output-dir", default=DATA_PATH, help="Directory the forecasts are written to")
+    args = parser.parse_args()
+
+    predictor = WeekPred(args.data_dir, backend=args.backend, half_life=args.half_life,
+                         aggregation=args.aggregation, storage=args.storage,
+                         start=args.start, end=args.end, output_dir=args.output_dir)  # Adjusting the data directory
 
     # List of locations (CSV files)
     locations = [
@@ -123,4 +366,4 @@ if __name__ == "__main__":
                 ]
 
     # Run predictor for all specified locations
-    predictor.run_for_locations(locations)
+    predictor.run_for_locations(locations, workers=args.workers, headless=args.headless)
@@ -0,0 +1,74 @@
+import math
+import numpy as np
+
+UNISPORT = 'unisport'
+OUTDOOR_GYM = 'outdoor'
+# Suffix shown after the name of a location of each kind
+KIND_LABELS = {UNISPORT: 'Unisport', OUTDOOR_GYM: 'Outdoor gym'}
+EARTH_RADIUS_KM = 6371.0
+
+# Every location with a forecast, keyed by the name its forecast and history files use.
+# Only the active ones are offered to the scheduler by default.
+LOCATIONS = {
+    'kluuvi': {"display": "Kluuvi", "kind": UNISPORT, "lat": 60.1709, "lon": 24.9470, "active": True},
+    'kumpula': {"display": "Kumpula", "kind": UNISPORT, "lat": 60.2052, "lon": 24.9614, "active": True},
+    'toolo': {"display": "Töölö", "kind": UNISPORT, "lat": 60.1866, "lon": 24.9263, "active": True},
+    'meilahti': {"display": "Meilahti", "kind": UNISPORT, "lat": 60.1894, "lon": 24.9049, "active": True},
+    'otaniemi': {"display": "Otaniemi", "kind": UNISPORT, "lat": 60.1867, "lon": 24.8277, "active": False},
+    'Pirkkola': {"display": "Pirkkola", "kind": OUTDOOR_GYM, "lat": 60.2347, "lon": 24.9195, "active": False},
+    'Paloheinä': {"display": "Paloheinä", "kind": OUTDOOR_GYM, "lat": 60.2579, "lon": 24.9229, "active": False},
+    'Hietaniemi': {"display": "Hietaniemi", "kind": OUTDOOR_GYM, "lat": 60.1745, "lon": 24.9005, "active": False},
+}
+
+def active_locations():
+    """Names of the locations offered to the scheduler by default, in registry order."""
+    return [name for name, location in LOCATIONS.items() if location["active"]]
+
+def is_outdoor(name):
+    """Whether a location is an outdoor gym."""
+    location = LOCATIONS.get(name)
+    return location is not None and location["kind"] == OUTDOOR_GYM
+
+def display_name(name):
+    """Name of a location as shown to users, e.g. 'Töölö (Unisport)'. Unknown locations are taken for Unisport."""
+    location = LOCATIONS.get(name, {"display": name.capitalize(), "kind": UNISPORT})
+    return f"{location['display']} ({KIND_LABELS[location['kind']]})"
+
+def travel_km(origin, names):
+    """
+    Great-circle distances from an origin to locations.
+
+    Args:
+        origin (tuple): (latitude, longitude) in degrees.
+        names (list): Location names, all in LOCATIONS.
+
+    Returns:
+        numpy.ndarray: Distance to each location in kilometres.
+    """
+    lat = np.radians([LOCATIONS[name]["lat"] for name in names])
+    lon = np.radians([LOCATIONS[name]["lon"] for name in names])
+    origin_lat, origin_lon = math.radians(origin[0]), math.radians(origin[1])
+    # Haversine formula
+    a = np.sin((lat - origin_lat) / 2) ** 2 + math.cos(origin_lat) * np.cos(lat) * np.sin((lon - origin_lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def weighted_costs(costs, km, crowd, travel):
+    """
+    Costs of slots as crowd times their cost plus travel times their distance, rounded up.
+
+    A cost of 0 marks a slot as forbidden (a soft clause of weight 0 is hard), so those
+    stay at 0 however far the slot is.
+
+    Args:
+        costs (array-like): Integer cost of each slot.
+        km (array-like): Distance to each slot's location, None without an origin.
+        crowd, travel (float): Weights per unit of cost and per kilometre.
+
+    Returns:
+        numpy.ndarray: The integer costs.
+    """
+    costs = np.asarray(costs, dtype=float)
+    weighted = crowd * costs
+    if km is not None:
+        weighted += travel * np.asarray(km, dtype=float)
+    return np.where(costs == 0, 0, np.ceil(weighted)).astype(int)
@@ -0,0 +1,118 @@
+from datetime import date as date_cls, datetime
+
+# Every day of the horizon, instead of a list of dates, in a 'reweighted' change
+ALL_DAYS = 'all'
+
+def day_of(value):
+    """The 'YYYY-MM-DD' date of an ISO 8601 date or timestamp string."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+
+def week_of(date):
+    """ISO (year, week) of a 'YYYY-MM-DD' date."""
+    return date_cls.fromisoformat(date).isocalendar()[:2]
+
+def flatten_days(days):
+    """Flatten a nested list of days into a single list, as the encoders do."""
+    if days and isinstance(days[0], list):
+        return [day for sublist in days for day in sublist]
+    return list(days)
+
+def apply_changes(days, times, changes):
+    """
+    Apply added and removed slots to a calendar.
+
+    Args:
+        days (list): ISO date strings, as sent to /api/schedule.
+        times (list): The times of each day.
+        changes (dict): Optional 'added' and 'removed' lists of [date, time] pairs.
+
+    Returns:
+        tuple: (days, times) ordered by date, without days that have no times left.
+    """
+    slots = {}
+    for day, day_times in zip(flatten_days(days), times):
+        slots[day_of(day)] = (day, list(day_times))
+
+    for date_value, time in changes.get('removed', []):
+        day_times = slots.get(day_of(date_value), (None, []))[1]
+        if time in day_times:
+            day_times.remove(time)
+    for date_value, time in changes.get('added', []):
+        date = day_of(date_value)
+        day, day_times = slots.setdefault(date, (f"{date}T00:00:00.000Z", []))
+        if time not in day_times:
+            day_times.append(time)
+            day_times.sort()
+
+    kept = [(date, day, day_times) for date, (day, day_times) in sorted(slots.items()) if day_times]
+    return [day for _, day, _ in kept], [day_times for _, _, day_times in kept]
+
+def changed_dates(days, changes):
+    """Dates touched by the changes: those with added or removed slots or updated weights."""
+    dates = {day_of(date_value) for date_value, _ in changes.get('added', []) + changes.get('removed', [])}
+    reweighted = changes.get('reweighted', [])
+    if reweighted == ALL_DAYS:
+        dates |= {day_of(day) for day in flatten_days(days)}
+    else:
+        dates |= {day_of(date_value) for date_value in reweighted}
+    return dates
+
+def plan_window(days, times, n, previous, changes=None, now=None, slot_capacity=1):
+    """
+    Split a re-planning request into the part of the previous schedule that is kept and
+    the window that is solved again.
+
+    The window is every day of the new calendar that lies in the same ISO week as a
+    changed date, so a change is absorbed within its week. Days before `now` are never
+    re-planned, and entries of the previous schedule outside the window are kept as they
+    are. The window has to book the n entries that are not kept; when its slots cannot
+    hold them the window grows to every day from `now` on.
+
+    Args:
+        days, times: The calendar of the previous schedule.
+        n (int): Number of workouts in the schedule.
+        previous (list): The previous schedule as (date, time, location) entries.
+        changes (dict): See apply_changes and changed_dates.
+        now (str): ISO date or timestamp, by default today.
+        slot_capacity (int): Literals per slot, i.e. the number of locations.
+
+    Returns:
+        dict: 'days' and 'times' of the new calendar, 'window_days' and 'window_times' to
+        encode and solve, 'k' entries to book in the window, 'kept' entries of the previous
+        schedule and the re-planned 'dates'.
+
+    Raises:
+        ValueError: If the days from `now` on cannot hold the schedule.
+    """
+    changes = changes or {}
+    today = day_of(now) if now else date_cls.today().isoformat()
+    new_days, new_times = apply_changes(days, times, changes)
+    dates = [day_of(day) for day in new_days]
+
+    weeks = {week_of(date) for date in changed_dates(days, changes) if date >= today}
+    window = {date for date in dates if date >= today and week_of(date) in weeks}
+    plan = _window_plan(new_days, new_times, dates, n, previous, window, slot_capacity)
+    if plan is None:
+        # The changed weeks are too small, re-plan everything that is still ahead
+        plan = _window_plan(new_days, new_times, dates, n, previous, {date for date in dates if date >= today}, slot_capacity)
+    if plan is None:
+        raise ValueError(f"The days from {today} on cannot hold a schedule of {n} workouts.")
+    return plan
+
+def _window_plan(days, times, dates, n, previous, window, slot_capacity):
+    """The plan for a window of dates, or None if the window cannot hold the entries it has to book."""
+    date_set = set(dates)
+    kept = [tuple(entry) for entry in previous if entry[0] in date_set and entry[0] not in window]
+    k = n - len(kept)
+    indices = [idx for idx, date in enumerate(dates) if date in window]
+    if k < 0 or k > slot_capacity * sum(len(times[idx]) for idx in indices) or (k and not indices):
+        return None
+    return {
+        "days": days,
+        "times": times,
+        "window_days": [days[idx] for idx in indices],
+        "window_times": [times[idx] for idx in indices],
+        "k": k,
+        "kept": kept,
+        "dates": [dates[idx] for idx in indices],
+    }
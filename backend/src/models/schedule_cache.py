@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+class ScheduleCache:
+    """
+    Bounded LRU cache with a time-to-live for solved schedule requests.
+
+    Requests are keyed by a canonical hash of their calendar, n, location set and
+    forecast version, so resubmitting the same schedule skips encoding and solving.
+    All entries are dropped as soon as the forecast version changes.
+    """
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl  # Seconds an entry stays valid
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expiry time, value)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(days, times, n, locations, version, risk='mean', objective=None):
+        """
+        Canonical hash of a schedule request.
+
+        Args:
+            days (list): ISO dates, possibly nested as sent by the client.
+            times (list): Times for each date.
+            n (int): Number of workouts.
+            locations (list): Locations the request is encoded with.
+            version (tuple): Forecast version of the locations.
+            risk (str): Risk measure the check-ins are weighted by.
+            objective (dict): User origin and objective weights, see parse_objective in app.
+
+        Returns:
+            str: Hex digest identifying the request.
+        """
+        if days and isinstance(days[0], list):
+            days = [item for sublist in days for item in sublist]
+        calendar = sorted(
+            (datetime.fromisoformat(day.replace('Z', '+00:00')).strftime('%Y-%m-%d'), sorted(day_times))
+            for day, day_times in zip(days, times)
+        )
+        canonical = json.dumps([calendar, len(days), n, sorted(locations), list(version), risk, objective])
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def sync_version(self, version):
+        """Drop every entry if the forecast version has changed since the last call."""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def get(self, key):
+        """Get a cached value, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries beyond maxsize."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
@@ -1,10 +1,406 @@
-from flask_sqlalchemy import SQLAlchemy
-from pysat.examples.rc2 import RC2
+import logging
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from threading import Timer
+from pysat.examples.rc2 import RC2, RC2Stratified
 from pysat.formula import WCNF
-from pysat.card import CardEnc
+from pysat.card import CardEnc, EncType, ITotalizer
+from pysat.pb import PBEnc, EncType as PBEncType, pblib_present
+from pysat.solvers import Solver
+from .fast_path import FastPathSolver
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Weight of the hard (overlapping times) and penalty (same day) clauses
+CLAUSE_WEIGHT = 100
+# Number of warm solvers kept by an incremental Scheduler
+MAX_WARM_SOLVERS = 8
+# Largest k a new warm solver is encoded for, unless the first request needs more
+WARM_UBOUND = 8
+# Share of a solve's time limit spent on stratified RC2 before the linear search takes over
+RC2_SHARE = 0.5
+
+# Cardinality encodings that can be chosen for the Exactly-K constraint, besides
+# 'pb' (native pseudo-boolean encoding through pypblib) and 'auto'
+CARD_ENCODINGS = {
+    'seqcounter': EncType.seqcounter,
+    'sortnetwrk': EncType.sortnetwrk,
+    'cardnetwrk': EncType.cardnetwrk,
+    'totalizer': EncType.totalizer,
+    'kmtotalizer': EncType.kmtotalizer,
+}
+ENCODINGS = list(CARD_ENCODINGS) + ['pb', 'auto']
+# Size (literals times min(k, literals - k)) up to which 'auto' uses the sequential counter
+AUTO_SEQCOUNTER_LIMIT = 20000
+
+def choose_encoding(n, k):
+    """
+    Pick a cardinality encoding for an Exactly-K constraint over n literals.
+
+    The sequential counter is the smallest encoding while n * min(k, n - k) stays small.
+    Beyond that, the pseudo-boolean encoding of pypblib grows the slowest, and the
+    k-modulo totalizer is the best of the pure cardinality encodings.
+    """
+    if n * min(k, n - k) <= AUTO_SEQCOUNTER_LIMIT:
+        return 'seqcounter'
+    return 'pb' if pblib_present else 'kmtotalizer'
+
+def encode_exactly_k(lits, k, encoding='auto', top_id=None):
+    """
+    Encode an Exactly-K constraint over the literals.
+
+    Args:
+        lits (list): The literals.
+        k (int): The bound.
+        encoding (str): One of ENCODINGS.
+        top_id (int): Largest variable in use, auxiliary variables are numbered above it.
+
+    Returns:
+        CNF: The encoded constraint.
+    """
+    if encoding == 'auto':
+        encoding = choose_encoding(len(lits), k)
+    if encoding == 'pb':
+        return PBEnc.equals(lits=lits, bound=k, top_id=top_id)
+    if encoding not in CARD_ENCODINGS:
+        raise ValueError(f"Unknown cardinality encoding '{encoding}', expected one of {ENCODINGS}.")
+    return CardEnc.equals(lits=lits, bound=k, top_id=top_id, encoding=CARD_ENCODINGS[encoding])
+
+def totalizer(lits, ubound, top):
+    """
+    Encode a totalizer over the literals, constrained in both directions.
+
+    Output i (0-based) is true exactly when at least i + 1 of the literals are true.
+    Counts are truncated at ubound, so only outputs up to ubound are exact.
+
+    Returns:
+        tuple: (clauses, outputs, top) where top is the largest variable used.
+    """
+    clauses = []
+    # Each node is the list of its unary count outputs, leaves count a single literal
+    nodes = [[lit] for lit in lits]
+    while len(nodes) > 1:
+        merged = []
+        for left, right in zip(nodes[0::2], nodes[1::2]):
+            size = min(len(left) + len(right), ubound)
+            out = list(range(top + 1, top + size + 1))
+            top += size
+            for i in range(len(left) + 1):
+                for j in range(len(right) + 1):
+                    # left >= i and right >= j imply out >= i + j
+                    if 0 < i + j <= size:
+                        clauses.append([-l for l in (left[i - 1:i] + right[j - 1:j])] + [out[i + j - 1]])
+                    # left <= i and right <= j imply out <= i + j
+                    if i + j < size:
+                        clauses.append(left[i:i + 1] + right[j:j + 1] + [-out[i + j]])
+            merged.append(out)
+        if len(nodes) % 2:
+            merged.append(nodes[-1])
+        nodes = merged
+    return clauses, nodes[0] if nodes else [], top
+
+def solve_problem(problem, k, timeout=None, options=None):
+    """
+    Solve one schedule problem with a Scheduler of its own, e.g. in a worker process.
+
+    Args:
+        problem (dict): 'lits', 'soft', 'hard' and 'penalty' as passed to the Scheduler setters.
+        k (int): The bound for the Exactly-K constraint.
+        timeout (float): Seconds before RC2 is interrupted, see Scheduler.solve_schedule.
+        options (dict): Keyword arguments for the Scheduler.
+
+    Returns:
+        dict: 'cost', 'model', 'optimal' and 'gap', with cost and model None if there is no schedule.
+    """
+    scheduler = Scheduler(**(options or {}))
+    scheduler.set_lits(problem['lits'])
+    scheduler.set_soft(problem['soft'])
+    scheduler.set_hard(problem['hard'])
+    scheduler.set_penalty(problem['penalty'])
+    result = scheduler.solve_schedule(k, timeout=timeout)
+    cost, model = result if result else (None, None)
+    return {"cost": cost, "model": model, "optimal": scheduler.optimal, "gap": scheduler.gap}
+
+def prune_dominated(problem, k):
+    """
+    Drop literals that no optimal schedule of k workouts needs, before the CNF is built.
+
+    Literals in the same hard clause and the same penalty clause, e.g. the locations of
+    one time slot, differ only in their soft clause weight. An optimal schedule can always
+    take the cheapest literal of such a group first, and any further literal of a group
+    only adds its own weight, so it can be swapped for a cheaper further literal of any
+    group. Keeping the cheapest literal of every group and the k - 1 cheapest of the rest
+    therefore keeps the optimal cost. Literals forbidden by a weight 0 soft clause are kept.
+
+    Returns:
+        dict: The problem with the other literals removed from 'lits', 'soft', 'hard' and
+        'penalty', or the problem itself if nothing can be dropped or its clauses overlap.
+    """
+    lits = problem['lits']
+    with span("prune", lits=len(lits), k=k) as record:
+        weights = {}
+        forbidden = set()
+        for weight, lit in problem['soft']:
+            if weight < 0:
+                return problem
+            if weight == 0:
+                forbidden.add(lit)
+            weights[lit] = weights.get(lit, 0) + weight
+
+        # Hard and penalty clause of each literal, which must be unique
+        clause_of = ({}, {})
+        for kind, clauses in enumerate((problem['hard'], problem['penalty'])):
+            for idx, clause in enumerate(clauses):
+                for lit in clause:
+                    if lit <= 0 or lit in clause_of[kind]:
+                        return problem
+                    clause_of[kind][lit] = idx
+
+        cheapest = {}
+        for lit in lits:
+            if lit in forbidden:
+                continue
+            group = (clause_of[0].get(lit), clause_of[1].get(lit))
+            if group not in cheapest or (weights.get(lit, 0), lit) < (weights.get(cheapest[group], 0), cheapest[group]):
+                cheapest[group] = lit
+        kept = set(cheapest.values()) | forbidden
+        rest = sorted((lit for lit in lits if lit not in kept), key=lambda lit: (weights.get(lit, 0), lit))
+        kept.update(rest[:max(k - 1, 0)])
+        record["kept"] = len(kept)
+        if len(kept) >= len(lits):
+            return problem
+
+        return {
+            **problem,
+            'lits': [lit for lit in lits if lit in kept],
+            'soft': [(weight, lit) for weight, lit in problem['soft'] if lit in kept],
+            'hard': [[lit for lit in clause if lit in kept] for clause in problem['hard']],
+            'penalty': [[lit for lit in clause if lit in kept] for clause in problem['penalty']],
+        }
+
+def problem_key(problem, k):
+    """Hashable identity of a problem and bound, equal for requests that need the same solve."""
+    return (
+        k,
+        tuple(problem['lits']),
+        tuple(tuple(item) for item in problem['soft']),
+        tuple(tuple(clause) for clause in problem['hard']),
+        tuple(tuple(clause) for clause in problem['penalty']),
+    )
+
+class WarmSolver:
+    """
+    Incremental MaxSAT solver for one problem shape, i.e. a fixed set of literals and
+    hard/penalty clauses.
+
+    The shape is encoded once into a SAT oracle: a totalizer over the literals and every
+    hard/penalty clause extended with a relaxation variable. The Exactly-K bound and the
+    soft weights only enter a solve through assumptions, so repeated solves keep the
+    encoding and the clauses learned by the oracle.
+
+    Solving is stratified core-guided (OLL, as in RC2). Cores do not depend on the
+    weights, so the cores found for a bound are stored and replayed on later solves
+    with the same bound, and the totalizer built over a core is shared between solves.
+    """
+    def __init__(self, lits, hard, penalty, ubound):
+        self.lits = list(lits)
+        self.top = max([abs(l) for l in self.lits] + [abs(l) for clause in list(hard) + list(penalty) for l in clause])
+        # Variables above this one are auxiliary and never part of a returned model
+        self.nv = self.top
+
+        # The totalizer can enforce any bound k <= ubound
+        self.ubound = min(ubound, len(self.lits))
+        clauses, self.outputs, self.top = totalizer(self.lits, self.ubound + 1, self.top)
+        self.oracle = Solver(name='g3', bootstrap_with=clauses)
+
+        # Relaxation variable of each hard/penalty clause, true when the clause is given up
+        self.relax = []
+        for clause in list(hard) + list(penalty):
+            self.top += 1
+            self.oracle.add_clause(list(clause) + [self.top])
+            self.relax.append(self.top)
+
+        # Cores found so far, by the hard assumptions they were found under
+        self.cores = {}
+        # Totalizer counting the falsified literals of a core, by core
+        self.core_sums = {}
+        # Cost of the cores of the last solve, and whether its deadline passed, see solve
+        self.cost = 0
+        self.interrupted = False
+
+    def bound_assumptions(self, k):
+        """Assumptions enforcing that exactly k of the literals are true."""
+        if k > self.ubound:
+            raise ValueError(f"Warm solver supports k <= {self.ubound}, got k={k}.")
+        assumptions = []
+        if k > 0:
+            assumptions.append(self.outputs[k - 1])
+        if k < len(self.outputs):
+            assumptions.append(-self.outputs[k])
+        return assumptions
+
+    def core_sum(self, core):
+        """Get the totalizer over the negated literals of a core, adding it to the oracle if new."""
+        key = frozenset(core)
+        tot = self.core_sums.get(key)
+        if tot is None:
+            tot = ITotalizer(lits=[-lit for lit in sorted(key)], ubound=1, top_id=self.top)
+            self.oracle.append_formula(tot.cnf.clauses)
+            self.top = max(self.top, tot.top_id)
+            self.core_sums[key] = tot
+        return tot
+
+    def sum_assumption(self, tot, bound):
+        """Assumption literal stating that at most `bound` literals of a core are falsified."""
+        if bound >= len(tot.rhs):
+            tot.increase(ubound=bound, top_id=self.top)
+            if tot.nof_new:
+                self.oracle.append_formula(tot.cnf.clauses[-tot.nof_new:])
+            self.top = max(self.top, tot.top_id)
+        return -tot.rhs[bound]
+
+    def process_core(self, core, weights, sums):
+        """Relax a core: charge its minimum weight and replace it by a cardinality assumption."""
+        min_weight = min(weights[lit] for lit in core)
+        for lit in core:
+            weights[lit] -= min_weight
+            if lit in sums:
+                # The sum may now exceed its bound by one more
+                tot, bound = sums[lit]
+                if bound + 1 < len(tot.lits):
+                    relaxed = self.sum_assumption(tot, bound + 1)
+                    sums[relaxed] = (tot, bound + 1)
+                    weights[relaxed] = weights.get(relaxed, 0) + min_weight
+
+        if len(core) > 1:
+            tot = self.core_sum(core)
+            assumption = self.sum_assumption(tot, 1)
+            sums[assumption] = (tot, 1)
+            weights[assumption] = weights.get(assumption, 0) + min_weight
+        return min_weight
+
+    def solve(self, k, soft, deadline=None, on_model=None):
+        """
+        Solve the shape for a cardinality bound and a list of (weight, literal) soft clauses.
+
+        Args:
+            deadline (float): time.monotonic() at which the solve is interrupted, None for no limit.
+            on_model (callable): Called with the model of every finished weight level, a
+                feasible but not necessarily optimal schedule.
+
+        Returns:
+            tuple: (cost, model) of an optimal schedule, or None if there is none or the
+            deadline passed first. `interrupted` tells the two apart, and `cost` is then
+            the lower bound reached.
+        """
+        self.interrupted = False
+        hard = self.bound_assumptions(k)
+
+        # Weight of each assumption literal, true when its soft clause is satisfied
+        weights = {}
+        for weight, clause in soft:
+            if weight:
+                weights[-clause] = weights.get(-clause, 0) + weight
+            else:
+                # A zero weight makes the clause hard, as in WCNF
+                hard.append(-clause)
+        for r in self.relax:
+            weights[-r] = weights.get(-r, 0) + CLAUSE_WEIGHT
+
+        # Cardinality assumptions introduced while relaxing cores
+        sums = {}
+        cost = 0
+
+        # Replay the cores found by earlier solves under the same hard assumptions
+        cores = self.cores.setdefault(frozenset(hard), [])
+        for core in cores:
+            if all(weights.get(lit, 0) > 0 for lit in core):
+                cost += self.process_core(core, weights, sums)
+
+        # Only soft clauses of at least this weight are assumed
+        level = max(weights.values(), default=0)
+        timer = None
+        if deadline is not None:
+            timer = Timer(max(deadline - time.monotonic(), 0), self.oracle.interrupt)
+            timer.start()
+        try:
+            while True:
+                # Checked here as well, as easy calls finish without noticing the interrupt
+                status = None
+                if deadline is None or time.monotonic() < deadline:
+                    assumptions = [lit for lit, weight in weights.items() if weight >= max(level, 1)]
+                    status = self.oracle.solve_limited(assumptions=hard + assumptions, expect_interrupt=True)
+                if status is None:
+                    self.interrupted = True
+                    self.cost = cost
+                    return None
+                if status:
+                    if on_model is not None:
+                        on_model(self.model())
+                    # Stratification: move on to the next lower weight, if any is left
+                    lower = [weight for weight in weights.values() if 0 < weight < level]
+                    if not lower:
+                        break
+                    level = max(lower)
+                    continue
+
+                core = [lit for lit in self.oracle.get_core() if weights.get(lit, 0) > 0]
+                if not core:
+                    # The hard clauses and the bound alone are unsatisfiable
+                    return None
+                cores.append(core)
+                cost += self.process_core(core, weights, sums)
+        finally:
+            if timer is not None:
+                timer.cancel()
+                self.oracle.clear_interrupt()
+
+        self.cost = cost
+        return (cost, self.model())
+
+    def model(self):
+        """The oracle's last model without the auxiliary variables."""
+        return [l for l in self.oracle.get_model() if abs(l) <= self.nv]
+
+    def delete(self):
+        """Free the SAT oracle."""
+        self.oracle.delete()
+
+class AnytimeRC2(RC2Stratified):
+    """
+    Stratified RC2 reporting the model found at the end of every weight level.
+
+    Each level ends with an assignment satisfying all hard clauses, i.e. a feasible
+    schedule, and the cost of the cores found so far is a lower bound on the optimum.
+    When a time limit interrupts the solver, both are what it has to offer.
+    """
+    def __init__(self, formula, on_model, deadline, **kwargs):
+        """
+        Args:
+            formula (WCNF): The formula to solve.
+            on_model (callable): Called with the model, in the formula's variables, of every finished level.
+            deadline (float): time.monotonic() after which no new level is started.
+        """
+        super().__init__(formula, **kwargs)
+        self.on_model = on_model
+        self.deadline = deadline
+
+    def compute_(self):
+        # The oracle only notices an interrupt at a conflict, so one sent between levels
+        # or during an easy satisfiable call would be lost
+        if time.monotonic() >= self.deadline:
+            self.interrupted = True
+            return None
+        done = super().compute_()
+        if done:
+            i2e = self.vmap.i2e
+            self.on_model([i2e[lit] if lit > 0 else -i2e[-lit] for lit in self.oracle.get_model() if abs(lit) in i2e])
+        return done
 
 class Scheduler:
-    def __init__(self):
+    def __init__(self, incremental=False, fast_path=True, encoding='auto'):
         # List to store literals for the SAT solver
         self.lits = []
         # List of soft clauses in the form ([clause], weight_of_clause)
@@ -13,6 +409,18 @@ class Scheduler:
         self.hard = []
         # List of penalty clauses
         self.penalty = []
+        # Cardinality encoding of the Exactly-K constraint, see ENCODINGS
+        self.set_encoding(encoding)
+        # Whether to solve problems with the structure built by the app without SAT
+        self.fast_path = fast_path
+        # Whether to reuse warm solvers between solves of the same problem shape
+        self.incremental = incremental
+        # Warm solvers by problem shape, least recently used first
+        self.warm_solvers = OrderedDict()
+        # Whether the last solve proved its schedule optimal, False if it ran out of time
+        self.optimal = None
+        # Relative distance of the last schedule's cost from the best lower bound, 0 when optimal
+        self.gap = None
 
     def set_lits(self, literals):
         """Set the literals for the scheduling problem."""
@@ -33,59 +441,476 @@ class Scheduler:
         """Set the hard clauses for the scheduling problem."""
         self.hard = hard_clauses
 
-    def solve_schedule(self, k):
+    def set_encoding(self, encoding):
+        """Set the cardinality encoding used for the Exactly-K constraint."""
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown cardinality encoding '{encoding}', expected one of {ENCODINGS}.")
+        self.encoding = encoding
+
+    def solve_schedule(self, k, timeout=None):
         """
         Use SAT solver to find a valid schedule.
 
         Args:
             k (int): The bound for the Exactly-K constraint.
+            timeout (float): Seconds the solve may take, see solve_anytime. When time runs out
+                the best schedule found so far is returned, `optimal` is set to False and
+                `gap` to its relative distance from the lower bound.
 
         Returns:
             int: The cost of the schedule if found, else None.
         """
-        # Check if lits is a list and print debugging information
+        self.optimal = True
+        self.gap = 0.0
+        # Check if lits is a list and log debugging information
         if not isinstance(self.lits, list):
             raise ValueError("self.lits is not a list.")
         
-        print("Contents of self.lits:", self.lits)
-        print("Number of literals:", len(self.lits))
-        print("Value of k:", k)
+        logger.debug("Contents of self.lits: %s", self.lits)
+        logger.debug("Number of literals: %d, value of k: %d", len(self.lits), k)
         
         if len(self.lits) < k:
             raise ValueError(f"Cannot create an Exactly-K constraint with k={k} for {len(self.lits)} literals.")
 
-        # Create a weighted CNF formula
-        wcnf = WCNF()
-        
-        # Create an Exactly-K constraint using the literals
-        enc = CardEnc.equals(lits=self.lits, bound=k)
-        wcnf.extend(enc)  # Add the cardinality constraint to the WCNF
-
-        # Penalize for choosing overlapping times
-        for clause in self.hard:
-            print("Hard clause:", clause)
-            # Negate literals in the hard clause
-            wcnf.append(clause, weight=100)
-
-        # Penalize for choosing same days
-        for pen in self.penalty:
-            print("Penalty clause for same day", pen)
-            # Negate literals in the penalty clause
-            wcnf.append(pen, weight=100)
-
-        # Add soft clauses with respective weights (negated literals)
-        for weight, clause in self.soft:
-            print("Soft clause:", clause, "with weight:", weight)
-            wcnf.append([-clause], weight)  # Negate literals in the soft clause
+        if self.fast_path:
+            solver = FastPathSolver.from_problem(self.lits, self.soft, self.hard, self.penalty, CLAUSE_WEIGHT)
+            if solver is not None:
+                with span("solve", path="fast", lits=len(self.lits), k=k):
+                    return solver.solve(k)
+
+        if self.incremental and self.lits and all(weight >= 0 for weight, _ in self.soft):
+            return self.solve_incremental(k, timeout)
+
+        wcnf = self.build_wcnf(k)
+        with span("solve", path="rc2", lits=len(self.lits), clauses=len(wcnf.hard) + len(wcnf.soft), k=k) as record:
+            result = self.solve_rc2(wcnf, k, timeout)
+            record["optimal"] = self.optimal
+            record["gap"] = self.gap
+        return result
+
+    def solve_alternatives(self, k, count, min_distance=1, timeout=None):
+        """
+        Find the count cheapest distinct schedules in one call.
+
+        Problems with the fast path structure are enumerated exactly with
+        FastPathSolver.alternatives. Others are solved by a single RC2 instance: after each
+        schedule a hard at-most constraint over its chosen literals blocks it and every
+        schedule closer than min_distance to it, and the warm solver is asked again.
+
+        With a timeout the enumeration runs on AnytimeRC2 and is interrupted when the time is
+        up, returning the schedules found so far and leaving self.optimal False. If not even
+        the first one was found, the best schedule seen, starting from the greedy one, is returned.
+
+        Args:
+            k (int): The bound for the Exactly-K constraint.
+            count (int): Number of schedules wanted.
+            min_distance (int): Least number of literals in which any two schedules differ.
+            timeout (float | None): Time limit in seconds for the whole enumeration.
+
+        Returns:
+            list: (cost, model) pairs in order of non-decreasing cost, fewer than count if
+            the problem has no more schedules that far apart or the time ran out.
+        """
+        if len(self.lits) < k:
+            raise ValueError(f"Cannot create an Exactly-K constraint with k={k} for {len(self.lits)} literals.")
+        self.optimal = True
+        self.gap = 0.0
+
+        if self.fast_path:
+            solver = FastPathSolver.from_problem(self.lits, self.soft, self.hard, self.penalty, CLAUSE_WEIGHT)
+            if solver is not None:
+                with span("solve", path="fast_alternatives", lits=len(self.lits), k=k, count=count) as record:
+                    found = solver.alternatives(k, count, min_distance)
+                    record["found"] = len(found)
+                return found
 
+        wcnf = self.build_wcnf(k)
+        lit_set = set(self.lits)
+        # Two schedules of k literals sharing s literals are 2 * (k - s) apart
+        max_shared = k - (min_distance + 1) // 2
+        top = wcnf.nv
+        found = []
+        timer = None
+        if timeout is None:
+            rc2 = RC2(wcnf)
+        else:
+            best, improve = self.incumbent(k)
+            rc2 = AnytimeRC2(wcnf, improve, time.monotonic() + timeout, exhaust=True, minz=True)
+            timer = Timer(timeout, rc2.interrupt)
+            timer.start()
+        with span("solve", path="rc2_alternatives", lits=len(self.lits), k=k, count=count) as record:
+            try:
+                while len(found) < count:
+                    model = rc2.compute(expect_interrupt=timer is not None)
+                    if model is None:
+                        break
+                    found.append((rc2.cost, model))
+                    if max_shared < 0:
+                        break
+                    chosen = [lit for lit in model if lit > 0 and lit in lit_set]
+                    block = CardEnc.atmost(chosen, bound=max_shared, top_id=top, encoding=EncType.seqcounter)
+                    top = max(top, block.nv)
+                    for clause in block.clauses:
+                        rc2.add_clause(clause)
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                rc2.delete()
+            if timer is not None and rc2.interrupted:
+                logger.info("Solver interrupted after %ss, returning %s alternatives.", timeout, len(found))
+                self.optimal = False
+                if not found and best[0] is not None:
+                    cost = best[0][0]
+                    self.gap = (cost - rc2.cost) / cost if cost else 0.0
+                    found.append(best[0])
+            record["found"] = len(found)
+            record["optimal"] = self.optimal
+        return found
+
+    def solve_rc2(self, wcnf, k, timeout):
+        """Solve a formula built by build_wcnf with RC2, see solve_schedule."""
+        if timeout is not None:
+            return self.solve_anytime(wcnf, k, timeout)
         # Initialize the RC2 solver with the WCNF
         rc2 = RC2(wcnf)
         # Compute the solution using the RC2 solver
-        print("Solving...")
         model = rc2.compute()
+        rc2.delete()
+        if model:
+            logger.debug("Found solution with cost %s.", rc2.cost)
+            return (rc2.cost, model)
+        else:
+            logger.info("No solution found.")
+            return None
+
+    def solve_anytime(self, wcnf, k, timeout):
+        """
+        Solve a formula built by build_wcnf within timeout seconds, keeping the best schedule so far.
+
+        The greedy schedule is the first incumbent. Stratified RC2 then gets RC2_SHARE of the
+        time, improving the incumbent at the end of every weight level and raising the lower
+        bound with every core. If it does not finish, a linear SAT-UNSAT search asks for
+        ever cheaper schedules until none is left, which proves the incumbent optimal, or
+        the time is up.
+
+        Returns:
+            tuple: (cost, model) of the best schedule found, or None if there is none.
+        """
+        deadline = time.monotonic() + timeout
+        best, improve = self.incumbent(k)
+
+        # RC2 adds its selectors to the soft clauses in place, the linear search needs them as built
+        rc2 = AnytimeRC2(wcnf.copy(), improve, time.monotonic() + timeout * RC2_SHARE, exhaust=True, minz=True)
+        timer = Timer(timeout * RC2_SHARE, rc2.interrupt)
+        timer.start()
+        try:
+            model = rc2.compute(expect_interrupt=True)
+        finally:
+            timer.cancel()
+        interrupted, lower_bound = rc2.interrupted, rc2.cost
+        rc2.delete()
         if model:
-            print("Found solution!")
+            logger.debug("Found solution with cost %s.", rc2.cost)
             return (rc2.cost, model)
+        if not interrupted:
+            logger.info("No solution found.")
+            return None
+
+        if self.search_below(wcnf, best, improve, deadline):
+            lower_bound = best[0][0] if best[0] else None
         else:
-            print("No solution found.")
+            logger.info("Solver interrupted after %ss, returning the best schedule found.", timeout)
+            self.optimal = False
+        if best[0] is None:
+            return None
+        cost = best[0][0]
+        self.gap = (cost - lower_bound) / cost if cost else 0.0
+        return best[0]
+
+    def incumbent(self, k):
+        """
+        The best schedule so far of a timed solve, starting from the greedy one.
+
+        Returns:
+            tuple: (best, improve) with best a one-element list holding (cost, model) or None,
+            and improve a callback replacing it by any cheaper model it is given.
+        """
+        lit_set = set(self.lits)
+        best = [self.greedy_schedule(k)]
+
+        def improve(model):
+            chosen = {lit for lit in model if lit > 0 and lit in lit_set}
+            cost = self.schedule_cost(chosen)
+            if cost is not None and (best[0] is None or cost < best[0][0]):
+                best[0] = (cost, sorted((lit if lit in chosen else -lit for lit in self.lits), key=abs))
+        return best, improve
+
+    def search_below(self, wcnf, best, improve, deadline):
+        """
+        Linear SAT-UNSAT search: require a cost below the incumbent's until the oracle finds none.
+
+        Every soft clause gets a literal that is true when it is violated (the negated literal
+        of a unit clause, a fresh one otherwise), and the bound is a pseudo-boolean constraint
+        on their weighted sum. Its adder encoding stays linear in the number of clauses times
+        the bits of the bound, where BDDs and counters grow with the bound itself. Models
+        are passed to improve, which updates best[0].
+
+        Returns:
+            bool: True if no cheaper schedule exists, False if the deadline passed first or
+            pypblib, which encodes the bound, is not installed.
+        """
+        if not pblib_present:
+            return False
+        with Solver(name='g4', bootstrap_with=wcnf.hard) as oracle:
+            top = wcnf.nv
+            violated = []
+            for clause in wcnf.soft:
+                if len(clause) == 1:
+                    violated.append(-clause[0])
+                else:
+                    top += 1
+                    oracle.add_clause(clause + [top])
+                    violated.append(top)
+
+            timer = Timer(max(deadline - time.monotonic(), 0), oracle.interrupt)
+            timer.start()
+            try:
+                while True:
+                    # Checked here as well, as easy calls finish without noticing the interrupt
+                    if time.monotonic() >= deadline:
+                        return False
+                    if best[0] is not None:
+                        if best[0][0] == 0:
+                            return True
+                        bound = PBEnc.atmost(lits=violated, weights=wcnf.wght, bound=best[0][0] - 1, top_id=top,
+                                             encoding=PBEncType.adder)
+                        top = max(top, bound.nv)
+                        oracle.append_formula(bound.clauses)
+                    status = oracle.solve_limited(expect_interrupt=True)
+                    if status is None:
+                        return False
+                    if not status:
+                        return True
+                    improve(oracle.get_model())
+            finally:
+                timer.cancel()
+
+    def solve_batch(self, requests, workers=None, timeout=None, capacity_weight=None):
+        """
+        Solve many schedule problems, yielding each result as soon as it is found.
+
+        Identical problems are solved once. Without capacity_weight the distinct problems
+        are solved in parallel worker processes, each with a Scheduler configured like this one.
+
+        With capacity_weight the problems are solved one after another in the given order,
+        and every schedule already chosen in the batch adds capacity_weight to the weight of
+        the slots it books for the problems after it. Slots are matched across problems by
+        the optional 'slots' entry of a problem, a dict from literal to a slot key such as
+        (date, time, location).
+
+        Args:
+            requests (list): (problem, k) pairs, the problems as dicts like for solve_problem.
+            workers (int): Worker processes, by default one per core. 1 solves in this process.
+            timeout (float): Time limit of each solve, see solve_schedule.
+
+        Yields:
+            tuple: (index of the request, result dict as returned by solve_problem).
+        """
+        options = {"fast_path": self.fast_path, "encoding": self.encoding}
+        if capacity_weight is not None:
+            # slot key -> users of the batch booked into it so far
+            bookings = Counter()
+            for index, (problem, k) in enumerate(requests):
+                slots = problem.get('slots', {})
+                soft = [
+                    (weight + capacity_weight * bookings[slots[lit]] if weight and lit in slots else weight, lit)
+                    for weight, lit in problem['soft']
+                ]
+                result = solve_problem({**problem, 'soft': soft}, k, timeout, options)
+                if result['model']:
+                    bookings.update(slots[lit] for lit in result['model'] if lit > 0 and lit in slots)
+                yield index, result
+            return
+
+        # Requests by the distinct problem they need solved
+        distinct = OrderedDict()
+        for index, (problem, k) in enumerate(requests):
+            distinct.setdefault(problem_key(problem, k), (problem, k, []))[2].append(index)
+
+        if workers == 1 or len(distinct) == 1:
+            for problem, k, indices in distinct.values():
+                result = solve_problem(problem, k, timeout, options)
+                for index in indices:
+                    yield index, result
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(solve_problem, problem, k, timeout, options): indices
+                for problem, k, indices in distinct.values()
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                for index in futures[future]:
+                    yield index, result
+
+    def schedule_cost(self, chosen):
+        """Cost of choosing exactly the given literals, as RC2 would charge it."""
+        def true(lit):
+            return (abs(lit) in chosen) == (lit > 0)
+        # A soft clause [-lit] is falsified when lit is true; weight 0 makes it hard
+        cost = 0
+        for weight, clause in self.soft:
+            if true(clause):
+                if not weight:
+                    return None
+                cost += weight
+        cost += CLAUSE_WEIGHT * sum(1 for clause in list(self.hard) + list(self.penalty) if not any(true(l) for l in clause))
+        return cost
+
+    def greedy_schedule(self, k):
+        """
+        Build a schedule quickly by repeatedly choosing the literal that adds the least cost.
+        The result is feasible but not necessarily optimal; it is the first best-so-far
+        schedule of solve_anytime.
+
+        Returns:
+            tuple: (cost, model), or None if no feasible schedule was found.
+        """
+        clauses = [(weight, [-clause]) for weight, clause in self.soft if weight]
+        clauses += [(CLAUSE_WEIGHT, list(clause)) for clause in list(self.hard) + list(self.penalty)]
+        forbidden = {clause for weight, clause in self.soft if not weight and clause > 0}
+        # Clauses by the variables they mention, so only those are re-evaluated per candidate
+        touching = {}
+        for clause_idx, (_, clause) in enumerate(clauses):
+            for lit in clause:
+                touching.setdefault(abs(lit), []).append(clause_idx)
+
+        chosen = set()
+        def falsified(clause_idxs):
+            return sum(clauses[i][0] for i in clause_idxs
+                       if not any((abs(l) in chosen) == (l > 0) for l in clauses[i][1]))
+
+        for _ in range(k):
+            best = None
+            for lit in self.lits:
+                if lit in chosen or lit in forbidden:
+                    continue
+                clause_idxs = touching.get(lit, [])
+                before = falsified(clause_idxs)
+                chosen.add(lit)
+                delta = falsified(clause_idxs) - before
+                chosen.discard(lit)
+                if best is None or delta < best[0]:
+                    best = (delta, lit)
+            if best is None:
+                return None
+            chosen.add(best[1])
+
+        cost = self.schedule_cost(chosen)
+        if cost is None:
             return None
+        return (cost, sorted((lit if lit in chosen else -lit for lit in self.lits), key=abs))
+
+    def top_id(self):
+        """Largest variable used by the literals and clauses of the problem."""
+        variables = [abs(l) for l in self.lits]
+        variables += [abs(l) for clause in list(self.hard) + list(self.penalty) for l in clause]
+        variables += [abs(clause) for _, clause in self.soft]
+        return max(variables, default=0)
+
+    def build_wcnf(self, k):
+        """
+        Build the weighted CNF formula of the scheduling problem.
+
+        Args:
+            k (int): The bound for the Exactly-K constraint.
+
+        Returns:
+            WCNF: The formula with the cardinality constraint as hard clauses.
+        """
+        with span("cnf_build", lits=len(self.lits), k=k, encoding=self.encoding) as record:
+            # Create a weighted CNF formula
+            wcnf = WCNF()
+
+            # Create an Exactly-K constraint using the literals
+            enc = encode_exactly_k(self.lits, k, self.encoding, top_id=self.top_id())
+            wcnf.extend(enc.clauses)  # Add the cardinality constraint to the WCNF
+
+            # Penalize for choosing overlapping times
+            for clause in self.hard:
+                # Negate literals in the hard clause
+                wcnf.append(clause, weight=CLAUSE_WEIGHT)
+
+            # Penalize for choosing same days
+            for pen in self.penalty:
+                # Negate literals in the penalty clause
+                wcnf.append(pen, weight=CLAUSE_WEIGHT)
+
+            # Add soft clauses with respective weights (negated literals)
+            for weight, clause in self.soft:
+                wcnf.append([-clause], weight)  # Negate literals in the soft clause
+
+            record["clauses"] = len(wcnf.hard) + len(wcnf.soft)
+            record["card_clauses"] = len(enc.clauses)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Hard clauses: %s", self.hard)
+            logger.debug("Penalty clauses for same day: %s", self.penalty)
+            logger.debug("Soft clauses (weight, literal): %s", self.soft)
+        return wcnf
+
+    def warm_solver(self, k):
+        """Get the warm solver for the current literals and hard/penalty clauses, building it if needed."""
+        shape = (
+            tuple(self.lits),
+            tuple(tuple(clause) for clause in self.hard),
+            tuple(tuple(clause) for clause in self.penalty),
+        )
+        solver = self.warm_solvers.pop(shape, None)
+        ubound = max(k, WARM_UBOUND)
+        if solver is not None and solver.ubound < k:
+            # Rebuild with room for the larger bound
+            solver.delete()
+            solver = None
+        if solver is None:
+            solver = WarmSolver(self.lits, self.hard, self.penalty, ubound)
+        self.warm_solvers[shape] = solver
+
+        while len(self.warm_solvers) > MAX_WARM_SOLVERS:
+            _, evicted = self.warm_solvers.popitem(last=False)
+            evicted.delete()
+        return solver
+
+    def solve_incremental(self, k, timeout=None):
+        """
+        Solve the current problem on a warm solver kept for its shape.
+
+        Only k and the soft weights may differ between calls that share a warm solver,
+        so resubmitting a schedule with a different k or updated forecasts skips the
+        encoding and reuses the clauses learned by earlier solves.
+
+        With a timeout the greedy schedule is the first incumbent, improved at the end of
+        every weight level, and the best one is returned when time runs out, as by solve_anytime.
+        """
+        with span("solve", path="incremental", lits=len(self.lits), k=k) as record:
+            solver = self.warm_solver(k)
+            if timeout is None:
+                result = solver.solve(k, self.soft)
+            else:
+                best, improve = self.incumbent(k)
+                result = solver.solve(k, self.soft, time.monotonic() + timeout, improve)
+                if solver.interrupted:
+                    result = best[0]
+                    # The cores replayed from earlier solves may already prove the incumbent optimal
+                    if result is None or result[0] > solver.cost:
+                        logger.info("Solver interrupted after %ss, returning the best schedule found.", timeout)
+                        self.optimal = False
+                    if result is not None:
+                        self.gap = (result[0] - solver.cost) / result[0] if result[0] else 0.0
+            record["optimal"] = self.optimal
+            record["gap"] = self.gap
+        if result:
+            logger.debug("Found solution with cost %s.", result[0])
+        else:
+            logger.info("No solution found.")
+        return result
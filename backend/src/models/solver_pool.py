@@ -0,0 +1,105 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from .scheduler import solve_problem
+
+# Seconds a solve may take unless the request asks for less
+DEFAULT_TIMEOUT = 10.0
+# Finished jobs kept for polling, oldest dropped first
+MAX_FINISHED = 1024
+
+class PoolFull(RuntimeError):
+    """Raised when a job is submitted while the pool already has max_pending unfinished jobs."""
+
+class SolverPool:
+    """
+    Bounded process pool running schedule solves off the request threads.
+
+    Every job gets a fresh Scheduler in a worker process, so concurrent requests share no
+    solver state and a slow solve only occupies its worker. Jobs are submitted for a job id
+    and polled or awaited for their result. At most max_pending jobs may be queued or
+    running; further submissions raise PoolFull so the caller can shed load.
+    """
+    def __init__(self, workers=None, max_pending=None, timeout=DEFAULT_TIMEOUT, options=None):
+        """
+        Args:
+            workers (int): Worker processes, by default one per core.
+            max_pending (int): Unfinished jobs admitted at once, by default four per worker.
+            timeout (float): Default solve time limit in seconds.
+            options (dict): Keyword arguments for the Scheduler of every job.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.workers
+        self.timeout = timeout
+        self.options = options or {}
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        # job id -> (future, context, submit time), unfinished and finished jobs in submission order
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, problem, k, timeout=None, context=None):
+        """
+        Queue a solve.
+
+        Args:
+            timeout (float): Solve time limit in seconds, capped at the pool's default.
+            context: Anything the caller needs to finish the job, returned by poll.
+
+        Returns:
+            str: The job id.
+
+        Raises:
+            PoolFull: If max_pending jobs are already queued or running.
+        """
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        with self._lock:
+            pending = self.pending()
+            if pending >= self.max_pending:
+                raise PoolFull(f"{pending} schedule jobs are already pending.")
+            job_id = str(next(self._ids))
+            future = self._executor.submit(solve_problem, problem, k, timeout, self.options)
+            self._jobs[job_id] = (future, context, time.monotonic())
+            self._prune()
+        return job_id
+
+    def pending(self):
+        """Number of jobs queued or running."""
+        return sum(1 for future, _, _ in list(self._jobs.values()) if not future.done())
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond MAX_FINISHED."""
+        finished = [job_id for job_id, (future, _, _) in self._jobs.items() if future.done()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED)]:
+            del self._jobs[job_id]
+
+    def poll(self, job_id, wait=0):
+        """
+        Get the state of a job, waiting up to `wait` seconds for it to finish.
+
+        Returns:
+            dict: 'status' ('pending', 'done' or 'failed'), 'elapsed', 'context' and, when
+            done, 'result' as returned by solve_problem or, when failed, 'error'. None for an
+            unknown job id.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future, context, submitted = job
+        try:
+            result = future.result(timeout=wait)
+        except TimeoutError:
+            return {"status": "pending", "elapsed": time.monotonic() - submitted, "context": context}
+        except Exception as e:
+            return {"status": "failed", "error": str(e), "context": context}
+        return {"status": "done", "result": result, "context": context}
+
+    def stats(self):
+        """Number of workers and of pending and admitted jobs."""
+        return {"workers": self.workers, "pending": self.pending(), "max_pending": self.max_pending}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+# Timestamps of the outdoor gym files, e.g. '2023-10-01T05:00:00.000Z', up to the seconds.
+# pandas parses this format on its fast ISO path, the '.%fZ' suffix would take the slow one.
+UTC_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# 1970-01-01 was a Thursday
+EPOCH_WEEKDAY = 3
+
+def parse_utc(values):
+    """
+    Parse outdoor gym timestamps into naive UTC times. Every distinct timestamp is parsed
+    once, as the raw files repeat the hour of every visit.
+
+    Returns:
+        DatetimeIndex: The times in the order of the values.
+    """
+    codes, uniques = pd.factorize(pd.Index(values))
+    parsed = pd.DatetimeIndex(pd.to_datetime(uniques.str.slice(0, 19), format=UTC_FORMAT))
+    return parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+
+def parse_days(values):
+    """
+    Parse dates or timestamps in any ISO 8601 form and truncate them to the day, in the
+    time zone they are written in.
+
+    Returns:
+        numpy.ndarray: datetime64[D] days.
+    """
+    times = pd.to_datetime(values, format='ISO8601')
+    if getattr(times.dt, 'tz', None) is not None:
+        times = times.dt.tz_localize(None)  # Local wall time, as strftime would print it
+    return times.to_numpy().astype('datetime64[D]')
+
+def weekday_hour(times):
+    """
+    Weekday (0 = Monday) and hour of naive times through integer arithmetic on the epoch hours.
+
+    Returns:
+        tuple: (weekday, hour) int64 arrays.
+    """
+    hours = np.asarray(times, dtype='datetime64[ns]').astype('datetime64[h]').astype(np.int64)
+    days, hour = np.divmod(hours, 24)
+    return (days + EPOCH_WEEKDAY) % 7, hour
+
+def week_slots(times):
+    """Index of the weekday-hour slot of each time, weekday * 24 + hour."""
+    weekday, hour = weekday_hour(times)
+    return weekday * 24 + hour
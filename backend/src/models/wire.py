@@ -0,0 +1,98 @@
+import re
+from datetime import date as date_cls
+import numpy as np
+from .registry import display_name
+
+# Most distinct slot times of a compact request, so a day's mask fits the 32-bit
+# integers JavaScript's bitwise operators work on
+MAX_SLOTS = 31
+# A slot time as HH:MM
+TIME_FORMAT = re.compile(r"(?:[01]\d|2[0-3]):[0-5]\d")
+# Entries of a schedule response that a compact response leaves out or replaces
+VERBOSE_KEYS = ("message", "received_times", "received_days", "solution", "alternatives")
+
+def is_compact(schedule_data):
+    """Whether a request body uses the compact wire format, see expand_request."""
+    return isinstance(schedule_data, dict) and "mask" in schedule_data
+
+def expand_request(compact_data):
+    """
+    Turn a compact request into the 'days' and 'times' lists of the verbose one.
+
+    A compact request names its calendar by the first date, the distinct slot times and
+    one bitmask per day, bit j of a mask offering slots[j] on that day:
+
+        {"start": "2024-10-16", "slots": ["08:00", "12:00", "18:00"], "mask": [5, 0, 7], "n": 2}
+
+    offers 08:00 and 18:00 on the 16th, nothing on the 17th and every slot on the 18th.
+    Days without slots are left out. Every other field is passed on as it is.
+
+    Returns:
+        tuple: (schedule_data, error) with schedule_data the request in the verbose format,
+        or None and an error message if the calendar is invalid.
+    """
+    start, slots, mask = compact_data.get("start"), compact_data.get("slots"), compact_data.get("mask")
+    try:
+        start = date_cls.fromisoformat(start)
+    except (TypeError, ValueError):
+        return None, "Invalid value for start. It must be a date as YYYY-MM-DD."
+    if not isinstance(slots, list) or not 0 < len(slots) <= MAX_SLOTS or len(set(map(str, slots))) < len(slots):
+        return None, f"Invalid value for slots. It must be a list of 1 to {MAX_SLOTS} distinct times."
+    if not all(isinstance(slot, str) and TIME_FORMAT.fullmatch(slot) for slot in slots):
+        return None, "Invalid value for slots. Times must be given as HH:MM."
+    limit = 1 << len(slots)
+    # type() rather than isinstance(), which would let booleans through
+    if not isinstance(mask, list) or not all(type(bits) is int and 0 <= bits < limit for bits in mask):
+        return None, f"Invalid value for mask. It must be a list of integers below {limit}, one per day."
+
+    # Times of each distinct mask, as calendars repeat a few masks over and over
+    mask_times = {bits: [slot for index, slot in enumerate(slots) if bits >> index & 1] for bits in set(mask)}
+    offsets = [offset for offset, bits in enumerate(mask) if bits]
+    # numpy formats the dates several times faster than date.isoformat
+    dates = (np.datetime64(start, 'D') + np.array(offsets, dtype=np.int64)).astype(str).tolist()
+    days = [date + "T00:00:00.000Z" for date in dates]
+    times = [list(mask_times[mask[offset]]) for offset in offsets]
+    schedule_data = {key: value for key, value in compact_data.items() if key not in ("start", "slots", "mask")}
+    return {**schedule_data, "days": days, "times": times}, None
+
+def compact_response(body, compact_data, locations):
+    """
+    The compact form of a schedule response to a compact request.
+
+    The calendar is not echoed back, and each scheduled workout is
+    [day offset from start, index in slots, index in locations], in calendar order, with
+    the display names of the locations listed once:
+
+        {"n": 2, "start": "2024-10-16", "locations": ["Kluuvi (Unisport)", ...],
+         "solution": [[0, 2, 1], [2, 0, 3]]}
+
+    Alternatives are given the same way. Other entries, such as 'optimal' or 'booking',
+    are kept as they are.
+
+    Args:
+        body (dict): The verbose response, see schedule_response.
+        compact_data (dict): The compact request, see expand_request.
+        locations (list): Names of the locations the request was scheduled at.
+    """
+    start = date_cls.fromisoformat(compact_data["start"])
+    slot_index = {slot: index for index, slot in enumerate(compact_data["slots"])}
+    names = [display_name(location) for location in locations]
+    location_index = {name: index for index, name in enumerate(names)}
+    # Offsets of the dates a schedule can use, parsed once instead of per workout
+    offsets = {}
+
+    def indices(solution):
+        entries = []
+        for date, time, name in solution:
+            if date not in offsets:
+                offsets[date] = (date_cls.fromisoformat(date) - start).days
+            entries.append([offsets[date], slot_index[time], location_index[name]])
+        return sorted(entries)
+
+    compact = {key: value for key, value in body.items() if key not in VERBOSE_KEYS}
+    compact.update(start=start.isoformat(), locations=names, solution=indices(body["solution"]))
+    if "alternatives" in body:
+        compact["alternatives"] = [
+            {"cost": alternative["cost"], "solution": indices(alternative["solution"])} for alternative in body["alternatives"]
+        ]
+    return compact
@@ -0,0 +1,221 @@
+# tests/test_app.py
+import gzip
+import json
+import os
+import pytest
+
+# The app imports its modules as models.X, rooted at src/
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+LOCATIONS = ['kluuvi', 'kumpula', 'toolo', 'meilahti']
+DAYS = [f"2024-10-{day}T00:00:00.000Z" for day in range(14, 21)]  # Monday to Sunday
+TIMES = [["08:00", "12:00", "18:00"] for _ in DAYS]
+BODY = {"days": DAYS, "times": TIMES, "n": 3}
+
+def write_forecasts(data_path):
+    """
+    Forecasts where kluuvi is the quietest location and early hours the quietest slots,
+    except that kluuvi is closed (0 check-ins, i.e. forbidden) at 06:00.
+    """
+    for loc_idx, location in enumerate(LOCATIONS):
+        forecast = [
+            {"weekday": weekday, "hour": hour,
+             "pred_checkins": 0.0 if (location, hour) == ('kluuvi', 6) else 10.0 * (loc_idx + 1) + hour + weekday}
+            for weekday in range(7) for hour in range(24)
+        ]
+        with open(os.path.join(data_path, f"{location}_forecast.json"), "w") as f:
+            json.dump({"location": location, "week_forecast": forecast}, f)
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    data_path = tmp_path_factory.mktemp("forecasts")
+    write_forecasts(data_path)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("FORECAST_DATA_PATH", str(data_path))
+        patch.setenv("SCHEDULER_WARMUP", "0")
+        patch.delenv("SCHEDULER_OCCUPANCY_DB", raising=False)
+        patch.syspath_prepend(SRC)
+        import app
+        yield app
+        if app.solver_pool is not None:
+            app.solver_pool.shutdown()
+            app.solver_pool = None
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    app_module.schedule_cache.clear()
+    monkeypatch.setattr(app_module, "occupancy", app_module.OccupancyLedger())
+    return app_module.app.test_client()
+
+def test_home(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.get_json() == {"message": "Welcome to the Flask API!"}
+
+def test_schedule(client):
+    response = client.post("/api/schedule", json=BODY)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["n"] == 3 and body["optimal"] is True and body["gap"] == 0
+    assert body["received_days"] == DAYS
+    # The quietest location at the quietest time, on three different days
+    assert all(time == "08:00" and location == "Kluuvi (Unisport)" for _, time, location in body["solution"])
+    assert len({date for date, _, _ in body["solution"]}) == 3
+
+def test_schedule_cache_hit(client):
+    before = client.get("/api/schedule/cache").get_json()
+    first = client.post("/api/schedule", json=BODY).get_json()
+    second = client.post("/api/schedule", json=BODY).get_json()
+    assert second["solution"] == first["solution"]
+    after = client.get("/api/schedule/cache").get_json()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+    assert after["size"] == 1
+
+@pytest.mark.parametrize("field, value", [
+    ("n", 0),
+    ("days", "2024-10-14"),
+    ("timeout", True),
+    ("timeout", -1),
+    ("risk", "worst"),
+    ("alternatives", 0),
+    ("book", "yes"),
+    ("origin", {"lat": 100, "lon": 24}),
+])
+def test_schedule_invalid(client, field, value):
+    response = client.post("/api/schedule", json={**BODY, field: value})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+def test_schedule_alternatives(client):
+    body = client.post("/api/schedule", json={**BODY, "alternatives": 3}).get_json()
+    costs = [alternative["cost"] for alternative in body["alternatives"]]
+    assert len(costs) == 3 and costs == sorted(costs)
+    assert body["alternatives"][0]["solution"] == body["solution"]
+    assert body["optimal"] is True and body["gap"] == 0
+
+def test_compact_schedule_gzipped(client):
+    compact = {"start": "2024-10-14", "slots": ["08:00", "12:00", "18:00"], "mask": [7] * 7, "n": 3}
+    response = client.post("/api/schedule", json=compact)
+    assert response.status_code == 200
+    # Smaller than GZIP_MIN_BYTES, so sent as it is
+    assert "Content-Encoding" not in response.headers
+    body = response.get_json()
+    assert body["start"] == "2024-10-14" and body["locations"][0] == "Kluuvi (Unisport)"
+    assert [[slot, location] for _, slot, location in body["solution"]] == [[0, 0]] * 3
+
+    response = client.post("/api/schedule", json={**compact, "mask": [8]})
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("Invalid value for mask.")
+
+def test_verbose_schedule_gzipped(client):
+    days = [f"2024-11-{day:02d}T00:00:00.000Z" for day in range(1, 31)]
+    body = {"days": days, "times": [["08:00", "12:00", "18:00"]] * len(days), "n": 3}
+    response = client.post("/api/schedule", json=body, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert json.loads(gzip.decompress(response.get_data()))["received_days"] == days
+
+    response = client.post("/api/schedule", json=body)
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["received_days"] == days
+
+def test_book_and_release(client, app_module):
+    response = client.post("/api/schedule", json={**BODY, "book": True})
+    assert response.status_code == 200
+    booking = response.get_json()["booking"]
+    assert len(booking) == 3 and all(location == "kluuvi" for _, _, location in booking)
+    assert sum(app_module.occupancy.bookings({date for date, _, _ in booking}).values()) == 3
+
+    response = client.post("/api/schedule/release", json={"booking": booking})
+    assert response.status_code == 200
+    assert response.get_json()["released"] == 3
+    assert app_module.occupancy.bookings({date for date, _, _ in booking}) == {}
+
+    assert client.post("/api/schedule/release", json={"booking": [["2024-10-14", "08:00"]]}).status_code == 400
+    assert client.post("/api/schedule", json={**BODY, "book": True, "alternatives": 2}).status_code == 400
+
+def test_booked_closed_slot_stays_forbidden(client, app_module):
+    body = {"days": DAYS[:2], "times": [["06:00"], ["06:00"]], "n": 2}
+    # Closed, kluuvi is not scheduled even though it would be the quietest location
+    solution = client.post("/api/schedule", json=body).get_json()["solution"]
+    assert [location for _, _, location in solution] == ["Kumpula (Unisport)"] * 2
+
+    # A booking of the closed slot must not give it a positive cost, which would open it
+    app_module.occupancy.book([("2024-10-14", "06:00", "kluuvi"), ("2024-10-15", "06:00", "kluuvi")])
+    solution = client.post("/api/schedule", json=body).get_json()["solution"]
+    assert [location for _, _, location in solution] == ["Kumpula (Unisport)"] * 2
+
+def test_batch(client):
+    response = client.post("/api/schedule/batch", json={"requests": [BODY, {**BODY, "n": -1}, {**BODY, "n": 2}]})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = sorted((json.loads(line) for line in response.get_data(as_text=True).splitlines()), key=lambda line: line["index"])
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert len(lines[0]["solution"]) == 3 and lines[0]["optimal"] is True
+    assert "error" in lines[1]
+    assert len(lines[2]["solution"]) == 2
+
+@pytest.mark.parametrize("batch", [{}, {"requests": []}, {"requests": [BODY], "capacity": "false"}])
+def test_batch_invalid(client, batch):
+    response = client.post("/api/schedule/batch", json=batch)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+def test_batch_capacity_spreads_users(client):
+    response = client.post("/api/schedule/batch", json={"requests": [{**BODY, "n": 1}] * 12, "capacity": True})
+    solutions = [tuple(json.loads(line)["solution"][0]) for line in response.get_data(as_text=True).splitlines()]
+    # Booking every user into the same quietest slot would add their load to it
+    assert len(set(solutions)) > 1
+
+def test_job(client):
+    response = client.post("/api/schedule/jobs", json=BODY)
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+
+    response = client.get(f"/api/schedule/jobs/{job_id}?wait=30")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == "done" and body["optimal"] is True
+    assert len(body["solution"]) == 3
+
+    assert client.get("/api/schedule/jobs/unknown").status_code == 404
+    assert "workers" in client.get("/api/schedule/jobs").get_json()
+
+def test_job_pool_full(client, app_module, monkeypatch):
+    class FullPool:
+        def submit(self, *args, **kwargs):
+            raise app_module.PoolFull("2 jobs pending")
+    monkeypatch.setattr(app_module, "get_solver_pool", lambda: FullPool())
+    response = client.post("/api/schedule/jobs", json=BODY)
+    assert response.status_code == 503
+    assert response.get_json()["details"] == "2 jobs pending"
+
+@pytest.mark.parametrize("field, value", [("timeout", True), ("timeout", 0), ("risk", "worst")])
+def test_job_invalid(client, field, value):
+    assert client.post("/api/schedule/jobs", json={**BODY, field: value}).status_code == 400
+
+def test_replan(client):
+    previous = client.post("/api/schedule", json=BODY).get_json()["solution"]
+    removed = previous[0][:2]
+    response = client.post("/api/schedule/replan", json={
+        **BODY, "solution": previous, "changes": {"removed": [removed]}, "now": "2024-10-01",
+    })
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["replanned_dates"] and body["optimal"] is True
+    assert len(body["solution"]) == 3
+    assert removed not in [entry[:2] for entry in body["solution"]]
+
+    assert client.post("/api/schedule/replan", json={**BODY, "changes": []}).status_code == 400
+
+def test_metrics(client):
+    client.post("/api/schedule", json=BODY)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'schedule_stage_seconds_count{stage="request"}' in response.get_data(as_text=True)
+
+    snapshot = client.get("/metrics?format=json").get_json()
+    assert snapshot["request"]["count"] >= 1
+    assert {"parse", "solve", "decode"} <= set(snapshot)
@@ -0,0 +1,57 @@
+# tests/test_backtest.py
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.models.backtest import Backtest
+
+def write_history(data_dir, location, weeks, noise, seed):
+    """Hourly check-ins with a fixed weekday-hour pattern plus noise, starting on a Monday."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2024-01-01', periods=168 * weeks, freq='h')
+    pattern = 5 + 20 * np.sin(np.arange(168) / 168 * 2 * np.pi * 7) ** 2 + 3 * seed
+    values = np.maximum(np.tile(pattern, weeks) + rng.normal(0, noise, len(times)), 0)
+    pd.DataFrame({'time': times, 'check-ins': values}).to_csv(os.path.join(data_dir, location), index=False)
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for seed, location in enumerate(["kluuvi.csv", "toolo.csv"]):
+        write_history(tmp_path, location, weeks=8, noise=1.0, seed=seed)
+    return str(tmp_path)
+
+def test_rolling_origin(data_dir, tmp_path):
+    backtest = Backtest(data_dir, ["kluuvi.csv", "toolo.csv", "nowhere.csv"], cache_dir=str(tmp_path / "cache"))
+    results = backtest.run()
+    records = results["cutoffs"]
+    # Cutoffs from four weeks in, while a whole week follows
+    assert [record["cutoff"] for record in records] == ["2024-01-29", "2024-02-05", "2024-02-12", "2024-02-19"]
+    for record in records:
+        assert record["fitted"] == 2 and record["cached"] == 0
+        assert record["slots"] == 2 * 168
+        assert record["mae"] < 2.0
+        assert 0.5 < record["coverage80"] <= 1.0
+        assert record["requests"] == 4
+        # The realized check-ins are close to the best possible schedules
+        assert record["oracle"] <= record["realized"] + 4 * backtest.n
+        assert record["regret"] < 0.2
+
+    summary = results["summary"]
+    assert summary["cutoffs"] == 4 and summary["requests"] == 16
+    assert summary["mae"] == pytest.approx(np.mean([record["mae"] for record in records]))
+
+    # The second run reads every forecast from the cache
+    again = backtest.run(start="2024-02-05", end="2024-02-13")
+    assert [record["cutoff"] for record in again["cutoffs"]] == ["2024-02-05", "2024-02-12"]
+    assert again["summary"]["cached"] == 4 and again["summary"]["fitted"] == 0
+    same = lambda record: {key: value for key, value in record.items() if key not in ("seconds", "cached", "fitted")}
+    assert [same(record) for record in again["cutoffs"]] == [same(record) for record in records[1:3]]
+
+def test_parallel_matches_serial(data_dir):
+    backtest = Backtest(data_dir, ["kluuvi.csv", "toolo.csv"], risk='p90', requests=2)
+    drop = lambda results: [{key: value for key, value in record.items() if key != "seconds"} for record in results["cutoffs"]]
+    assert drop(backtest.run(workers=2)) == drop(backtest.run(workers=1))
+
+def test_invalid_settings(data_dir):
+    with pytest.raises(ValueError):
+        Backtest(data_dir, ["kluuvi.csv"], risk='worst')
+    assert Backtest(data_dir, ["nowhere.csv"]).run()["cutoffs"] == []
@@ -0,0 +1,75 @@
+# tests/test_columnar.py
+import numpy as np
+import pandas as pd
+import pytest
+from src.models.columnar import OUTDOOR, ColumnarStore
+from src.models.forecast_store import QUANTILE_LEVELS, ForecastStore, quantile_column
+from src.models.predictor import WeekPred
+
+pytest.importorskip("pyarrow")
+
+def series(start, hours, value=1.0):
+    time_index = pd.date_range(start, periods=hours, freq='h')
+    return pd.DataFrame({'time': time_index, 'check-ins': np.full(hours, value)})
+
+def test_series_round_trip_and_pushdown(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    store.write_series(OUTDOOR, 'toolo', series('2023-12-01', 24 * 62))
+    store.write_series(OUTDOOR, 'Paloheinä', series('2024-01-01', 24, value=2.0))
+    assert store.locations(OUTDOOR) == ['Paloheinä', 'toolo']
+
+    data = store.read_series(OUTDOOR, 'toolo')
+    assert list(data.columns) == ['time', 'check-ins']
+    assert str(data['time'].dtype).startswith('datetime64')
+    assert len(data) == 24 * 62 and data['time'].is_monotonic_increasing
+
+    window = store.read_series(OUTDOOR, 'toolo', start='2024-01-15', end='2024-01-16 06:00')
+    assert len(window) == 30
+    assert window['time'].min() == pd.Timestamp('2024-01-15')
+
+    everything = store.read_series(OUTDOOR, columns=['check-ins'])
+    assert sorted(everything['location'].unique()) == ['Paloheinä', 'toolo']
+    assert store.read_series('missing', 'toolo').empty
+
+def test_series_write_replaces_only_its_months(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    store.write_series(OUTDOOR, 'toolo', series('2023-12-01', 24 * 62))
+    store.write_series(OUTDOOR, 'toolo', series('2024-01-01', 24 * 31, value=5.0))
+    data = store.read_series(OUTDOOR, 'toolo')
+    assert len(data) == 24 * 62
+    assert (data[data['time'] < '2024-01-01']['check-ins'] == 1.0).all()
+    assert (data[data['time'] >= '2024-01-01']['check-ins'] == 5.0).all()
+
+def test_forecast_store_reads_parquet(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    forecast = pd.DataFrame({
+        'weekday': np.repeat(np.arange(7), 24),
+        'hour': np.tile(np.arange(24), 7),
+        'pred_checkins': np.arange(168, dtype=float),
+    })
+    store.write_forecast('kluuvi', forecast)
+
+    forecasts = ForecastStore(str(tmp_path), storage='parquet')
+    assert forecasts.lookup(['kluuvi'], [0, 0], [2, 6], [15, 0]).tolist() == [63.0, 144.0]
+    assert forecasts.quantiles('kluuvi') is None
+
+    for level in QUANTILE_LEVELS:
+        forecast[quantile_column(level)] = forecast['pred_checkins'] + level
+    store.write_forecast('kluuvi', forecast)
+    quantiles = forecasts.quantiles('kluuvi')
+    assert quantiles.shape == (7, 24, len(QUANTILE_LEVELS))
+    assert quantiles[2, 15].tolist() == pytest.approx([63.0 + level for level in QUANTILE_LEVELS])
+    assert forecasts.lookup(['kluuvi'], [0], [2], [15], risk='p90').tolist() == pytest.approx([63.9])
+    assert forecasts.version(['kluuvi', 'nowhere'])[1] is None
+    with pytest.raises(ValueError):
+        ForecastStore(str(tmp_path), storage='xml')
+
+def test_predictor_reads_parquet_range(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    store.write_series(OUTDOOR, 'toolo', pd.concat([series('2024-01-01', 168, 100.0), series('2024-01-08', 168, 3.0)]))
+
+    predictor = WeekPred(str(tmp_path), backend='profile', storage='parquet', start='2024-01-08')
+    data = predictor.select_location('toolo.csv')
+    assert len(data) == 168
+    assert (predictor.predict_location(data)['check-ins'] == 3.0).all()
+    assert predictor.select_location('nowhere.csv') is None
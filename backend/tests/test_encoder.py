@@ -0,0 +1,145 @@
+# tests/test_encoder.py
+import json
+import os
+import numpy as np
+import pytest
+from src.models import encoder as encoder_module
+from src.models.encoder import CompactEncoder, Encoder
+from src.models.forecast_store import QUANTILE_LEVELS, ForecastStore, risk_measure
+from src.models.scheduler import Scheduler
+
+def write_forecast(data_path, location, value_of, quantiles_of=None):
+    week_forecast = [
+        {"weekday": weekday, "hour": hour, "pred_checkins": value_of(weekday, hour)}
+        for weekday in range(7) for hour in range(24)
+    ]
+    data = {"location": location, "week_forecast": week_forecast}
+    if quantiles_of is not None:
+        data["quantile_levels"] = list(QUANTILE_LEVELS)
+        for entry in week_forecast:
+            entry["quantiles"] = quantiles_of(entry["weekday"], entry["hour"])
+    with open(os.path.join(data_path, f"{location}_forecast.json"), 'w') as f:
+        json.dump(data, f)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ForecastStore(str(tmp_path))
+    monkeypatch.setattr(encoder_module, "forecast_store", store)
+    return store
+
+def test_store_lookup(store, tmp_path):
+    write_forecast(tmp_path, "kluuvi", lambda weekday, hour: weekday * 100 + hour)
+    values = store.lookup(["kluuvi"], [0, 0], [2, 6], [15, 0])
+    assert values.tolist() == [215.0, 600.0]
+
+def test_store_missing_file(store):
+    values = store.lookup(["nowhere"], [0], [0], [0])
+    assert values[0] != values[0]  # NaN
+
+def test_store_reloads_on_mtime_change(store, tmp_path):
+    write_forecast(tmp_path, "kluuvi", lambda weekday, hour: 1.0)
+    assert store.table("kluuvi")[0, 0] == 1.0
+
+    write_forecast(tmp_path, "kluuvi", lambda weekday, hour: 2.0)
+    path = store.forecast_file("kluuvi")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert store.table("kluuvi")[0, 0] == 2.0
+
+def test_encoder_associates_checkins(store, tmp_path):
+    write_forecast(tmp_path, "kluuvi", lambda weekday, hour: weekday * 100 + hour)
+    write_forecast(tmp_path, "toolo", lambda weekday, hour: 0.5)
+
+    # 2024-10-16 is a Wednesday
+    encoder = Encoder(["2024-10-16T00:00:00.000Z"], [["15:00", "18:00"]], ["kluuvi", "toolo", "kumpula"])
+    lits, checkins, groups, dates = encoder.get_encoded_values()
+
+    assert lits == [1, 2, 3, 4, 5, 6]
+    assert groups == [[1, 2, 3], [4, 5, 6]]
+    assert dates == [[1, 2, 3, 4, 5, 6]]
+    # kumpula has no forecast file, so its literals get no check-ins
+    assert checkins == {1: (215.0, 1), 2: (0.5, 2), 4: (218.0, 4), 5: (0.5, 5)}
+
+def test_compact_encoder_matches_encoder(store, tmp_path):
+    write_forecast(tmp_path, "kluuvi", lambda weekday, hour: weekday * 100 + hour)
+    write_forecast(tmp_path, "toolo", lambda weekday, hour: 0.5)
+    days = [["2024-10-16T00:00:00.000Z", "2024-10-17T00:00:00.000Z"], ["2024-10-20T00:00:00.000Z"]]
+    times = [["08:00", "15:00"], ["12:00"], ["07:00", "18:00", "21:00"]]
+    locations = ["kluuvi", "toolo", "kumpula"]
+
+    encoder = Encoder(days, times, locations)
+    compact = CompactEncoder(days, times, locations)
+    lits, checkins, groups, dates = encoder.get_encoded_values()
+    compact_lits, compact_checkins, compact_groups, compact_dates = compact.get_encoded_values()
+
+    assert compact_lits == lits
+    assert list(compact_groups) == groups
+    assert list(compact_dates) == dates
+    assert dict(compact_checkins) == checkins
+    assert sorted(compact_checkins.values()) == sorted(checkins.values())
+    for literal, date_time_loc in encoder.literal_to_date_time_loc.items():
+        assert compact.decode(literal) == date_time_loc
+        assert compact.encode(date_time_loc) == literal
+    assert compact.decode(len(lits) + 1) is None
+    assert compact.encode(("2024-10-16", "09:00", "kluuvi")) is None
+    assert sorted(compact.soft_clauses()) == sorted(encoder.soft_clauses())
+
+def test_store_cost_tables(store, tmp_path):
+    write_forecast(tmp_path, "kluuvi", lambda weekday, hour: weekday + hour / 10)
+    costs, known = store.cost_tables(["kluuvi", "nowhere"])
+    assert costs.dtype.kind == 'i'
+    assert costs[0, 2, 5] == 3  # ceil(2.5)
+    assert costs[0, 3, 0] == 3
+    assert known[0].all() and not known[1].any()
+    # Cached until a forecast file changes
+    assert store.cost_tables(["kluuvi", "nowhere"])[0] is costs
+
+def test_compact_encoder_solves_like_encoder(store, tmp_path):
+    write_forecast(tmp_path, "kluuvi", lambda weekday, hour: (weekday * 7 + hour * 3) % 11)
+    days = ["2024-10-%02dT00:00:00.000Z" % day for day in range(14, 21)]
+    times = [["08:00", "12:00", "17:00"]] * 7
+    results = []
+    for encoder_class in (Encoder, CompactEncoder):
+        lits, checkins, groups, dates = encoder_class(days, times, ["kluuvi"]).get_encoded_values()
+        scheduler = Scheduler()
+        scheduler.set_lits(lits)
+        scheduler.set_soft([(int(weight), lit) for weight, lit in checkins.values()])
+        scheduler.set_hard(groups)
+        scheduler.set_penalty(dates)
+        results.append(scheduler.solve_schedule(3))
+    assert results[0] == results[1]
+
+def test_risk_measure():
+    point = np.array([5.0, 5.0])
+    quantiles = np.array([[1, 2, 5, 8, 10, 12, 20], [np.nan] * 7], dtype=float)
+    assert risk_measure(point, quantiles, 'mean').tolist() == [5.0, 5.0]
+    assert risk_measure(point, quantiles, 'p90').tolist() == [10.0, 5.0]
+    # (0.05 * 11 + 0.04 * 16 + 0.01 * 20) / 0.1
+    assert risk_measure(point, quantiles, 'cvar90')[0] == pytest.approx(13.9)
+    assert risk_measure(point, None, 'cvar90').tolist() == [5.0, 5.0]
+    with pytest.raises(ValueError):
+        risk_measure(point, quantiles, 'p99')
+
+def test_store_risk_cost_tables(store, tmp_path):
+    # Busier on Mondays in the tail only
+    write_forecast(tmp_path, "kluuvi", lambda weekday, hour: 10,
+                   lambda weekday, hour: [5, 8, 10, 12, 30 if weekday == 0 else 14, 40 if weekday == 0 else 15, 50 if weekday == 0 else 16])
+    write_forecast(tmp_path, "toolo", lambda weekday, hour: 20)
+    locations = ["kluuvi", "toolo"]
+    assert store.quantiles("kluuvi").shape == (7, 24, len(QUANTILE_LEVELS))
+    assert store.quantiles("toolo") is None
+
+    mean, _ = store.cost_tables(locations)
+    p90, _ = store.cost_tables(locations, 'p90')
+    assert mean[0, 0, 8] == 10 and p90[0, 0, 8] == 30 and p90[0, 1, 8] == 14
+    # Without quantiles the point forecast is kept
+    assert (p90[1] == 20).all()
+    assert store.cost_tables(locations, 'p90')[0] is p90
+
+    days = ["2024-10-14T00:00:00.000Z"]  # a Monday
+    times = [["08:00"]]
+    for encoder_class in (Encoder, CompactEncoder):
+        risk_encoder = encoder_class(days, times, locations, risk='cvar90')
+        assert [cost for cost, _ in risk_encoder.soft_clauses()] == [41, 20]  # ceil(40.5)
+        # The check-ins stay the point forecast
+        assert [checkins for checkins, _ in risk_encoder.get_encoded_values()[1].values()] == [10, 20]
@@ -0,0 +1,139 @@
+# tests/test_fast_path.py
+import itertools
+import random
+import pytest
+from src.models.fast_path import FastPathSolver
+from src.models.scheduler import CLAUSE_WEIGHT, Scheduler, prune_dominated
+
+def random_problem(rng):
+    """A random problem with the structure built by receive_schedule, plus some loose literals."""
+    hard, penalty = [], []
+    index = 1
+    for _ in range(rng.randint(1, 3)):
+        day = []
+        for _ in range(rng.randint(1, 3)):
+            group = list(range(index, index + rng.randint(1, 3)))
+            index += len(group)
+            hard.append(group)
+            day.extend(group)
+        # Literals of a day that belong to no time group
+        loose = list(range(index, index + rng.randint(0, 1)))
+        index += len(loose)
+        penalty.append(day + loose)
+    if rng.random() < 0.3:
+        # A time group outside any day
+        hard.append(list(range(index, index + 2)))
+        index += 2
+    lits = list(range(1, index))
+    soft = [(rng.choice([0, 1, 2, 3, 10, 50, 99, 100, 150]), lit) for lit in lits if rng.random() < 0.9]
+    return lits, soft, hard, penalty
+
+def solve(scheduler, lits, soft, hard, penalty, k):
+    scheduler.set_lits(lits)
+    scheduler.set_soft(soft)
+    scheduler.set_hard(hard)
+    scheduler.set_penalty(penalty)
+    return scheduler.solve_schedule(k)
+
+@pytest.mark.parametrize("seed", range(200))
+def test_fast_path_cost_equals_rc2(seed):
+    rng = random.Random(seed)
+    lits, soft, hard, penalty = random_problem(rng)
+    k = rng.randint(0, len(lits))
+
+    assert FastPathSolver.from_problem(lits, soft, hard, penalty, CLAUSE_WEIGHT) is not None
+    fast = solve(Scheduler(), lits, soft, hard, penalty, k)
+    rc2 = solve(Scheduler(fast_path=False), lits, soft, hard, penalty, k)
+
+    if rc2 is None:
+        assert fast is None
+        return
+    cost, model = fast
+    assert cost == rc2[0]
+
+    # The model picks exactly k literals and its cost is the reported one
+    chosen = {lit for lit in model if lit > 0}
+    assert len(chosen) == k
+    expected = sum(weight for weight, lit in soft if lit in chosen)
+    expected += CLAUSE_WEIGHT * sum(1 for clause in hard + penalty if not chosen & set(clause))
+    assert cost == expected
+
+@pytest.mark.parametrize("seed", range(200))
+def test_pruning_keeps_optimal_cost(seed):
+    rng = random.Random(seed)
+    lits, soft, hard, penalty = random_problem(rng)
+    k = rng.randint(0, len(lits))
+    problem = {"lits": lits, "soft": soft, "hard": hard, "penalty": penalty}
+    pruned = prune_dominated(problem, k)
+
+    full = solve(Scheduler(fast_path=False), lits, soft, hard, penalty, k)
+    reduced = solve(Scheduler(fast_path=False), pruned["lits"], pruned["soft"], pruned["hard"], pruned["penalty"], k)
+    assert (full is None) == (reduced is None)
+    if full is not None:
+        assert reduced[0] == full[0]
+        chosen = {lit for lit in reduced[1] if lit > 0} & set(pruned["lits"])
+        assert len(chosen) == k and reduced[0] == schedule_cost(chosen, soft, hard, penalty)
+
+def test_pruning_keeps_cheapest_per_slot():
+    # Two days of two slots with three locations each
+    hard = [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10, 11, 12]]
+    penalty = [list(range(1, 7)), list(range(7, 13))]
+    soft = [(weight, lit) for lit, weight in enumerate([5, 3, 4, 9, 8, 7, 1, 2, 3, 6, 6, 6], start=1)]
+    problem = {"lits": list(range(1, 13)), "soft": soft, "hard": hard, "penalty": penalty}
+    pruned = prune_dominated(problem, 2)
+    # The cheapest of each slot, and the cheapest other literal as one slot may take two
+    assert pruned["lits"] == [2, 6, 7, 8, 10]
+    assert pruned["hard"] == [[2], [6], [7, 8], [10]]
+    assert pruned["penalty"] == [[2, 6], [7, 8, 10]]
+    assert prune_dominated(problem, 12) is problem
+    # Overlapping clauses are left alone
+    assert prune_dominated({**problem, "hard": hard + [[1, 4]]}, 2)["lits"] == problem["lits"]
+
+@pytest.mark.parametrize("lits, soft, hard, penalty", [
+    ([1, 2], [], [[1], [-1]], []),  # negative literal
+    ([1, 2, 3], [], [[1, 2], [2, 3]], []),  # overlapping groups
+    ([1, 2, 3, 4], [], [[2, 3]], [[1, 2], [3, 4]]),  # group spanning two days
+    ([1, 2], [(-1, 1)], [], []),  # negative weight
+    ([1, 2], [(1.5, 1)], [], []),  # non-integer weight
+])
+def test_fast_path_falls_back(lits, soft, hard, penalty):
+    assert FastPathSolver.from_problem(lits, soft, hard, penalty, CLAUSE_WEIGHT) is None
+
+def schedule_cost(chosen, soft, hard, penalty):
+    cost = sum(weight for weight, lit in soft if lit in chosen)
+    return cost + CLAUSE_WEIGHT * sum(1 for clause in hard + penalty if not chosen & set(clause))
+
+@pytest.mark.parametrize("fast_path", [True, False])
+@pytest.mark.parametrize("seed", range(40))
+def test_alternatives(seed, fast_path):
+    rng = random.Random(seed)
+    lits, soft, hard, penalty = random_problem(rng)
+    k = rng.randint(0, min(len(lits), 4))
+    count = rng.randint(1, 5)
+    min_distance = rng.randint(1, 4)
+
+    scheduler = Scheduler(fast_path=fast_path)
+    scheduler.set_lits(lits)
+    scheduler.set_soft(soft)
+    scheduler.set_hard(hard)
+    scheduler.set_penalty(penalty)
+    found = scheduler.solve_alternatives(k, count, min_distance)
+
+    chosen_sets = [{lit for lit in model if lit > 0 and lit in lits} for _, model in found]
+    costs = [cost for cost, _ in found]
+    assert costs == sorted(costs)
+    for i, (cost, chosen) in enumerate(zip(costs, chosen_sets)):
+        assert len(chosen) == k
+        assert cost == schedule_cost(chosen, soft, hard, penalty)
+        assert all(len(chosen ^ other) >= min_distance for other in chosen_sets[:i])
+
+    # Without a distance the alternatives are the cheapest schedules
+    forbidden = {lit for weight, lit in soft if weight == 0}
+    ranked = sorted(
+        schedule_cost(set(chosen), soft, hard, penalty)
+        for chosen in itertools.combinations([lit for lit in lits if lit not in forbidden], k)
+    )
+    if min_distance == 1:
+        assert costs == ranked[:count]
+    elif ranked:
+        assert costs[0] == ranked[0]
@@ -0,0 +1,46 @@
+# tests/test_metrics.py
+from src.models.metrics import Histogram, Metrics, profiled
+
+def test_histogram_is_cumulative():
+    histogram = Histogram(buckets=(0.01, 0.1))
+    for seconds in (0.005, 0.01, 0.05, 3.0):
+        histogram.observe(seconds)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"0.01": 2, "0.1": 3, "+Inf": 4}
+    assert snapshot["count"] == 4
+    assert abs(snapshot["sum"] - 3.065) < 1e-9
+
+def test_span_records_trace_and_histogram():
+    metrics = Metrics()
+    metrics.start_trace()
+    with metrics.span("cnf_build", lits=12, k=2) as record:
+        record["clauses"] = 40
+    with metrics.span("solve", path="fast"):
+        pass
+    trace = metrics.finish_trace()
+
+    assert [record["stage"] for record in trace] == ["cnf_build", "solve"]
+    assert trace[0]["lits"] == 12 and trace[0]["clauses"] == 40 and trace[0]["ms"] >= 0
+    assert metrics.snapshot()["solve"]["count"] == 1
+    # Outside a trace spans are only counted
+    with metrics.span("solve"):
+        pass
+    assert metrics.finish_trace() == []
+    assert metrics.snapshot()["solve"]["count"] == 2
+
+def test_render_prometheus_text():
+    metrics = Metrics()
+    metrics.observe("decode", 0.002)
+    text = metrics.render()
+    assert '# TYPE schedule_stage_seconds histogram' in text
+    assert 'schedule_stage_seconds_bucket{stage="decode",le="0.001"} 0' in text
+    assert 'schedule_stage_seconds_bucket{stage="decode",le="+Inf"} 1' in text
+    assert 'schedule_stage_seconds_count{stage="decode"} 1' in text
+
+def test_profiled():
+    with profiled(False) as capture:
+        sum(range(100))
+    assert capture == {}
+    with profiled(True) as capture:
+        sorted(range(1000), key=lambda x: -x)
+    assert "cumulative" in capture["stats"]
@@ -0,0 +1,57 @@
+# tests/test_occupancy.py
+import multiprocessing
+import threading
+import pytest
+from src.models.occupancy import OccupancyLedger
+
+SLOT = ('2024-10-14', '08:00', 'kumpula')
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def ledger(request, tmp_path):
+    return OccupancyLedger(None if request.param == 'memory' else str(tmp_path / "occupancy.db"))
+
+def test_book_and_release(ledger):
+    generation = ledger.generation()
+    ledger.book([SLOT, ('2024-10-15', '12:00', 'toolo')])
+    ledger.book([SLOT])
+    assert ledger.generation() == generation + 2
+    assert ledger.bookings(['2024-10-14']) == {SLOT: 2}
+    assert ledger.bookings(['2024-10-14', '2024-10-15', '2024-10-16']) == {SLOT: 2, ('2024-10-15', '12:00', 'toolo'): 1}
+    assert ledger.bookings(['2024-10-16']) == {}
+
+    # Releasing never goes below zero bookings
+    ledger.release([SLOT, SLOT, SLOT])
+    assert ledger.bookings(['2024-10-14']) == {}
+    ledger.book([SLOT])
+    assert ledger.bookings(['2024-10-14']) == {SLOT: 1}
+
+    ledger.clear()
+    assert ledger.bookings(['2024-10-14', '2024-10-15']) == {}
+
+def test_concurrent_threads(ledger):
+    def book():
+        for _ in range(50):
+            ledger.book([SLOT])
+    threads = [threading.Thread(target=book) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ledger.bookings(['2024-10-14']) == {SLOT: 200}
+
+def book_in_process(path, count):
+    ledger = OccupancyLedger(path)
+    for _ in range(count):
+        ledger.book([SLOT])
+
+def test_shared_between_processes(tmp_path):
+    path = str(tmp_path / "occupancy.db")
+    ledger = OccupancyLedger(path)
+    processes = [multiprocessing.Process(target=book_in_process, args=(path, 25)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    assert ledger.bookings(['2024-10-14']) == {SLOT: 100}
+    assert ledger.generation() == 100
@@ -0,0 +1,215 @@
+# tests/test_outclean.py
+import json
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pytest
+from src.models import OutClean
+from src.models.columnar import OUTDOOR, ColumnarStore
+from src.models.OutClean import AggregateFile, OutCleanStreaming, RefreshIncremental
+
+def write_raw(path, rows):
+    pd.DataFrame(rows, columns=['groupId', 'trackableId', 'sets', 'repetitions', 'utctimestamp', 'area', 'usageMinutes']) \
+        .to_csv(path, index=False, compression='gzip')
+
+def test_aggregate_file_sums_across_chunks(tmp_path):
+    path = tmp_path / 'a_hourly.csv.gz'
+    write_raw(path, [
+        [1, 1, 0, 0, '2024-01-01T10:00:00.000Z', 'toolo', 5],
+        [1, 2, 0, 0, '2024-01-01T10:00:00.000Z', 'toolo', 3],
+        [1, 3, 0, 0, '2024-01-01T10:00:00.000Z', 'kluuvi', 2],
+        [1, 4, 0, 0, '2024-01-01T11:00:00.000Z', 'toolo', 1],
+        [1, 5, 0, 0, '2024-01-01T10:00:00.000Z', 'toolo', 4],
+    ])
+    # A chunk size of 2 splits one (hour, area) group over three chunks
+    totals = AggregateFile(path, chunksize=2)
+    assert totals[('2024-01-01T10:00:00.000Z', 'toolo')] == 12
+    assert totals[('2024-01-01T10:00:00.000Z', 'kluuvi')] == 2
+    assert totals[('2024-01-01T11:00:00.000Z', 'toolo')] == 1
+
+def test_streaming_writes_sorted_area_series(tmp_path):
+    raw, out = tmp_path / 'outraw', tmp_path / 'data'
+    raw.mkdir()
+    write_raw(raw / '2024_hourly.csv.gz', [
+        [1, 1, 0, 0, '2024-01-02T09:00:00.000Z', 'toolo', 5],
+        [1, 2, 0, 0, '2024-01-01T09:00:00.000Z', 'toolo', 1],
+    ])
+    write_raw(raw / '2023_hourly.csv.gz', [
+        [1, 1, 0, 0, '2023-12-31T09:00:00.000Z', 'toolo', 2],
+        [1, 2, 0, 0, '2024-01-01T09:00:00.000Z', 'toolo', 3],
+        [1, 3, 0, 0, '2024-01-01T09:00:00.000Z', 'kluuvi', 7],
+    ])
+
+    saved = OutCleanStreaming(str(raw), str(out), workers=2, chunksize=1)
+    assert sorted(saved) == ['kluuvi', 'toolo']
+
+    toolo = pd.read_csv(out / 'toolo.csv')
+    assert list(toolo.columns) == ['row_number', 'time', 'check-ins']
+    assert list(toolo['row_number']) == [1, 2, 3]
+    assert list(toolo['time']) == ['2023-12-31 09:00:00', '2024-01-01 09:00:00', '2024-01-02 09:00:00']
+    # The same hour in two files is summed
+    assert list(toolo['check-ins']) == [2, 4, 5]
+
+def test_streaming_writes_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    raw, out = tmp_path / 'outraw', tmp_path / 'data'
+    raw.mkdir()
+    write_raw(raw / '2024_hourly.csv.gz', [
+        [1, 1, 0, 0, '2024-02-01T09:00:00.000Z', 'toolo', 5],
+        [1, 2, 0, 0, '2024-01-01T09:00:00.000Z', 'toolo', 1],
+    ])
+    OutCleanStreaming(str(raw), str(out), workers=1, storage='parquet')
+    toolo = ColumnarStore(str(out)).read_series(OUTDOOR, 'toolo')
+    assert list(toolo['check-ins']) == [1, 5]
+    assert sorted(os.listdir(out / OUTDOOR / 'location=toolo')) == ['month=2024-01', 'month=2024-02']
+
+class SourceServer:
+    """Local stand-in for the source index, counting the files downloaded from it."""
+    def __init__(self, root):
+        self.root = root
+        self.downloads = []
+        server = self
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=str(root), **kwargs)
+
+            def do_GET(self):
+                if self.path.endswith('.csv.gz'):
+                    server.downloads.append(self.path.rsplit('/', 1)[-1])
+                super().do_GET()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def index_url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/ulkokuntosali/index.html'
+
+    def publish(self, name, rows, mtime):
+        folder = self.root / 'ulkokuntosali'
+        folder.mkdir(exist_ok=True)
+        write_raw(folder / name, rows)
+        os.utime(folder / name, (mtime, mtime))
+        links = ''.join(f'<a href="{f.name}">{f.name}</a>' for f in sorted(folder.glob('*.csv.gz')))
+        (folder / 'index.html').write_text(f'<html><body>{links}<a href="2022_hourly.csv.gz">old</a></body></html>')
+
+@pytest.fixture
+def source(tmp_path):
+    server = SourceServer(tmp_path / 'site')
+    (tmp_path / 'site').mkdir()
+    server.thread.start()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
+
+def read_area(out, area, storage):
+    if storage == 'parquet':
+        return ColumnarStore(out).read_series(OUTDOOR, area)
+    return pd.read_csv(os.path.join(out, f'{area}.csv'), parse_dates=['time'])
+
+@pytest.mark.parametrize("storage", ['csv', 'parquet'])
+def test_incremental_refresh(tmp_path, source, storage):
+    if storage == 'parquet':
+        pytest.importorskip("pyarrow")
+    raw, out = str(tmp_path / 'outraw'), str(tmp_path / 'data')
+    source.publish('2023_hourly.csv.gz', [
+        [1, 1, 0, 0, '2023-12-31T09:00:00.000Z', 'toolo', 2],
+        [1, 2, 0, 0, '2023-12-31T09:00:00.000Z', 'kluuvi', 1],
+    ], mtime=1_700_000_000)
+    source.publish('2024_hourly.csv.gz', [
+        [1, 1, 0, 0, '2024-01-01T09:00:00.000Z', 'toolo', 5],
+    ], mtime=1_700_000_000)
+
+    assert RefreshIncremental(source.index_url, raw, out, storage=storage) == ['kluuvi', 'toolo']
+    assert sorted(source.downloads) == ['2023_hourly.csv.gz', '2024_hourly.csv.gz']
+    assert list(read_area(out, 'toolo', storage)['check-ins']) == [2, 5]
+
+    # Nothing changed at the source: nothing is downloaded or merged
+    source.downloads.clear()
+    assert RefreshIncremental(source.index_url, raw, out, storage=storage) == []
+    assert source.downloads == []
+
+    # The 2024 file gains an hour and corrects an earlier one, only toolo changes
+    source.publish('2024_hourly.csv.gz', [
+        [1, 1, 0, 0, '2024-01-01T09:00:00.000Z', 'toolo', 4],
+        [1, 2, 0, 0, '2024-01-01T10:00:00.000Z', 'toolo', 3],
+    ], mtime=1_700_000_100)
+    source.downloads.clear()
+    assert RefreshIncremental(source.index_url, raw, out, storage=storage) == ['toolo']
+    assert source.downloads == ['2024_hourly.csv.gz']
+
+    toolo = read_area(out, 'toolo', storage)
+    assert list(toolo['time'].astype(str)) == ['2023-12-31 09:00:00', '2024-01-01 09:00:00', '2024-01-01 10:00:00']
+    assert list(toolo['check-ins']) == [2, 4, 3]
+
+    manifest = json.load(open(os.path.join(raw, 'manifest.json')))
+    assert sorted(manifest) == ['2023_hourly.csv.gz', '2024_hourly.csv.gz']
+    assert {'size', 'sha256', 'last_modified', 'mtime'} <= set(manifest['2024_hourly.csv.gz'])
+
+SOURCE_ROWS = {
+    '2023_hourly.csv.gz': [
+        [1, 1, 0, 0, '2023-12-31T09:00:00.000Z', 'toolo', 2],
+        [1, 2, 0, 0, '2024-01-01T09:00:00.000Z', 'kluuvi', 1],
+    ],
+    '2024_hourly.csv.gz': [
+        [1, 1, 0, 0, '2024-01-01T09:00:00.000Z', 'toolo', 5],
+        [1, 2, 0, 0, '2024-01-01T09:00:00.000Z', 'kluuvi', 6],
+    ],
+}
+
+@pytest.mark.parametrize("storage", ['csv', 'parquet'])
+def test_incremental_refresh_after_full_refresh(tmp_path, source, monkeypatch, storage):
+    if storage == 'parquet':
+        pytest.importorskip("pyarrow")
+    full_raw, raw, out = tmp_path / 'fullraw', str(tmp_path / 'outraw'), str(tmp_path / 'data')
+    full_raw.mkdir()
+    for name, rows in SOURCE_ROWS.items():
+        write_raw(full_raw / name, rows)
+        source.publish(name, rows, mtime=1_700_000_000)
+    OutCleanStreaming(str(full_raw), out, workers=1, storage=storage)
+    before = {area: list(read_area(out, area, storage)['check-ins']) for area in ('kluuvi', 'toolo')}
+    assert before == {'kluuvi': [7], 'toolo': [2, 5]}
+
+    # The first incremental run has no manifest yet, the series it finds are replaced rather than added to
+    rebuild_area = OutClean.RebuildArea
+    rebuilt = []
+    def counted(area, *args, **kwargs):
+        rebuilt.append(area)
+        rebuild_area(area, *args, **kwargs)
+    monkeypatch.setattr(OutClean, 'RebuildArea', counted)
+    RefreshIncremental(source.index_url, raw, out, storage=storage)
+    # Each area is rebuilt once, however many of the files change it
+    assert rebuilt == ['kluuvi', 'toolo']
+    assert {area: list(read_area(out, area, storage)['check-ins']) for area in ('kluuvi', 'toolo')} == before
+
+@pytest.mark.parametrize("step", ['RebuildArea', 'WritePartial'])
+def test_incremental_refresh_resumes_after_interruption(tmp_path, source, monkeypatch, step):
+    raw, out = str(tmp_path / 'outraw'), str(tmp_path / 'data')
+    for name, rows in SOURCE_ROWS.items():
+        source.publish(name, rows, mtime=1_700_000_000)
+
+    # Stop after the first series or partial is written, before the manifest is
+    original = getattr(OutClean, step)
+    calls = []
+    def interrupted(*args, **kwargs):
+        if calls:
+            raise KeyboardInterrupt
+        calls.append(args)
+        original(*args, **kwargs)
+    monkeypatch.setattr(OutClean, step, interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        RefreshIncremental(source.index_url, raw, out)
+    monkeypatch.setattr(OutClean, step, original)
+    assert not os.path.exists(os.path.join(raw, 'manifest.json'))
+
+    # The rerun redoes both files without applying any change twice
+    source.downloads.clear()
+    RefreshIncremental(source.index_url, raw, out)
+    assert sorted(source.downloads) == ['2023_hourly.csv.gz', '2024_hourly.csv.gz']
+    assert list(read_area(out, 'kluuvi', 'csv')['check-ins']) == [7]
+    assert list(read_area(out, 'toolo', 'csv')['check-ins']) == [2, 5]
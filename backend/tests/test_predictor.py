@@ -0,0 +1,123 @@
+# tests/test_predictor.py
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from src.models.forecast_store import QUANTILE_LEVELS, quantile_column
+from src.models.predictor import WeekPred
+
+def history(values_by_week):
+    """Hourly history where every hour of week w has the value values_by_week[w]."""
+    time_index = pd.date_range('2024-01-01', periods=168 * len(values_by_week), freq='h')  # a Monday
+    values = np.repeat(values_by_week, 168).astype(float)
+    return pd.DataFrame({'time': time_index, 'check-ins': values})
+
+def profile(data, **options):
+    return WeekPred(None, backend='profile', **options).profile_week(data)
+
+def test_profile_format():
+    data = history([1.0])
+    data.loc[(data['time'].dt.dayofweek == 2) & (data['time'].dt.hour == 15), 'check-ins'] = 9.0
+    predictions = profile(data)
+    assert len(predictions) == 168
+    assert (predictions['time'].dt.dayofweek * 24 + predictions['time'].dt.hour).tolist() == list(range(168))
+    slot = predictions[(predictions['time'].dt.dayofweek == 2) & (predictions['time'].dt.hour == 15)]
+    assert slot['check-ins'].item() == 9.0
+
+@pytest.mark.parametrize("aggregation, expected", [
+    ('mean', 22.0),
+    ('median', 3.0),
+    ('trimmed', 3.0),
+])
+def test_profile_aggregation(aggregation, expected):
+    predictions = profile(history([1.0, 2.0, 3.0, 4.0, 100.0]), aggregation=aggregation, trim=0.2)
+    assert np.allclose(predictions['check-ins'], expected)
+
+def test_profile_recency_weighting():
+    # The last week weighs twice as much as the one before it
+    predictions = profile(history([0.0, 3.0]), half_life=7)
+    assert np.allclose(predictions['check-ins'], 2.0)
+
+def test_profile_fills_missing_slots():
+    data = history([4.0])
+    data = data[~((data['time'].dt.dayofweek == 0) & (data['time'].dt.hour == 3))]
+    predictions = profile(data)
+    assert predictions['check-ins'].notna().all()
+    assert predictions['check-ins'].iloc[3] == 4.0
+
+def test_invalid_backend():
+    with pytest.raises(ValueError):
+        WeekPred(None, backend='unknown')
+
+def test_preds_to_json(tmp_path):
+    predictions = profile(history([1.0]))
+    predictions['check-ins'] = np.arange(168) / 2
+    output_file = tmp_path / "kluuvi_forecast.json"
+    WeekPred(None, backend='profile').preds_to_json(predictions, "kluuvi.csv", str(output_file))
+
+    with open(output_file) as f:
+        data = json.load(f)
+    assert data["quantile_levels"] == list(QUANTILE_LEVELS)
+    forecast = data['week_forecast']
+    assert forecast[0] == {"weekday": 0, "hour": 0, "pred_checkins": 0.0, "quantiles": [1.0] * len(QUANTILE_LEVELS)}
+    assert forecast[40]["pred_checkins"] == 20.0
+    assert [entry["weekday"] * 24 + entry["hour"] for entry in forecast] == list(range(168))
+
+def test_profile_quantiles():
+    # Every slot sees the values 0..9 over ten weeks
+    predictions = profile(history(np.arange(10.0)), aggregation='median')
+    columns = [quantile_column(level) for level in QUANTILE_LEVELS]
+    assert columns[0] == 'q10' and columns[-1] == 'q99'
+    assert np.allclose(predictions['q10'], 0.0)
+    assert np.allclose(predictions['q50'], 4.0)
+    assert np.allclose(predictions['q50'], predictions['check-ins'])
+    assert np.allclose(predictions['q90'], 8.0)
+    assert np.allclose(predictions['q99'], 9.0)
+    # Quantiles never decrease with the level
+    assert (np.diff(predictions[columns].to_numpy(), axis=1) >= 0).all()
+
+def write_histories(data_dir, locations):
+    for weeks, location in enumerate(locations, start=1):
+        history(np.arange(weeks, dtype=float)).to_csv(data_dir / f"{location}.csv", index=False)
+
+def test_forecast_location(tmp_path):
+    data_dir, output_dir = tmp_path / "history", tmp_path / "forecasts"
+    data_dir.mkdir()
+    output_dir.mkdir()
+    write_histories(data_dir, ["kluuvi"])
+    predictor = WeekPred(str(data_dir), backend='profile', output_dir=str(output_dir))
+
+    predictions, timings = predictor.forecast_location("kluuvi.csv")
+    assert len(predictions) == 168
+    assert set(timings) == {'load', 'forecast', 'write', 'total'}
+    # Only the renamed forecast is left, no temporary file
+    assert [path.name for path in output_dir.iterdir()] == ["kluuvi_forecast.json"]
+    assert predictor.forecast_location("unknown.csv")[0] is None
+
+def test_run_for_locations_in_processes(tmp_path):
+    write_histories(tmp_path, ["kluuvi", "kumpula"])
+    output_dir = tmp_path / "forecasts"
+    output_dir.mkdir()
+    predictor = WeekPred(str(tmp_path), backend='profile', output_dir=str(output_dir))
+
+    timings = predictor.run_for_locations(["kluuvi.csv", "kumpula.csv"], workers=2, headless=True)
+    assert list(timings) == ["kluuvi.csv", "kumpula.csv"]
+    assert sorted(path.name for path in output_dir.iterdir()) == ["kluuvi_forecast.json", "kumpula_forecast.json"]
+    for location, checkins in [("kluuvi", 0.0), ("kumpula", 0.5)]:
+        with open(output_dir / f"{location}_forecast.json") as f:
+            forecast = json.load(f)
+        assert forecast["location"] == f"{location}.csv"
+        assert all(entry["pred_checkins"] == checkins for entry in forecast["week_forecast"])
+
+def test_preds_to_json_keeps_old_forecast_on_failure(tmp_path, monkeypatch):
+    output_file = tmp_path / "kluuvi_forecast.json"
+    output_file.write_text('{"location": "old"}')
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(json, "dump", fail)
+    with pytest.raises(OSError):
+        WeekPred(None, backend='profile').preds_to_json(profile(history([1.0])), "kluuvi.csv", str(output_file))
+    # The old forecast is untouched and the temporary file removed
+    assert output_file.read_text() == '{"location": "old"}'
+    assert [path.name for path in tmp_path.iterdir()] == ["kluuvi_forecast.json"]
@@ -0,0 +1,28 @@
+# tests/test_registry.py
+import pytest
+from src.models.registry import LOCATIONS, active_locations, display_name, is_outdoor, travel_km, weighted_costs
+
+def test_locations():
+    assert active_locations() == ['kluuvi', 'kumpula', 'toolo', 'meilahti']
+    assert display_name('toolo') == 'Töölö (Unisport)'
+    assert display_name('Pirkkola') == 'Pirkkola (Outdoor gym)'
+    assert display_name('elsewhere') == 'Elsewhere (Unisport)'
+    assert is_outdoor('Paloheinä') and not is_outdoor('kluuvi') and not is_outdoor('elsewhere')
+
+def test_travel_km():
+    kluuvi = (LOCATIONS['kluuvi']['lat'], LOCATIONS['kluuvi']['lon'])
+    distances = travel_km(kluuvi, ['kluuvi', 'kumpula', 'otaniemi'])
+    assert distances[0] == pytest.approx(0, abs=1e-9)
+    assert distances[1] == pytest.approx(3.9, abs=0.2)
+    assert distances[2] == pytest.approx(6.6, abs=0.3)
+
+def test_weighted_costs():
+    assert weighted_costs([3, 5], None, 2, 5).tolist() == [6, 10]
+    assert weighted_costs([3, 5], [0.5, 1.2], 1, 5).tolist() == [6, 11]
+
+def test_weighted_costs_keep_forbidden_slots():
+    # A zero-forecast slot stays at cost 0, i.e. forbidden, however far the origin is
+    kluuvi = (LOCATIONS['kluuvi']['lat'], LOCATIONS['kluuvi']['lon'])
+    km = travel_km(kluuvi, ['kumpula', 'kumpula'])
+    assert weighted_costs([0, 4], km, 1, 5).tolist() == [0, 24]
+
@@ -0,0 +1,67 @@
+# tests/test_replan.py
+import datetime
+import pytest
+from src.models.replan import apply_changes, plan_window
+
+START = datetime.date(2024, 1, 1)  # A Monday
+
+def calendar(weeks, slots=("08:00", "18:00")):
+    days = [f"{START + datetime.timedelta(days=day)}T00:00:00.000Z" for day in range(7 * weeks)]
+    return days, [list(slots) for _ in days]
+
+def previous_schedule(days):
+    """Two workouts a week, on its Monday and Thursday."""
+    return [(day[:10], "18:00", "Kumpula (Unisport)") for idx, day in enumerate(days) if idx % 7 in (0, 3)]
+
+def test_apply_changes():
+    days, times = calendar(1)
+    days, times = apply_changes(days, times, {
+        "removed": [["2024-01-02", "08:00"], ["2024-01-03T00:00:00.000Z", "08:00"], ["2024-01-03", "18:00"]],
+        "added": [["2024-01-02", "12:00"], ["2024-01-09", "07:00"], ["2024-01-01", "18:00"]],
+    })
+    assert [day[:10] for day in days] == ["2024-01-01", "2024-01-02", "2024-01-04", "2024-01-05", "2024-01-06", "2024-01-07", "2024-01-09"]
+    assert times[0] == ["08:00", "18:00"]
+    assert times[1] == ["12:00", "18:00"]
+    assert times[-1] == ["07:00"]
+
+def test_plan_window_resolves_changed_week_only():
+    days, times = calendar(8)
+    previous = previous_schedule(days)
+    plan = plan_window(days, times, 16, previous, {"removed": [["2024-01-18", "18:00"]]}, now="2024-01-01")
+
+    # 2024-01-18 is the Thursday of the third week
+    assert plan["dates"] == [f"2024-01-{day:02d}" for day in range(15, 22)]
+    assert plan["k"] == 2
+    assert len(plan["kept"]) == 14
+    assert all(not "2024-01-15" <= entry[0] <= "2024-01-21" for entry in plan["kept"])
+    assert "18:00" not in plan["window_times"][3]
+
+def test_plan_window_keeps_the_past():
+    days, times = calendar(2)
+    previous = previous_schedule(days)
+    plan = plan_window(days, times, 4, previous, {"reweighted": "all"}, now="2024-01-04")
+
+    assert plan["dates"][0] == "2024-01-04"
+    assert plan["kept"] == [("2024-01-01", "18:00", "Kumpula (Unisport)")]
+    assert plan["k"] == 3
+
+def test_plan_window_without_changes():
+    days, times = calendar(2)
+    previous = previous_schedule(days)
+    plan = plan_window(days, times, 4, previous, {}, now="2024-01-01")
+    assert plan["dates"] == [] and plan["k"] == 0
+    assert plan["kept"] == previous
+
+def test_plan_window_grows_when_week_is_too_small():
+    days, times = calendar(2, slots=("18:00",))
+    previous = previous_schedule(days)
+    # Only one slot left in the first week for its two workouts
+    removed = [[day[:10], "18:00"] for day in days[1:7]]
+    plan = plan_window(days, times, 4, previous, {"removed": removed}, now="2024-01-01")
+    assert plan["dates"] == ["2024-01-01"] + [day[:10] for day in days[7:]]
+    assert plan["k"] == 4 and plan["kept"] == []
+
+def test_plan_window_rejects_impossible_schedule():
+    days, times = calendar(1, slots=("18:00",))
+    with pytest.raises(ValueError):
+        plan_window(days, times, 8, [], {"reweighted": "all"}, now="2024-01-01")
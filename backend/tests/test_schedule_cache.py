@@ -0,0 +1,51 @@
+# tests/test_schedule_cache.py
+from src.models.schedule_cache import ScheduleCache
+
+LOCATIONS = ['kluuvi', 'toolo']
+
+def test_key_is_canonical():
+    key = ScheduleCache.make_key(
+        ["2024-10-16T00:00:00.000Z", "2024-10-17T00:00:00.000Z"], [["15:00", "08:00"], ["12:00"]], 2, LOCATIONS, (1, 2))
+    # Same calendar in another order and nesting
+    same = ScheduleCache.make_key(
+        [["2024-10-17T00:00:00.000Z"], ["2024-10-16T00:00:00.000Z"]], [["12:00"], ["08:00", "15:00"]], 2, LOCATIONS[::-1], (1, 2))
+    assert key == same
+    assert key != ScheduleCache.make_key(
+        ["2024-10-16T00:00:00.000Z", "2024-10-17T00:00:00.000Z"], [["15:00", "08:00"], ["12:00"]], 3, LOCATIONS, (1, 2))
+    assert key != ScheduleCache.make_key(
+        ["2024-10-16T00:00:00.000Z", "2024-10-17T00:00:00.000Z"], [["15:00", "08:00"], ["12:00"]], 2, LOCATIONS, (1, 3))
+    assert key != ScheduleCache.make_key(
+        ["2024-10-16T00:00:00.000Z", "2024-10-17T00:00:00.000Z"], [["15:00", "08:00"], ["12:00"]], 2, LOCATIONS, (1, 2), 'p90')
+
+def test_hits_and_misses():
+    cache = ScheduleCache()
+    assert cache.get("a") is None
+    cache.put("a", [1])
+    assert cache.get("a") == [1]
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 1024}
+
+def test_lru_eviction():
+    cache = ScheduleCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.models.schedule_cache.time.monotonic", lambda: now[0])
+    cache = ScheduleCache(ttl=10)
+    cache.put("a", 1)
+    now[0] = 111.0
+    assert cache.get("a") is None
+
+def test_version_change_clears():
+    cache = ScheduleCache()
+    cache.sync_version((1,))
+    cache.put("a", 1)
+    cache.sync_version((1,))
+    assert cache.get("a") == 1
+    cache.sync_version((2,))
+    assert cache.get("a") is None
@@ -3,7 +3,8 @@ import pytest
 from pysat.formula import WCNF
 from pysat.card import CardEnc
 from pysat.examples.rc2 import RC2
-from src.models.scheduler import Scheduler
+from src.models import scheduler as scheduler_module
+from src.models.scheduler import ENCODINGS, Scheduler, choose_encoding
 
 @pytest.fixture
 def scheduler():
@@ -78,3 +79,134 @@ def test_set_soft_with_weights(scheduler):
     soft_clauses = [([1, 2], 5), ([2, 3], 3)]
     scheduler.set_soft(soft_clauses)
     assert scheduler.soft == soft_clauses
+
+def set_problem(scheduler, lits, soft, hard, penalty):
+    scheduler.set_lits(lits)
+    scheduler.set_soft(soft)
+    scheduler.set_hard(hard)
+    scheduler.set_penalty(penalty)
+
+def test_incremental_matches_cold_start():
+    lits = [1, 2, 3, 4, 5, 6]
+    hard = [[1, 2, 3], [4, 5, 6]]
+    penalty = [[1, 2, 3, 4, 5, 6]]
+    warm = Scheduler(incremental=True, fast_path=False)
+    for k, soft in [
+        (2, [(5, 1), (3, 2), (8, 3), (1, 4), (9, 5), (2, 6)]),
+        (3, [(5, 1), (3, 2), (8, 3), (1, 4), (9, 5), (2, 6)]),
+        (2, [(1, 1), (7, 2), (8, 3), (6, 4), (0, 5), (2, 6)]),
+        (1, [(1, 1), (7, 2), (8, 3), (6, 4), (9, 5), (2, 6)]),
+    ]:
+        cold = Scheduler(fast_path=False)
+        set_problem(cold, lits, soft, hard, penalty)
+        set_problem(warm, lits, soft, hard, penalty)
+        cold_cost, _ = cold.solve_schedule(k)
+        warm_cost, model = warm.solve_schedule(k)
+        assert warm_cost == cold_cost
+        assert len([l for l in model if l in lits]) == k
+    # All requests share one warm solver
+    assert len(warm.warm_solvers) == 1
+
+def test_incremental_no_valid_schedule():
+    scheduler = Scheduler(incremental=True, fast_path=False)
+    # A zero weight makes the soft clause hard, which leaves only one literal
+    set_problem(scheduler, [1, 2], [(0, 1)], [], [])
+    assert scheduler.solve_schedule(k=2) is None
+    assert scheduler.solve_schedule(k=1)[0] == 0
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_solve_schedule_encodings(encoding):
+    scheduler = Scheduler(fast_path=False, encoding=encoding)
+    set_problem(scheduler, [1, 2, 3, 4], [(5, 1), (3, 2), (8, 3), (1, 4)], [[1, 2], [3, 4]], [[1, 2, 3, 4]])
+    cost, model = scheduler.solve_schedule(k=2)
+    assert cost == 4
+    assert [l for l in model if l in (1, 2, 3, 4)] == [2, 4]
+
+def test_set_encoding_invalid(scheduler):
+    with pytest.raises(ValueError):
+        scheduler.set_encoding("unknown")
+
+def test_choose_encoding():
+    assert choose_encoding(48, 5) == 'seqcounter'
+    assert choose_encoding(2520, 20) in ('pb', 'kmtotalizer')
+
+def batch_problem(weights):
+    lits = list(range(1, len(weights) + 1))
+    return {"lits": lits, "soft": list(zip(weights, lits)), "hard": [lits], "penalty": [],
+            "slots": {lit: ("2024-10-16", f"{lit}:00", "toolo") for lit in lits}}
+
+def test_solve_batch_matches_single_solves():
+    requests = [(batch_problem([5, 3, 8, 1]), 1), (batch_problem([5, 3, 8, 1]), 2),
+                (batch_problem([2, 9, 4, 6]), 1), (batch_problem([5, 3, 8, 1]), 1)]
+    results = dict(Scheduler().solve_batch(requests, workers=2))
+    assert sorted(results) == [0, 1, 2, 3]
+    for index, (problem, k) in enumerate(requests):
+        scheduler = Scheduler()
+        set_problem(scheduler, problem["lits"], problem["soft"], problem["hard"], problem["penalty"])
+        assert results[index]["cost"] == scheduler.solve_schedule(k)[0]
+    assert results[0] is results[3]
+
+def test_solve_batch_capacity_spreads_users():
+    requests = [(batch_problem([1, 2, 9]), 1)] * 3
+    chosen = [[lit for lit in result["model"] if lit > 0] for _, result in Scheduler().solve_batch(requests)]
+    assert chosen == [[1], [1], [1]]
+    # Every user booked into a slot makes it one check-in busier for the next
+    chosen = [[lit for lit in result["model"] if lit > 0]
+              for _, result in Scheduler().solve_batch(requests, capacity_weight=1)]
+    assert chosen == [[1], [2], [1]] or chosen == [[1], [1], [2]]
+
+def anytime_scheduler():
+    scheduler = Scheduler(fast_path=False)
+    set_problem(scheduler, [1, 2, 3, 4, 5, 6], [(3, 1), (2, 2), (5, 3), (2, 4), (8, 5), (8, 6)],
+                [[1, 2], [3, 4], [5, 6]], [[1, 3, 5], [2, 4, 6]])
+    # Greedily choosing the cheapest literal first costs 107, the optimum is 105
+    assert scheduler.greedy_schedule(2)[0] == 107
+    return scheduler
+
+def test_solve_schedule_timeout_finishes_optimal():
+    scheduler = anytime_scheduler()
+    cost, model = scheduler.solve_schedule(k=2, timeout=10)
+    assert cost == 105
+    assert scheduler.optimal is True
+    assert scheduler.gap == 0
+
+def test_incremental_timeout():
+    scheduler = anytime_scheduler()
+    scheduler.incremental = True
+    # Without any time the warm solver is interrupted before its first call, leaving the greedy schedule
+    cost, model = scheduler.solve_schedule(k=2, timeout=0)
+    assert cost == 107
+    assert len([lit for lit in model if lit > 0]) == 2
+    assert scheduler.optimal is False
+    assert scheduler.gap == 1
+    # The interrupted solve leaves the warm solver usable
+    cost, _ = scheduler.solve_schedule(k=2, timeout=10)
+    assert cost == 105
+    assert scheduler.optimal is True
+    assert scheduler.gap == 0
+    assert len(scheduler.warm_solvers) == 1
+
+def test_linear_search_improves_on_greedy(monkeypatch):
+    # Without time for RC2 the linear search starts from the greedy schedule
+    monkeypatch.setattr(scheduler_module, "RC2_SHARE", 0)
+    scheduler = anytime_scheduler()
+    cost, model = scheduler.solve_schedule(k=2, timeout=10)
+    assert cost == 105
+    assert len([lit for lit in model if lit > 0]) == 2
+    # The search ends when no cheaper schedule is left, which proves this one optimal
+    assert scheduler.optimal is True
+    assert scheduler.gap == 0
+
+def test_alternatives_timeout():
+    scheduler = anytime_scheduler()
+    # With enough time the enumeration is the same as without a limit
+    found = scheduler.solve_alternatives(2, 3, timeout=10)
+    assert [cost for cost, _ in found] == [cost for cost, _ in scheduler.solve_alternatives(2, 3)] == [105, 107, 110]
+    assert scheduler.optimal is True
+
+    # Without any time the enumeration stops before its first schedule, leaving the greedy one
+    found = scheduler.solve_alternatives(2, 3, timeout=0)
+    assert [cost for cost, _ in found] == [107]
+    assert len([lit for lit in found[0][1] if lit > 0]) == 2
+    assert scheduler.optimal is False
+    assert scheduler.gap == 1
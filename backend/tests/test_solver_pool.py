@@ -0,0 +1,61 @@
+# tests/test_solver_pool.py
+import random
+import time
+import pytest
+from src.models.solver_pool import PoolFull, SolverPool
+
+def make_problem(days, slots, locations, seed=0):
+    """A problem shaped like the ones the Encoder builds."""
+    rng = random.Random(seed)
+    hard, penalty = [], []
+    index = 1
+    for _ in range(days):
+        day = []
+        for _ in range(slots):
+            group = list(range(index, index + locations))
+            index += locations
+            hard.append(group)
+            day.extend(group)
+        penalty.append(day)
+    lits = list(range(1, index))
+    return {"lits": lits, "soft": [(rng.randint(1, 60), lit) for lit in lits], "hard": hard, "penalty": penalty}
+
+@pytest.fixture
+def pool():
+    pool = SolverPool(workers=1, max_pending=1)
+    yield pool
+    pool.shutdown(wait=False)
+
+def test_submit_and_poll(pool):
+    job_id = pool.submit(make_problem(2, 3, 4), 2, context="request")
+    job = pool.poll(job_id, wait=30)
+    assert job["status"] == "done"
+    assert job["context"] == "request"
+    assert job["result"]["optimal"] is True
+    assert sum(1 for lit in job["result"]["model"] if lit > 0) == 2
+    assert pool.poll("missing") is None
+
+def test_timeout_returns_best_so_far():
+    # Without the fast path RC2 cannot solve this size in time
+    pool = SolverPool(workers=1, options={"fast_path": False})
+    try:
+        start = time.monotonic()
+        job = pool.poll(pool.submit(make_problem(7, 6, 4), 5, timeout=0.5), wait=30)
+        assert time.monotonic() - start < 10
+        assert job["status"] == "done"
+        assert job["result"]["optimal"] is False
+        assert job["result"]["cost"] is not None
+        assert sum(1 for lit in job["result"]["model"] if lit > 0) == 5
+    finally:
+        pool.shutdown(wait=False)
+
+def test_admission_control(pool):
+    pool.options = {"fast_path": False}
+    job_id = pool.submit(make_problem(7, 6, 4), 5, timeout=1)
+    with pytest.raises(PoolFull):
+        pool.submit(make_problem(2, 3, 4), 2)
+    assert pool.stats()["pending"] == 1
+
+    assert pool.poll(job_id, wait=30)["status"] == "done"
+    # The finished job frees its slot
+    assert pool.poll(pool.submit(make_problem(2, 3, 4), 2), wait=30)["status"] == "done"
@@ -0,0 +1,22 @@
+# tests/test_timefeatures.py
+import numpy as np
+import pandas as pd
+from src.models.timefeatures import parse_days, parse_utc, week_slots, weekday_hour
+
+def test_weekday_hour_matches_pandas():
+    times = pd.Series(pd.date_range('1969-12-25', '2031-01-01', freq='37h'))
+    weekday, hour = weekday_hour(times)
+    assert weekday.tolist() == times.dt.dayofweek.tolist()
+    assert hour.tolist() == times.dt.hour.tolist()
+    assert week_slots(times).tolist() == (times.dt.dayofweek * 24 + times.dt.hour).tolist()
+
+def test_parse_utc():
+    times = parse_utc(pd.Series(['2023-10-01T05:00:00.000Z', '2023-10-01T23:00:00.000Z'], dtype='string'))
+    assert times.tolist() == [pd.Timestamp('2023-10-01 05:00'), pd.Timestamp('2023-10-01 23:00')]
+
+def test_parse_days():
+    days = parse_days(pd.Series(['2023-10-01', '2023-10-02T21:30:00']))
+    assert days.tolist() == [np.datetime64('2023-10-01'), np.datetime64('2023-10-02')]
+    # Aware timestamps keep the date they are written with
+    days = parse_days(pd.Series(['2023-10-01T01:00:00+03:00']))
+    assert days.tolist() == [np.datetime64('2023-10-01')]
@@ -0,0 +1,53 @@
+# tests/test_wire.py
+import pytest
+from src.models.wire import MAX_SLOTS, compact_response, expand_request, is_compact
+
+COMPACT = {"start": "2024-10-16", "slots": ["08:00", "12:00", "18:00"], "mask": [5, 0, 7], "n": 2, "risk": "p90"}
+
+def test_expand_request():
+    assert is_compact(COMPACT) and not is_compact({"days": [], "times": []}) and not is_compact(None)
+    schedule_data, error = expand_request(COMPACT)
+    assert error is None
+    assert schedule_data == {
+        "n": 2,
+        "risk": "p90",
+        "days": ["2024-10-16T00:00:00.000Z", "2024-10-18T00:00:00.000Z"],
+        "times": [["08:00", "18:00"], ["08:00", "12:00", "18:00"]],
+    }
+
+@pytest.mark.parametrize("field, value", [
+    ("start", "16.10.2024"),
+    ("start", None),
+    ("slots", []),
+    ("slots", ["08:00", "08:00"]),
+    ("slots", ["8 am"]),
+    ("slots", [f"{hour:02d}:{minute:02d}" for hour in range(16) for minute in (0, 30)][:MAX_SLOTS + 1]),
+    ("mask", [8]),
+    ("mask", [-1]),
+    ("mask", [True]),
+    ("mask", 5),
+])
+def test_expand_request_invalid(field, value):
+    schedule_data, error = expand_request({**COMPACT, field: value})
+    assert schedule_data is None
+    assert error.startswith(f"Invalid value for {field}.")
+
+def test_compact_response():
+    body = {
+        "message": "Schedule received successfully!",
+        "received_times": [["08:00", "18:00"], ["08:00", "12:00", "18:00"]],
+        "received_days": ["2024-10-16T00:00:00.000Z", "2024-10-18T00:00:00.000Z"],
+        "n": 2,
+        "solution": [["2024-10-18", "12:00", "Töölö (Unisport)"], ["2024-10-16", "08:00", "Kluuvi (Unisport)"]],
+        "alternatives": [{"cost": 40, "solution": [["2024-10-16", "18:00", "Kumpula (Unisport)"]]}],
+        "optimal": True,
+    }
+    compact = compact_response(body, COMPACT, ['kluuvi', 'kumpula', 'toolo'])
+    assert compact == {
+        "n": 2,
+        "optimal": True,
+        "start": "2024-10-16",
+        "locations": ["Kluuvi (Unisport)", "Kumpula (Unisport)", "Töölö (Unisport)"],
+        "solution": [[0, 0, 0], [2, 1, 2]],
+        "alternatives": [{"cost": 40, "solution": [[0, 2, 1]]}],
+    }